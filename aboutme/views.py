@@ -12,10 +12,13 @@ from .serializers import (
 from rest_framework import status
 from django.utils.decorators import method_decorator
 from django.views.decorators.cache import cache_page
+from django.views.decorators.vary import vary_on_headers
 from django.db import transaction
 import logging
 from bloguser.permissons import IsSuperUser
 from django_redis import get_redis_connection
+from myblog_backend.compression import precompressed
+from myblog_backend.versioning import bump_version, conditional
 
 # 创建日志记录器
 logger = logging.getLogger(__name__)
@@ -24,15 +27,36 @@ logger = logging.getLogger(__name__)
 ABOUTME_CACHE_TTL = 60 * 60 * 12  # 12小时, 以秒为单位
 ABOUTME_CACHE_KEY = 'harry_web_ai_aboutme'
 
+
+def clear_cache():
+    """
+    清除页面缓存并更新版本号(客户端持有的 ETag 随之失效)
+    """
+    bump_version('aboutme')
+    try:
+        redis = get_redis_connection("default")
+        pattern = f":1:views.decorators.cache.*{ABOUTME_CACHE_KEY}*"
+        for key in redis.scan_iter(pattern):
+            redis.delete(key)
+            logger.info(f"已删除缓存键: {key}")
+    except Exception as e:
+        logger.error(f"清除缓存时出错: {str(e)}")
+
+
 class AboutMeView(APIView):
     """
     关于我API
     GET: 获取所有aboutme数据, 包含work, education, projects, skills
     """
     
+    # 条件请求在缓存外层检查, 客户端数据未过期时直接返回 304; 最外层按 Accept-Encoding 返回预压缩的内容
+    @method_decorator(precompressed)
+    @method_decorator(conditional(lambda request: ['aboutme']))
     @method_decorator(
         cache_page(ABOUTME_CACHE_TTL, key_prefix=ABOUTME_CACHE_KEY)
     )
+    # 响应格式随 Accept 变化(JSON / MessagePack), 页面缓存按 Accept 区分
+    @method_decorator(vary_on_headers('Accept'))
     def get(self, request):
         """获取所有aboutme数据(使用Redis缓存, 缓存时间12小时)"""
         try:
@@ -96,15 +120,7 @@ class UpdateAboutMeView(APIView):
                 # 提交数据库事务
                 transaction.commit()
 
-                # 清除缓存
-                try:
-                    redis = get_redis_connection("default")
-                    pattern = f":1:views.decorators.cache.*{ABOUTME_CACHE_KEY}*"
-                    for key in redis.scan_iter(pattern):
-                        redis.delete(key)
-                        logger.info(f"已删除缓存键: {key}")
-                except Exception as e:
-                    logger.error(f"清除缓存时出错: {str(e)}")
+                clear_cache()
 
                 return Response({
                     'code': 200,
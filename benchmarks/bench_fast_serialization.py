@@ -0,0 +1,100 @@
+"""
+列表序列化: 序列化器(模型实例 + DRF 字段) vs values() 快速路径
+
+1. 直接序列化全部博客 / 评论, 比较每行耗时(包含查询)
+2. 通过 /api/blog/blogs/ 接口(每页 20 篇)比较吞吐量
+
+python -m benchmarks.bench_fast_serialization [博客数量]
+"""
+import sys
+
+from benchmarks.common import count_queries, report, seed_blogs, test_database, timed
+
+from django.test.utils import override_settings
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+
+def seed_comments(blog, count):
+    from blog.models import Comment
+    from bloguser.models import BlogUser
+
+    BlogUser.objects.bulk_create([
+        BlogUser(email=f'bench{i}@example.com', name=f'用户{i}', telephone=f'138{i:08d}') for i in range(20)
+    ])
+    users = list(BlogUser.objects.all())
+    roots = Comment.objects.bulk_create([
+        Comment(user=users[i % len(users)], blog=blog, content=f'评论内容{i}') for i in range(count // 2)
+    ])
+    Comment.objects.bulk_create([
+        Comment(user=users[i % len(users)], blog=blog, content=f'回复内容{i}', parent_comment=root, root_comment=root)
+        for i, root in enumerate(roots)
+    ])
+
+
+def seed_tags(blogs):
+    from blog.models import Blog, Tag
+
+    tags = Tag.objects.bulk_create([Tag(name=f'标签{i}') for i in range(10)])
+    through = Blog.tags.through
+    through.objects.bulk_create([
+        through(blog_id=blog.id, tag_id=tags[(blog.id + offset) % len(tags)].id)
+        for blog in blogs for offset in range(3)
+    ])
+
+
+def serialization_rows(blog_count, repeat):
+    from blog.fastserializers import ValuesPlan
+    from blog.models import Blog, Comment
+    from blog.serializers import BlogListSerializer, CommentSerializer
+
+    context = {'request': Request(APIRequestFactory().get('/'))}
+    blogs = Blog.objects.select_related('category').prefetch_related('tags').order_by('-id')
+    comments = Comment.objects.select_related('user', 'parent_comment__user').order_by('-time')
+    rows = []
+    for name, serializer_class, queryset, count in (
+        ('博客列表', BlogListSerializer, blogs, blog_count),
+        ('评论列表', CommentSerializer, comments, Comment.objects.count()),
+    ):
+        plan = ValuesPlan(serializer_class(context=context))
+        slow, _ = timed(lambda: serializer_class(queryset.all(), many=True, context=context).data, repeat)
+        fast, _ = timed(lambda: plan.serialize(plan.values(queryset.all()), context), repeat)
+        slow_row = slow / repeat / count * 1e6
+        fast_row = fast / repeat / count * 1e6
+        rows.append([name, count, f'{slow_row:.1f}', f'{fast_row:.1f}', f'{slow_row / fast_row:.1f}x'])
+    return rows
+
+
+def api_rows(requests):
+    client = APIClient()
+    url = '/api/blog/blogs/?page_size=20&page=2'
+    rows = []
+    for enabled in (False, True):
+        with override_settings(BLOG_FAST_SERIALIZATION=enabled):
+            client.get(url)
+            with count_queries() as counter:
+                client.get(url)
+            elapsed, rate = timed(lambda: client.get(url), requests)
+        rows.append(['values() 快速路径' if enabled else '序列化器', requests, f'{elapsed:.3f}', f'{rate:.1f}', counter.count])
+    return rows
+
+
+def run(blog_count, repeat=5, requests=300):
+    blogs = seed_blogs(blog_count, content_length=200)
+    seed_tags(blogs)
+    seed_comments(blogs[0], min(blog_count, 1000))
+    report(
+        f'序列化每行耗时 (重复 {repeat} 次)',
+        serialization_rows(blog_count, repeat),
+        ['数据', '行数', '序列化器(µs/行)', '快速路径(µs/行)', '加速'],
+    )
+    report(
+        '博客列表接口吞吐量 (每页 20 篇)',
+        api_rows(requests),
+        ['模式', '请求数', '耗时(秒)', '请求/秒', '每次请求 SQL 数'],
+    )
+
+
+if __name__ == '__main__':
+    with test_database():
+        run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
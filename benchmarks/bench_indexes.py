@@ -0,0 +1,117 @@
+"""
+复合索引对各接口查询的影响: 删除 0015/0002 迁移新增的索引前后, 对比执行计划和耗时
+
+python -m benchmarks.bench_indexes [博客数量]
+"""
+import random
+import sys
+from datetime import timedelta
+
+from benchmarks.common import report, test_database
+
+from django.db import connection
+from django.utils import timezone
+
+# 被测试的索引: (模型, 索引名)
+AUDITED_INDEXES = [
+    ('blog.Blog', 'blog_list_order_idx'),
+    ('blog.Blog', 'blog_category_order_idx'),
+    ('blog.Blog', 'blog_created_idx'),
+    ('blog.Blog', 'blog_category_created_idx'),
+    ('blog.Blog', 'blog_view_count_idx'),
+    ('blog.Comment', 'comment_blog_time_idx'),
+    ('blog.Comment', 'comment_blog_root_idx'),
+    ('blog.Comment', 'comment_thread_idx'),
+    ('msgboard.Message', 'message_time_idx'),
+    ('msgboard.Reply', 'reply_message_time_idx'),
+]
+
+
+def seed(blog_count):
+    from blog.models import Blog, Category, Comment, Tag
+    from bloguser.models import BlogUser
+    from msgboard.models import Message, Reply
+
+    rng = random.Random(42)
+    now = timezone.now()
+    BlogUser.objects.bulk_create([
+        BlogUser(email=f'bench{i}@example.com', name=f'用户{i}', telephone=f'138{i:08d}') for i in range(200)
+    ])
+    users = list(BlogUser.objects.all())
+    categories = Category.objects.bulk_create([Category(name=f'分类{i}') for i in range(20)])
+    tags = Tag.objects.bulk_create([Tag(name=f'标签{i}') for i in range(50)])
+    Blog.objects.bulk_create([
+        Blog(
+            title=f'基准测试博客{i}', content='基准测试内容', summary='基准测试摘要',
+            category=rng.choice(categories), is_top=rng.random() < 0.01, view_count=rng.randint(0, 10000),
+        )
+        for i in range(blog_count)
+    ], batch_size=1000)
+    blog_ids = list(Blog.objects.values_list('id', flat=True))
+    # created_at 使用 auto_now_add, 批量写入后再打散
+    for blog_id in blog_ids[::max(1, len(blog_ids) // 200)]:
+        Blog.objects.filter(id__gte=blog_id).update(created_at=now - timedelta(days=blog_id % 1000))
+
+    through = Blog.tags.through
+    through.objects.bulk_create([
+        through(blog_id=blog_id, tag_id=tag.id)
+        for blog_id in blog_ids for tag in rng.sample(tags, 3)
+    ], batch_size=2000)
+
+    roots = Comment.objects.bulk_create([
+        Comment(user=rng.choice(users), content='评论', blog_id=rng.choice(blog_ids)) for _ in range(blog_count * 3)
+    ], batch_size=1000)
+    Comment.objects.bulk_create([
+        Comment(user=rng.choice(users), content='回复', blog_id=root.blog_id, parent_comment=root, root_comment=root)
+        for root in rng.sample(roots, len(roots) // 2)
+    ], batch_size=1000)
+
+    messages = Message.objects.bulk_create([Message(user=rng.choice(users), content='留言') for _ in range(blog_count)], batch_size=1000)
+    Reply.objects.bulk_create([
+        Reply(user=rng.choice(users), content='回复', message=rng.choice(messages)) for _ in range(blog_count * 2)
+    ], batch_size=1000)
+
+
+def audit(repeat):
+    from blog import queryaudit
+
+    results = {}
+    for name, queryset in queryaudit.audited_queries():
+        _, issues = queryaudit.explain(queryset)
+        results[name] = (', '.join(issues) or 'OK', queryaudit.time_query(queryset, repeat))
+    return results
+
+
+def drop_indexes():
+    from django.apps import apps
+
+    with connection.schema_editor() as editor:
+        for label, name in AUDITED_INDEXES:
+            model = apps.get_model(label)
+            index = next(index for index in model._meta.indexes if index.name == name)
+            editor.remove_index(model, index)
+
+
+def run(blog_count, repeat=50):
+    seed(blog_count)
+    with connection.cursor() as cursor:
+        if connection.vendor in ('sqlite', 'postgresql'):
+            cursor.execute('ANALYZE')
+    with_indexes = audit(repeat)
+    drop_indexes()
+    without_indexes = audit(repeat)
+
+    rows = []
+    for name, (after_plan, after_ms) in with_indexes.items():
+        before_plan, before_ms = without_indexes[name]
+        rows.append([name, before_plan, f'{before_ms:.2f}', after_plan, f'{after_ms:.2f}'])
+    report(
+        f'接口查询执行计划 ({blog_count} 篇博客, 每条查询执行 {repeat} 次)',
+        rows,
+        ['查询', '无索引', '耗时(ms)', '有索引', '耗时(ms)'],
+    )
+
+
+if __name__ == '__main__':
+    with test_database():
+        run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
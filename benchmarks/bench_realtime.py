@@ -0,0 +1,225 @@
+"""
+实时推送(SSE)负载测试: 单个进程能保持多少空闲连接, 以及一条事件推送给全部连接的耗时
+
+默认在进程内直接调用 ASGI 应用(myblog_backend.asgi.application, 与线上相同的 Django ASGI 处理流程),
+不经过网络, 统计:
+1. 建立 N 个 /api/realtime/board/ 连接(收到首条 retry 消息)的耗时和每个连接占用的内存
+2. 在其他线程中发布事件(与模型信号相同), 直到 N 个连接全部收到的耗时
+3. 断开全部连接后订阅表是否清空
+
+指定 --url 时改为通过 TCP 连接到已启动的 ASGI 服务(例如 uvicorn myblog_backend.asgi:application),
+建立 N 个连接并保持 --hold 秒(期间依靠心跳保持连接), 统计仍然存活的连接数。
+
+python -m benchmarks.bench_realtime [连接数] [--events 10] [--url http://127.0.0.1:8000/api/realtime/board/ --hold 30]
+本地运行请设置 BLOG_STORE_BACKEND=memory(或 REALTIME_BROKER=memory), 否则事件经过 Redis 广播
+"""
+import argparse
+import asyncio
+import resource
+import time
+from urllib.parse import urlsplit
+
+from benchmarks.common import report, test_database
+
+BOARD_PATH = '/api/realtime/board/'
+
+
+def rss_kib():
+    """
+    当前进程的常驻内存(KiB), 非 Linux 系统返回峰值
+    """
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def raise_file_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+
+
+class Tracker:
+    """
+    统计全部连接收到的消息数, 达到目标数量时唤醒等待方
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.target = None
+        self.reached = None
+
+    def expect(self, count):
+        self.target = self.count + count
+        self.reached = asyncio.get_running_loop().create_future()
+
+    def received(self):
+        self.count += 1
+        if self.target is not None and self.count >= self.target and not self.reached.done():
+            self.reached.set_result(None)
+
+
+class Connection:
+    """
+    模拟一个 ASGI 服务器上的 HTTP 连接: 请求体为空, 之后一直等待, 直到 close() 发出断开消息
+    """
+
+    def __init__(self, tracker, index):
+        self.tracker = tracker
+        self.index = index
+        self.request_sent = False
+        self.closed = asyncio.Event()
+        self.status = None
+
+    def scope(self):
+        return {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': BOARD_PATH,
+            'raw_path': BOARD_PATH.encode(),
+            'query_string': b'',
+            'root_path': '',
+            'headers': [(b'host', b'testserver'), (b'accept', b'text/event-stream')],
+            'client': ('127.0.0.1', 10000 + self.index),
+            'server': ('testserver', 80),
+        }
+
+    async def receive(self):
+        if not self.request_sent:
+            self.request_sent = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await self.closed.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        if message['type'] == 'http.response.start':
+            self.status = message['status']
+        elif message['type'] == 'http.response.body' and message.get('body'):
+            self.tracker.received()
+
+    def close(self):
+        self.closed.set()
+
+
+async def run_in_process(connections, events):
+    from myblog_backend.asgi import application
+    from realtime.broker import encode_event, get_broker, hub
+    from realtime.signals import BOARD_CHANNEL
+
+    tracker = Tracker()
+    rss_before = rss_kib()
+    start = time.perf_counter()
+    tracker.expect(connections)
+    clients = [Connection(tracker, index) for index in range(connections)]
+    tasks = [asyncio.create_task(application(client.scope(), client.receive, client.send)) for client in clients]
+    await tracker.reached
+    connect_elapsed = time.perf_counter() - start
+    rss_per_connection = (rss_kib() - rss_before) / connections
+    subscribed = hub.count(BOARD_CHANNEL)
+
+    broker = get_broker()
+    latencies = []
+    for index in range(events):
+        message = encode_event('message.created', {'id': index, 'content': '负载测试留言' * 10})
+        tracker.expect(connections)
+        start = time.perf_counter()
+        # 与模型信号相同, 在同步代码(其他线程)中发布
+        await asyncio.to_thread(broker.publish, BOARD_CHANNEL, message)
+        await tracker.reached
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for client in clients:
+        client.close()
+    await asyncio.gather(*tasks)
+    close_elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return [
+        ['代理', type(broker).__name__],
+        ['建立连接数', connections],
+        ['已订阅连接数', subscribed],
+        ['建立全部连接耗时(秒)', f'{connect_elapsed:.2f}'],
+        ['每个连接占用内存(KiB)', f'{rss_per_connection:.1f}'],
+        ['单条事件推送到全部连接(ms, 中位数)', f'{latencies[len(latencies) // 2] * 1000:.1f}'],
+        ['单条事件推送到全部连接(ms, 最大)', f'{latencies[-1] * 1000:.1f}'],
+        ['断开全部连接耗时(秒)', f'{close_elapsed:.2f}'],
+        ['断开后剩余订阅', hub.count(BOARD_CHANNEL)],
+    ]
+
+
+async def open_stream(host, port, path):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: {host}\r\nAccept: text/event-stream\r\n\r\n'.encode())
+    await writer.drain()
+    status = await reader.readline()
+    if b' 200 ' not in status:
+        writer.close()
+        raise ConnectionError(status.decode(errors='replace').strip())
+    await reader.readuntil(b'\r\n\r\n')
+    return reader, writer
+
+
+async def hold_stream(reader, hold):
+    """
+    持续读取 hold 秒, 连接在此期间被关闭时返回 False
+    """
+    deadline = time.monotonic() + hold
+    while (remaining := deadline - time.monotonic()) > 0:
+        try:
+            chunk = await asyncio.wait_for(reader.read(4096), remaining)
+        except asyncio.TimeoutError:
+            break
+        if not chunk:
+            return False
+    return True
+
+
+async def run_over_network(url, connections, hold):
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    start = time.perf_counter()
+    results = await asyncio.gather(*(open_stream(host, port, parts.path) for _ in range(connections)), return_exceptions=True)
+    connect_elapsed = time.perf_counter() - start
+    streams = [result for result in results if not isinstance(result, BaseException)]
+    alive = await asyncio.gather(*(hold_stream(reader, hold) for reader, _ in streams))
+    for _, writer in streams:
+        writer.close()
+    return [
+        ['地址', url],
+        ['尝试连接数', connections],
+        ['成功建立', len(streams)],
+        ['建立连接耗时(秒)', f'{connect_elapsed:.2f}'],
+        [f'保持 {hold} 秒后存活', sum(alive)],
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('connections', nargs='?', type=int, default=5000)
+    parser.add_argument('--events', type=int, default=10)
+    parser.add_argument('--url')
+    parser.add_argument('--hold', type=float, default=30)
+    args = parser.parse_args()
+    limit = raise_file_limit()
+
+    if args.url:
+        rows = asyncio.run(run_over_network(args.url, args.connections, args.hold))
+        report(f'SSE 空闲连接 (文件描述符上限 {limit})', rows, ['指标', '结果'])
+        return
+    with test_database():
+        rows = asyncio.run(run_in_process(args.connections, args.events))
+    report(f'SSE 进程内负载测试 ({args.connections} 个连接, {args.events} 条事件)', rows, ['指标', '结果'])
+
+
+if __name__ == '__main__':
+    main()
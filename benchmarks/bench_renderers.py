@@ -0,0 +1,94 @@
+"""
+API 渲染器对比: DRF 默认 JSONRenderer(标准库 json) vs OrjsonRenderer vs MessagePackRenderer
+
+对博客列表、博客详情(含评论)和留言列表(含嵌套回复)的序列化结果分别渲染, 比较耗时和输出大小。
+序列化只执行一次, 计时只包含渲染本身。
+
+python -m benchmarks.bench_renderers [重复次数]
+"""
+import sys
+
+from benchmarks.common import report, test_database, timed
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from myblog_backend.renderers import MessagePackRenderer, OrjsonRenderer
+
+
+def seed():
+    from blog.models import Blog, Category, Comment, Tag
+    from bloguser.models import BlogUser
+    from msgboard.models import Message, Reply
+
+    BlogUser.objects.bulk_create([
+        BlogUser(email=f'bench{i}@example.com', name=f'用户{i}', telephone=f'138{i:08d}') for i in range(20)
+    ])
+    users = list(BlogUser.objects.all())
+    category = Category.objects.create(name='基准测试')
+    tags = Tag.objects.bulk_create([Tag(name=f'标签{i}') for i in range(5)])
+    content = ('基准测试内容 benchmark content\n' * 200)
+    Blog.objects.bulk_create([
+        Blog(title=f'基准测试博客{i}', content=content, summary='基准测试摘要内容' * 5, category=category)
+        for i in range(20)
+    ])
+    blogs = list(Blog.objects.all())
+    for blog in blogs:
+        blog.tags.set(tags)
+    Comment.objects.bulk_create([
+        Comment(user=users[i % len(users)], content=f'评论内容{i}' * 10, blog=blogs[0]) for i in range(100)
+    ])
+    messages = Message.objects.bulk_create([
+        Message(user=users[i % len(users)], content=f'留言内容{i}' * 10) for i in range(50)
+    ])
+    Reply.objects.bulk_create([
+        Reply(user=users[i % len(users)], content=f'回复内容{i}' * 5, message=messages[i % len(messages)]) for i in range(200)
+    ])
+    return blogs[0]
+
+
+def payloads(blog):
+    from blog.models import Blog
+    from blog.serializers import BlogDetailSerializer, BlogListSerializer
+    from msgboard.models import Message
+    from msgboard.serializers import MessageSerializer, prefetch_reply_preview, with_reply_count
+
+    context = {'request': Request(APIRequestFactory().get('/', {'include': 'content'}))}
+    blogs = Blog.objects.select_related('category').prefetch_related('tags')
+    return [
+        ('博客列表(20 篇, 含正文)', BlogListSerializer(blogs, many=True, context=context).data),
+        ('博客详情(100 条评论)', BlogDetailSerializer(blog, context=context).data),
+        ('留言列表(50 条留言, 每条内嵌前 3 条回复)', MessageSerializer(
+            prefetch_reply_preview(list(with_reply_count(Message.objects.select_related('user')))), many=True,
+        ).data),
+    ]
+
+
+def run(repeat):
+    renderers = [('json(标准库)', JSONRenderer()), ('orjson', OrjsonRenderer())]
+    try:
+        import msgpack  # noqa: F401
+        renderers.append(('msgpack', MessagePackRenderer()))
+    except ImportError:
+        print('未安装 msgpack, 跳过 MessagePackRenderer')
+
+    rows = []
+    for name, data in payloads(seed()):
+        baseline = None
+        for renderer_name, renderer in renderers:
+            size = len(renderer.render(data))
+            elapsed, _ = timed(lambda: renderer.render(data), repeat)
+            per_call = elapsed / repeat * 1000
+            baseline = baseline or per_call
+            rows.append([name, renderer_name, size, f'{per_call:.3f}', f'{baseline / per_call:.1f}x'])
+    report(
+        f'API 渲染器对比 (每种数据渲染 {repeat} 次)',
+        rows,
+        ['数据', '渲染器', '大小(字节)', '每次耗时(ms)', '相对标准库'],
+    )
+
+
+if __name__ == '__main__':
+    with test_database():
+        run(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,50 @@
+"""
+博客详情页吞吐量: 直接 UPDATE 阅读量 vs 阅读量写缓冲
+
+python -m benchmarks.bench_view_counter [请求次数]
+"""
+import sys
+
+from benchmarks.common import count_queries, report, seed_blogs, test_database, timed
+
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+
+def run(requests):
+    from blog import viewcounter
+    from blog.models import Blog
+
+    blog = seed_blogs(1)[0]
+    client = APIClient()
+    url = f'/api/blog/blogs/{blog.id}/'
+    rows = []
+
+    for buffered in (False, True):
+        with override_settings(BLOG_VIEW_COUNT_BUFFER=buffered):
+            client.get(url)
+            with count_queries() as counter:
+                client.get(url)
+            elapsed, rate = timed(lambda: client.get(url), requests)
+            rows.append([
+                '写缓冲' if buffered else '直接 UPDATE',
+                requests,
+                f'{elapsed:.3f}',
+                f'{rate:.1f}',
+                counter.count,
+            ])
+
+    flushed = viewcounter.flush()
+    blog.refresh_from_db()
+    report(
+        '博客详情页吞吐量',
+        rows,
+        ['模式', '请求数', '耗时(秒)', '请求/秒', '每次请求 SQL 数'],
+    )
+    print(f'\n写回 {sum(flushed.values())} 次阅读, 最终阅读量 {blog.view_count} (期望 {2 * (requests + 2)})')
+    assert blog.view_count == Blog.objects.get(id=blog.id).view_count == 2 * (requests + 2)
+
+
+if __name__ == '__main__':
+    with test_database():
+        run(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,93 @@
+"""
+基准测试公共工具
+
+所有基准测试都在临时测试数据库中运行, 结束后自动销毁, 不会影响业务数据。
+用法(在项目根目录执行): python -m benchmarks.bench_view_counter
+"""
+import contextlib
+import os
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'myblog_backend.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.test.utils import setup_test_environment, teardown_test_environment  # noqa: E402
+
+
+@contextlib.contextmanager
+def test_database():
+    """
+    创建临时测试数据库, 退出时销毁
+    """
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def seed_blogs(count, content_length=4000):
+    """
+    生成指定数量的博客, 返回博客列表
+    """
+    from blog.models import Blog, Category
+
+    category = Category.objects.create(name='基准测试')
+    content = ('基准测试内容 benchmark content ' * (content_length // 20 + 1))[:content_length]
+    Blog.objects.bulk_create([
+        Blog(title=f'基准测试博客{i}', content=content, summary='基准测试摘要内容', category=category)
+        for i in range(count)
+    ])
+    return list(Blog.objects.all())
+
+
+class QueryCounter:
+    """
+    统计执行的 SQL 数量; CaptureQueriesContext 会被每次请求开始时的 reset_queries 清空, 因此不适用于测试客户端
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+@contextlib.contextmanager
+def count_queries():
+    counter = QueryCounter()
+    with connection.execute_wrapper(counter):
+        yield counter
+
+
+def timed(func, repeat):
+    """
+    重复执行 func, 返回 (总耗时秒数, 每秒执行次数)
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = time.perf_counter() - start
+    return elapsed, repeat / elapsed if elapsed else float('inf')
+
+
+def report(title, rows, headers):
+    """
+    以对齐的表格打印结果
+    """
+    print(f'\n{title}')
+    widths = [max(len(str(h)), *(len(str(r[i])) for r in rows)) for i, h in enumerate(headers)]
+    print('  '.join(str(h).ljust(w) for h, w in zip(headers, widths)))
+    for row in rows:
+        print('  '.join(str(c).ljust(w) for c, w in zip(row, widths)))
@@ -0,0 +1,71 @@
+"""
+博客按月归档
+
+归档数据保存在 BlogArchiveMonth 中(每月一行), 读取时不需要对 Blog 表执行 GROUP BY:
+- 博客创建/删除时通过信号对所在月份 +1/-1
+- bulk_create 等不触发信号的批量写入之后, 使用 rebuildarchive 命令重算
+"""
+from datetime import datetime
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+from .models import Blog, BlogArchiveMonth
+
+
+def adjust(created_at, amount):
+    """
+    调整博客创建时间所在月份的数量
+    """
+    filters = {'year': created_at.year, 'month': created_at.month}
+    if amount < 0:
+        BlogArchiveMonth.objects.filter(blog_count__gte=-amount, **filters).update(blog_count=F('blog_count') + amount)
+        return
+    if BlogArchiveMonth.objects.filter(**filters).update(blog_count=F('blog_count') + amount):
+        return
+    try:
+        with transaction.atomic():
+            BlogArchiveMonth.objects.create(blog_count=amount, **filters)
+    except IntegrityError:
+        # 并发请求已创建该月份
+        BlogArchiveMonth.objects.filter(**filters).update(blog_count=F('blog_count') + amount)
+
+
+def rebuild():
+    """
+    用一条 GROUP BY 查询重算全部月份, 返回月份数量
+    """
+    rows = (
+        Blog.objects.order_by()
+        .annotate(year=ExtractYear('created_at'), month=ExtractMonth('created_at'))
+        .values('year', 'month')
+        .annotate(blog_count=Count('id'))
+    )
+    months = [BlogArchiveMonth(year=row['year'], month=row['month'], blog_count=row['blog_count']) for row in rows]
+    with transaction.atomic():
+        BlogArchiveMonth.objects.all().delete()
+        BlogArchiveMonth.objects.bulk_create(months)
+    return len(months)
+
+
+def buckets():
+    """
+    返回按年分组的归档: [{'year', 'count', 'months': [{'month', 'count'}]}], 年份和月份均倒序
+    """
+    years = []
+    for month in BlogArchiveMonth.objects.filter(blog_count__gt=0).order_by('-year', '-month'):
+        if not years or years[-1]['year'] != month.year:
+            years.append({'year': month.year, 'count': 0, 'months': []})
+        years[-1]['count'] += month.blog_count
+        years[-1]['months'].append({'month': month.month, 'count': month.blog_count})
+    return years
+
+
+def month_range(year, month):
+    """
+    返回月份的 [开始时间, 下月开始时间), 月份无效时抛出 ValueError
+    """
+    start = datetime(year, month, 1)
+    end = datetime(year + month // 12, month % 12 + 1, 1)
+    return start, end
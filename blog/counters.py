@@ -0,0 +1,101 @@
+"""
+博客计数字段(view_count、comment_count)的更新与校正
+
+- 计数只通过单列的 UPDATE ... SET x = x + n 原子更新, 不读取、不保存整行,
+  不会修改 updated_at, 也不会触发 Blog 的 post_save 信号(搜索索引、相关博客等)
+- 减少计数时不会小于 0; 计数列是无符号整数, 用 CASE 判断而不是先相减再取较大值,
+  避免 MySQL 在计算中间结果时报越界错误
+- 计数与实际数据出现偏差时, 用 reconcilecounts 命令按实际数据重算
+"""
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Value, When
+
+from myblog_backend.versioning import bump_version
+from .models import Blog, Comment
+
+# 每条 UPDATE 语句最多处理的博客数量
+BATCH_SIZE = 500
+
+# 可由实际数据重算的计数: 计数字段 -> (被计数的模型, 指向博客的外键列)
+RECOUNTABLE = {
+    'comment_count': (Comment, 'blog_id'),
+}
+
+
+def counter_expression(field, amount):
+    if amount >= 0:
+        return F(field) + amount
+    return Case(
+        When(**{f'{field}__gt': -amount}, then=F(field) + amount),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def increment(blog_id, field, amount=1):
+    """
+    原子地把博客的计数字段加上 amount(可以为负数), 返回更新的行数
+    """
+    if not amount:
+        return 0
+    return Blog.objects.filter(id=blog_id).update(**{field: counter_expression(field, amount)})
+
+
+def decrement(blog_id, field, amount=1):
+    return increment(blog_id, field, -amount)
+
+
+def apply_deltas(field, deltas, batch_size=BATCH_SIZE):
+    """
+    用 CASE WHEN 分批把 {blog_id: 增量} 加到计数字段上, 每批一条 UPDATE
+    """
+    blog_ids = sorted(blog_id for blog_id, delta in deltas.items() if delta)
+    for start in range(0, len(blog_ids), batch_size):
+        batch = blog_ids[start:start + batch_size]
+        increment = Case(
+            *[When(id=blog_id, then=Value(deltas[blog_id])) for blog_id in batch],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+        Blog.objects.filter(id__in=batch).update(**{field: F(field) + increment})
+
+
+def set_values(field, values, batch_size=BATCH_SIZE):
+    """
+    用 CASE WHEN 分批把计数字段设为 {blog_id: 值}
+    """
+    blog_ids = sorted(values)
+    for start in range(0, len(blog_ids), batch_size):
+        batch = blog_ids[start:start + batch_size]
+        value = Case(
+            *[When(id=blog_id, then=Value(values[blog_id])) for blog_id in batch],
+            output_field=IntegerField(),
+        )
+        Blog.objects.filter(id__in=batch).update(**{field: value})
+
+
+def actual_counts(field):
+    """
+    一条分组查询得到每篇博客的实际数量, 返回 {blog_id: 数量}(数量为 0 的博客不在其中)
+    """
+    model, column = RECOUNTABLE[field]
+    rows = model.objects.order_by().values(column).annotate(total=Count('pk')).values_list(column, 'total')
+    return dict(rows)
+
+
+def reconcile(field, batch_size=BATCH_SIZE, dry_run=False):
+    """
+    按实际数据校正计数字段, 返回 {blog_id: (原计数, 实际数量)}
+    只更新出现偏差的博客; 校正过程中新增或删除的数据造成的偏差会在下次校正时修正
+    """
+    counts = actual_counts(field)
+    drift = {}
+    for blog_id, current in Blog.objects.order_by('id').values_list('id', field).iterator(chunk_size=batch_size * 10):
+        actual = counts.get(blog_id, 0)
+        if current != actual:
+            drift[blog_id] = (current, actual)
+    if drift and not dry_run:
+        with transaction.atomic():
+            set_values(field, {blog_id: actual for blog_id, (_, actual) in drift.items()}, batch_size)
+        bump_version('blogs', *[('blog', blog_id) for blog_id in drift])
+    return drift
@@ -0,0 +1,181 @@
+"""
+博客详情的读穿透(read-through)缓存
+
+- 缓存序列化后的详情数据(不含阅读量、评论数这类实时计数, 读取时从数据库覆盖)
+- 缓存键包含博客和分类/标签的版本号(见 myblog_backend/versioning.py), Blog/Comment/Category/Tag
+  的 post_save、post_delete 和标签的 m2m_changed 信号会更新版本号, 旧的缓存项不再被读取, 到期自动清除
+- 缓存未命中时只有一个请求负责构建, 其余请求短暂等待构建结果, 避免缓存击穿
+- 评论者的昵称和头像也在缓存中, 变化时由信号更新其评论过的博客的版本号
+- BLOG_DETAIL_CACHE_STATS 开启时统计命中/未命中次数(每个请求多一次缓存写入), 可通过 BlogViewSet.cache_stats 接口查看
+- 客户端接受 gzip 时, 渲染后的 JSON 以 GzipTemplate 形式缓存: 除计数字段外的内容只压缩一次,
+  每次请求只压缩计数字段的值(见 myblog_backend/compression.py); 缓存键包含渲染器的格式
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework.renderers import JSONRenderer
+
+from myblog_backend import compression
+
+from . import neighbors
+from .mixins import split_query_param
+
+DETAIL_KEY = 'blog:detail:{}:{}:{}'
+LOCK_KEY = 'blog:detail:lock:{}:{}:{}'
+GZIP_KEY = 'blog:detail:gzip:{}:{}:{}:{}'
+HITS_KEY = 'blog:detail:stats:hits'
+MISSES_KEY = 'blog:detail:stats:misses'
+# 实时计数字段, 不写入缓存
+COUNTER_FIELDS = ('view_count', 'comment_count')
+# 构建锁的过期时间, 防止构建进程异常退出后锁无法释放
+LOCK_TIMEOUT = 10
+# 未获得构建锁的请求最多等待的时间和轮询间隔(秒)
+LOCK_WAIT = 2
+LOCK_POLL_INTERVAL = 0.05
+
+
+def is_enabled():
+    return settings.BLOG_DETAIL_CACHE_TTL > 0
+
+
+def params_digest(request):
+    """
+    影响输出内容的查询参数摘要, 不同的字段组合分别缓存
+    """
+    parts = [','.join(sorted(split_query_param(request, name))) for name in ('fields', 'omit', 'include')]
+    parts.append(request.query_params.get('comments_limit', ''))
+    parts.append(neighbors.get_scope(request))
+    return hashlib.md5('|'.join(parts).encode()).hexdigest()[:12]
+
+
+def _incr(key):
+    if not settings.BLOG_DETAIL_CACHE_STATS:
+        return
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # 计数键恰好被清除, 忽略这一次统计
+        pass
+
+
+def get_detail(request, blog_id, version, build):
+    """
+    读取博客详情, 未命中时调用 build() 生成序列化数据并写入缓存
+    version 为博客当前版本的标识(通常是条件请求使用的 ETag)
+    返回的数据不含实时计数字段, 由调用方覆盖
+    """
+    if not is_enabled():
+        return strip_counters(build())
+
+    digest = params_digest(request)
+    version = version.strip('"')
+    key = DETAIL_KEY.format(blog_id, version, digest)
+    data = cache.get(key)
+    if data is not None:
+        _incr(HITS_KEY)
+        return data
+    _incr(MISSES_KEY)
+
+    lock_key = LOCK_KEY.format(blog_id, version, digest)
+    if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+        # 其他请求正在构建, 等待构建结果; 超时后自行构建但不写缓存
+        deadline = time.monotonic() + LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            data = cache.get(key)
+            if data is not None:
+                return data
+        return strip_counters(build())
+
+    try:
+        data = strip_counters(build())
+        cache.set(key, data, settings.BLOG_DETAIL_CACHE_TTL)
+    finally:
+        cache.delete(lock_key)
+    return data
+
+
+def compressed_response(request, blog_id, version, data, headers, **counters):
+    """
+    返回 gzip 压缩的详情响应; 不适用时(未开启压缩、客户端不接受 gzip、非 JSON 输出、内容小于压缩阈值)返回 None
+    data 为 get_detail 返回的数据(计数字段为 None), counters 为实时计数
+    """
+    renderer = getattr(request, 'accepted_renderer', None)
+    if (
+        not is_enabled()
+        or not compression.is_enabled()
+        or not isinstance(renderer, JSONRenderer)
+        # 带参数的媒体类型(如 indent)不使用模板
+        or request.accepted_media_type != renderer.media_type
+        or 'gzip' not in compression.accepted_encodings(request)
+    ):
+        return None
+
+    key = GZIP_KEY.format(blog_id, renderer.format, version.strip('"'), params_digest(request))
+    template = cache.get(key)
+    if template is None:
+        body = renderer.render(data, renderer.media_type, {'request': request})
+        placeholders = [b'"%s":null' % name.encode() for name in COUNTER_FIELDS if name in data]
+        try:
+            if len(body) < settings.RESPONSE_COMPRESSION_MIN_SIZE:
+                raise ValueError('内容小于压缩阈值')
+            template = compression.GzipTemplate(body, placeholders)
+        except ValueError:
+            # 记录为不适用, 避免每次请求都重新渲染
+            template = False
+        cache.set(key, template, settings.BLOG_DETAIL_CACHE_TTL)
+    if template is False:
+        return None
+
+    length, content = template.render({
+        b'"%s":null' % name.encode(): b'"%s":%d' % (name.encode(), counters[name])
+        for name in COUNTER_FIELDS if name in data
+    })
+    response = HttpResponse(content, content_type=renderer.media_type, headers=headers)
+    response.headers['Content-Encoding'] = 'gzip'
+    response.headers['Content-Length'] = str(len(content))
+    patch_vary_headers(response, ('Accept', 'Accept-Encoding'))
+    compression.weaken_etag(response)
+    return response
+
+
+def strip_counters(data):
+    """
+    清空实时计数字段的值, 保留字段位置以便按原顺序覆盖
+    """
+    data = dict(data)
+    for name in COUNTER_FIELDS:
+        if name in data:
+            data[name] = None
+    return data
+
+
+def with_counters(data, **counters):
+    """
+    用实时计数覆盖缓存数据中的计数字段(仅覆盖请求中选择了的字段)
+    """
+    data = dict(data)
+    for name in COUNTER_FIELDS:
+        if name in data:
+            data[name] = counters[name]
+    return data
+
+
+def stats():
+    hits = cache.get(HITS_KEY) or 0
+    misses = cache.get(MISSES_KEY) or 0
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else None,
+    }
+
+
+def reset_stats():
+    cache.delete_many([HITS_KEY, MISSES_KEY])
@@ -0,0 +1,203 @@
+"""
+只读序列化快速路径
+
+列表接口默认由 ModelSerializer 为每一行创建模型实例并逐字段调用 DRF 的字段机制。
+这里按序列化器(已按 fields/omit/include 裁剪)编译出一份"取值计划":
+- 普通字段映射为 values() 的列, 整数、布尔、字符串和外键主键原样输出, 朴素的日期时间直接转为
+  ISO 8601 字符串, 其他类型仍调用对应字段的 to_representation, 保证输出格式一致
+- 嵌套的单个对象(外键)映射为带前缀的列, 在同一条查询中 JOIN 读取
+- 嵌套的多对多列表(如标签)每页额外一条查询批量读取, 顺序与 prefetch_related 一致
+- SerializerMethodField 需要在 METHOD_FIELDS 中登记取值所需的列和计算函数, 未登记时不能使用快速路径
+
+- 关联字段只支持外键的 PrimaryKeyRelatedField(values() 只能取到外键列); 多对多的 ManyRelatedField、
+  SlugRelatedField/StringRelatedField 等需要模型实例的关联字段抛出 UnsupportedField, 回退到原序列化器
+
+输出与原序列化器完全一致(见 tests.py 中的对比测试), 通过 BLOG_FAST_SERIALIZATION 开启(默认关闭)。
+"""
+from django.conf import settings
+from django.db.models import F
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+from bloguser.serializers import UserModelSerializer, absolute_avatar_url
+from .serializers import CommentSerializer
+
+# 取值后原样输出的字段类型
+IDENTITY_FIELDS = (
+    serializers.IntegerField,
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.PrimaryKeyRelatedField,
+)
+
+
+class UnsupportedField(Exception):
+    pass
+
+
+def user_avatar_url(avatar, context):
+    # 与 UserModelSerializer.get_avatar_url 一致
+    return absolute_avatar_url(avatar, context.get('request'))
+
+
+# (序列化器类, 字段名) -> (所需的列, 计算函数(各列的值..., context))
+METHOD_FIELDS = {
+    (UserModelSerializer, 'avatar_url'): (('avatar',), user_avatar_url),
+    (CommentSerializer, 'reply_to'): (('parent_comment__user__name',), lambda name, context: name),
+}
+
+
+def datetime_converter(field):
+    """
+    未开启时区(USE_TZ=False)且输出 ISO 8601 格式时, 朴素时间直接调用 isoformat(),
+    与 DateTimeField.to_representation 的结果相同; 其他情况仍调用字段的 to_representation
+    """
+    fallback = field.to_representation
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() != ISO_8601 or getattr(field, 'timezone', None) or field.default_timezone():
+        return fallback
+
+    def convert(value):
+        return fallback(value) if value.tzinfo is not None else value.isoformat()
+
+    return convert
+
+
+def converter_for(field):
+    if isinstance(field, serializers.ManyRelatedField) or (
+        isinstance(field, serializers.RelatedField) and not isinstance(field, serializers.PrimaryKeyRelatedField)
+    ):
+        # values() 的一行只有外键列, 多对多会得到重复的 JOIN 行, 其他关联字段需要模型实例
+        raise UnsupportedField(field.field_name)
+    if isinstance(field, IDENTITY_FIELDS):
+        return None
+    if isinstance(field, serializers.DateTimeField):
+        return datetime_converter(field)
+    return field.to_representation
+
+
+def is_enabled():
+    return settings.BLOG_FAST_SERIALIZATION
+
+
+def find_method_field(serializer, name):
+    for klass in type(serializer).__mro__:
+        if (klass, name) in METHOD_FIELDS:
+            return METHOD_FIELDS[(klass, name)]
+    raise UnsupportedField(f'{type(serializer).__name__}.{name}')
+
+
+class ValuesPlan:
+    """
+    由序列化器编译的取值计划, 不支持的字段抛出 UnsupportedField
+    """
+
+    def __init__(self, serializer, prefix='', model=None):
+        self.model = model or serializer.Meta.model
+        self.columns = []
+        self.steps = []
+        self.many = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.SerializerMethodField):
+                columns, func = find_method_field(serializer, name)
+                columns = [prefix + column for column in columns]
+                self.columns += columns
+                self.steps.append((name, 'method', (columns, func)))
+            elif isinstance(field, serializers.ListSerializer):
+                if prefix or not isinstance(field.child, serializers.ModelSerializer):
+                    raise UnsupportedField(name)
+                model_field = self.model._meta.get_field(field.source)
+                if not model_field.many_to_many:
+                    raise UnsupportedField(name)
+                child = ValuesPlan(field.child, model=model_field.related_model)
+                if child.many:
+                    raise UnsupportedField(name)
+                self.many.append((name, model_field, child))
+                self.steps.append((name, 'many', child))
+            elif isinstance(field, serializers.ModelSerializer):
+                source = prefix + field.source.replace('.', '__')
+                child = ValuesPlan(field, prefix=source + '__')
+                if child.many:
+                    raise UnsupportedField(name)
+                # 外键列为空时嵌套对象输出 None
+                self.columns += [source] + child.columns
+                self.steps.append((name, 'nested', (source, child)))
+            elif field.source == '*' or not isinstance(field, serializers.Field):
+                raise UnsupportedField(name)
+            else:
+                if isinstance(field, serializers.PrimaryKeyRelatedField) and not prefix and '.' not in field.source:
+                    model_field = self.model._meta.get_field(field.source)
+                    if not (model_field.many_to_one or model_field.one_to_one) or not model_field.concrete:
+                        # 反向外键或多对多, 一行取不到完整的值
+                        raise UnsupportedField(name)
+                column = prefix + field.source.replace('.', '__')
+                self.columns.append(column)
+                converter = converter_for(field)
+                self.steps.append((name, 'value', (column, converter)))
+        self.columns = list(dict.fromkeys(self.columns))
+
+    def values(self, queryset, always_load=('id',)):
+        """
+        返回只读取所需列的 values() 查询集
+        """
+        return queryset.values(*dict.fromkeys(['pk', *always_load, *self.columns]))
+
+    def load_many(self, rows, context):
+        """
+        每个多对多字段一条查询, 返回 {字段名: {主键: [序列化结果]}}
+        同一个关联对象只序列化一次, 各行共用结果
+        """
+        ids = [row['pk'] for row in rows]
+        result = {}
+        for name, model_field, child in self.many:
+            query_name = model_field.related_query_name()
+            # 与 prefetch_related 相同的查询(默认排序), 附带所属对象的主键
+            related = (
+                model_field.related_model.objects
+                .filter(**{f'{query_name}__in': ids})
+                .annotate(fastpath_owner=F(f'{query_name}__pk'))
+                .values('fastpath_owner', 'pk', *child.columns)
+            )
+            grouped, built = {}, {}
+            for values in related:
+                if values['pk'] not in built:
+                    built[values['pk']] = child.build(values, context)
+                grouped.setdefault(values['fastpath_owner'], []).append(built[values['pk']])
+            result[name] = grouped
+        return result
+
+    def build(self, row, context, many=None):
+        data = {}
+        for name, kind, payload in self.steps:
+            if kind == 'value':
+                column, converter = payload
+                value = row[column]
+                data[name] = value if value is None or converter is None else converter(value)
+            elif kind == 'nested':
+                column, child = payload
+                data[name] = None if row[column] is None else child.build(row, context)
+            elif kind == 'method':
+                columns, func = payload
+                data[name] = func(*[row[column] for column in columns], context)
+            else:
+                data[name] = many[name].get(row['pk'], [])
+        return data
+
+    def serialize(self, rows, context):
+        rows = list(rows)
+        many = self.load_many(rows, context) if self.many else None
+        return [self.build(row, context, many) for row in rows]
+
+
+def compile_plan(serializer):
+    """
+    返回序列化器的取值计划, 不支持快速路径时返回 None
+    """
+    if not is_enabled():
+        return None
+    try:
+        return ValuesPlan(serializer)
+    except UnsupportedField:
+        return None
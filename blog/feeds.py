@@ -0,0 +1,227 @@
+"""
+RSS/Atom 订阅和站点地图
+
+- 全站、分类(含子孙分类)、标签三种订阅, 各有 RSS 2.0 和 Atom 两种格式
+- 输出通过 StreamingHttpResponse 边查询边生成, 查询使用 .iterator() 分批读取, 不会一次性加载全部博客
+- 生成完成的输出按资源版本号缓存, 博客/分类/标签变化后版本号更新, 旧缓存不再被读取
+- 支持条件请求(ETag / Last-Modified)
+- 博客链接指向前端页面: FRONTEND_URL + BLOG_FRONTEND_PATH; 订阅自身和分页站点地图的链接按 SITE_URL 生成,
+  未配置时按请求的地址生成, 此时缓存键包含请求的协议和域名
+"""
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from xml.sax.saxutils import escape, quoteattr
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.db.models import Q
+from django.urls import reverse
+from django.views.decorators.http import require_GET
+
+from myblog_backend.versioning import conditional, versions_etag
+from .filters import category_condition
+from .models import Blog, Category, Tag
+
+# 订阅中的博客数量
+FEED_LIMIT = 50
+# 单个站点地图文件最多包含的链接数(协议上限为 50000)
+SITEMAP_LIMIT = 50000
+ITERATOR_CHUNK_SIZE = 500
+FEED_CACHE_KEY = 'blog:feed:{}:{}'
+FEED_CACHE_TTL = 60 * 60 * 24
+# 超过该大小的输出不缓存, 避免在内存中累积过大的响应
+FEED_CACHE_MAX_BYTES = 5 * 1024 * 1024
+
+CONTENT_TYPES = {
+    'rss': 'application/rss+xml; charset=utf-8',
+    'atom': 'application/atom+xml; charset=utf-8',
+    'sitemap': 'application/xml; charset=utf-8',
+}
+
+FEED_VERSIONS = ['blogs', 'taxonomy']
+SITEMAP_VERSIONS = ['blogs']
+
+
+def blog_url(blog_id):
+    return settings.FRONTEND_URL.rstrip('/') + settings.BLOG_FRONTEND_PATH.format(id=blog_id)
+
+
+def site_base(request):
+    """
+    站点自身链接的前缀: 配置了 SITE_URL 时使用 SITE_URL, 否则使用请求的协议和域名
+    """
+    return settings.SITE_URL.rstrip('/') or request.build_absolute_uri('/').rstrip('/')
+
+
+def rfc822(value):
+    return format_datetime(value.replace(tzinfo=timezone.utc))
+
+
+def rfc3339(value):
+    return value.replace(tzinfo=timezone.utc, microsecond=0).isoformat()
+
+
+def cached_stream(request, name, versions, content_type, chunks):
+    """
+    缓存命中时直接返回缓存内容; 否则流式输出, 输出完整结束后写入缓存
+    缓存键包含站点链接前缀和 versions 中各资源的版本号
+    """
+    key = FEED_CACHE_KEY.format(f'{site_base(request)}:{name}', versions_etag(versions)[0].strip('"'))
+    body = cache.get(key)
+    if body is not None:
+        return HttpResponse(body, content_type=content_type)
+
+    def tee():
+        parts, size = [], 0
+        for chunk in chunks:
+            data = chunk.encode('utf-8')
+            if parts is not None:
+                parts.append(data)
+                size += len(data)
+                if size > FEED_CACHE_MAX_BYTES:
+                    parts = None
+            yield data
+        # 客户端中途断开时生成器被关闭, 不会执行到这里, 不完整的输出不会被缓存
+        if parts is not None:
+            cache.set(key, b''.join(parts), FEED_CACHE_TTL)
+
+    return StreamingHttpResponse(tee(), content_type=content_type)
+
+
+def feed_blogs(queryset):
+    return (
+        queryset.select_related('category')
+        .only('id', 'title', 'summary', 'created_at', 'updated_at', 'category__name')
+        .order_by('-created_at', '-id')[:FEED_LIMIT]
+        .iterator(chunk_size=ITERATOR_CHUNK_SIZE)
+    )
+
+
+def rss_chunks(title, link, self_link, blogs):
+    yield '<?xml version="1.0" encoding="utf-8"?>\n'
+    yield '<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom"><channel>'
+    yield f'<title>{escape(title)}</title><link>{escape(link)}</link><description>{escape(title)}</description>'
+    yield f'<atom:link href={quoteattr(self_link)} rel="self" type="application/rss+xml"/>'
+    for blog in blogs:
+        url = escape(blog_url(blog.id))
+        yield (
+            f'<item><title>{escape(blog.title)}</title><link>{url}</link>'
+            f'<guid isPermaLink="true">{url}</guid>'
+            f'<description>{escape(blog.summary or "")}</description>'
+            f'<category>{escape(blog.category.name)}</category>'
+            f'<pubDate>{rfc822(blog.created_at)}</pubDate></item>'
+        )
+    yield '</channel></rss>'
+
+
+def atom_chunks(title, link, self_link, blogs):
+    blogs = iter(blogs)
+    first = next(blogs, None)
+    yield '<?xml version="1.0" encoding="utf-8"?>\n'
+    yield '<feed xmlns="http://www.w3.org/2005/Atom">'
+    yield f'<title>{escape(title)}</title><id>{escape(self_link)}</id>'
+    yield f'<link href={quoteattr(link)}/><link href={quoteattr(self_link)} rel="self"/>'
+    # 订阅按创建时间倒序, 以第一篇博客的更新时间作为订阅的更新时间
+    updated = first.updated_at if first is not None else datetime.now()
+    yield f'<updated>{rfc3339(updated)}</updated>'
+    if first is not None:
+        yield atom_entry(first)
+    for blog in blogs:
+        yield atom_entry(blog)
+    yield '</feed>'
+
+
+def atom_entry(blog):
+    url = blog_url(blog.id)
+    return (
+        f'<entry><title>{escape(blog.title)}</title><link href={quoteattr(url)}/><id>{escape(url)}</id>'
+        f'<published>{rfc3339(blog.created_at)}</published><updated>{rfc3339(blog.updated_at)}</updated>'
+        f'<summary>{escape(blog.summary or "")}</summary>'
+        f'<category term={quoteattr(blog.category.name)}/></entry>'
+    )
+
+
+def render_feed(request, fmt, name, title, queryset):
+    if fmt not in ('rss', 'atom'):
+        raise Http404
+    chunks = rss_chunks if fmt == 'rss' else atom_chunks
+    generator = chunks(title, settings.FRONTEND_URL, site_base(request) + request.path, feed_blogs(queryset))
+    return cached_stream(request, f'{name}:{fmt}', FEED_VERSIONS, CONTENT_TYPES[fmt], generator)
+
+
+feed_conditional = conditional(lambda request, *args, **kwargs: FEED_VERSIONS)
+sitemap_conditional = conditional(lambda request, *args, **kwargs: SITEMAP_VERSIONS)
+
+
+@require_GET
+@feed_conditional
+def blog_feed(request, fmt):
+    return render_feed(request, fmt, 'all', '全部博客', Blog.objects.all())
+
+
+@require_GET
+@feed_conditional
+def category_feed(request, pk, fmt):
+    category = Category.objects.filter(pk=pk).only('id', 'name').first()
+    if category is None:
+        raise Http404
+    # 包含子孙分类; 路径尚未生成时只包含分类自身, 不能用空前缀匹配全部分类
+    condition = category_condition([category.id], descendants=True) or Q(category_id=category.id)
+    queryset = Blog.objects.filter(condition)
+    return render_feed(request, fmt, f'category:{pk}', f'分类: {category.name}', queryset)
+
+
+@require_GET
+@feed_conditional
+def tag_feed(request, pk, fmt):
+    tag = Tag.objects.filter(pk=pk).only('id', 'name').first()
+    if tag is None:
+        raise Http404
+    return render_feed(request, fmt, f'tag:{pk}', f'标签: {tag.name}', Blog.objects.filter(tags=tag))
+
+
+def sitemap_chunks(blogs):
+    yield '<?xml version="1.0" encoding="utf-8"?>\n'
+    yield '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+    for blog_id, updated_at in blogs:
+        yield f'<url><loc>{escape(blog_url(blog_id))}</loc><lastmod>{rfc3339(updated_at)}</lastmod></url>'
+    yield '</urlset>'
+
+
+def sitemap_index_chunks(request, pages):
+    yield '<?xml version="1.0" encoding="utf-8"?>\n'
+    yield '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+    for page in range(1, pages + 1):
+        url = site_base(request) + reverse('sitemap-page', args=[page])
+        yield f'<sitemap><loc>{escape(url)}</loc></sitemap>'
+    yield '</sitemapindex>'
+
+
+def sitemap_page_blogs(page):
+    return (
+        Blog.objects.order_by('id')
+        .values_list('id', 'updated_at')[(page - 1) * SITEMAP_LIMIT:page * SITEMAP_LIMIT]
+        .iterator(chunk_size=ITERATOR_CHUNK_SIZE * 4)
+    )
+
+
+@require_GET
+@sitemap_conditional
+def sitemap(request):
+    """
+    博客数量不超过 SITEMAP_LIMIT 时直接返回站点地图, 否则返回站点地图索引
+    """
+    total = Blog.objects.count()
+    if total <= SITEMAP_LIMIT:
+        return cached_stream(request, 'sitemap', SITEMAP_VERSIONS, CONTENT_TYPES['sitemap'], sitemap_chunks(sitemap_page_blogs(1)))
+    pages = (total + SITEMAP_LIMIT - 1) // SITEMAP_LIMIT
+    return HttpResponse(''.join(sitemap_index_chunks(request, pages)), content_type=CONTENT_TYPES['sitemap'])
+
+
+@require_GET
+@sitemap_conditional
+def sitemap_page(request, page):
+    if page < 1:
+        raise Http404
+    return cached_stream(request, f'sitemap:{page}', SITEMAP_VERSIONS, CONTENT_TYPES['sitemap'], sitemap_chunks(sitemap_page_blogs(page)))
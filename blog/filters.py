@@ -0,0 +1,148 @@
+"""
+博客列表筛选
+
+查询参数(可以组合, 条件之间为 AND):
+- ?category=1,2         属于任一分类; ?descendants=true 时包含这些分类的全部子孙分类
+- ?tag=1,2              带有任一标签; ?tag_match=all 时必须带有全部标签
+- ?created_from=2024-01-01 / ?created_to=2024-01-31
+                        发布时间范围(包含两端, 服务器本地时间, 不接受时区), 只写日期时 created_to 包含当天全天
+- ?is_top=true / false  是否置顶
+
+标签条件编译为 EXISTS 子查询, 按 (blog_id, tag_id) 唯一索引逐行探测, 不 JOIN 多对多表,
+因此结果不会重复, 也不需要 DISTINCT; 分类、时间和置顶条件直接作用在博客表上, 分别由
+blog_category_order_idx、blog_created_idx 和 blog_list_order_idx 支持。
+参数无效时抛出 ValidationError(400)。
+"""
+from datetime import datetime, time, timedelta
+
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+
+from .models import Blog, Category
+
+# 每个多值参数最多接受的 ID 数量
+MAX_VALUES = 20
+TAG_MATCH_MODES = ('any', 'all')
+TRUE_VALUES = ('1', 'true')
+FALSE_VALUES = ('0', 'false')
+
+
+def parse_ids(params, name):
+    """
+    解析逗号分隔的 ID 列表, 去重并保持顺序
+    """
+    value = params.get(name, '')
+    items = [item.strip() for item in value.split(',') if item.strip()]
+    if not all(item.isdigit() for item in items):
+        raise ValidationError({name: 'ID 必须是整数, 多个 ID 用逗号分隔'})
+    ids = list(dict.fromkeys(int(item) for item in items))
+    if len(ids) > MAX_VALUES:
+        raise ValidationError({name: f'最多指定 {MAX_VALUES} 个 ID'})
+    return ids
+
+
+def parse_time(params, name):
+    """
+    解析日期(返回 date)或不带时区的日期时间(返回 datetime)
+    """
+    value = params.get(name, '').strip()
+    if not value:
+        return None
+    try:
+        # parse_datetime 也接受纯日期, 先按日期解析
+        parsed = parse_date(value) or parse_datetime(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError({name: '时间格式无效, 应为 YYYY-MM-DD 或 YYYY-MM-DDTHH:MM:SS'})
+    # 数据库中保存的是服务器本地时间(USE_TZ=False), 不接受带时区的时间(如 +08:00 或 Z)
+    if isinstance(parsed, datetime) and timezone.is_aware(parsed):
+        raise ValidationError({name: '不支持带时区的时间, 请使用服务器本地时间 YYYY-MM-DDTHH:MM:SS'})
+    return parsed
+
+
+def parse_bool(params, name):
+    value = params.get(name, '').strip().lower()
+    if not value:
+        return None
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValidationError({name: '应为 true 或 false'})
+
+
+def subtree_categories(category_ids):
+    """
+    这些分类及其全部子孙分类的查询集, 分类都不存在(或路径为空)时返回 None
+    """
+    # 一次读取各分类的物化路径, 子孙分类通过路径前缀匹配
+    paths = Category.objects.filter(pk__in=category_ids).values_list('path', flat=True)
+    prefixes = Q()
+    for path in paths:
+        if path:
+            prefixes |= Q(path__istartswith=path)
+    if not prefixes:
+        return None
+    return Category.objects.filter(prefixes)
+
+
+def category_condition(category_ids, descendants=False):
+    if not descendants:
+        return Q(category_id__in=category_ids)
+    # 子孙分类在子查询中解析为分类 ID
+    categories = subtree_categories(category_ids)
+    if categories is None:
+        return None
+    return Q(category_id__in=categories.values('pk'))
+
+
+def tag_exists(tag_ids):
+    through = Blog.tags.through
+    lookup = {'tag_id__in': tag_ids} if len(tag_ids) > 1 else {'tag_id': tag_ids[0]}
+    return Exists(through.objects.filter(blog_id=OuterRef('pk'), **lookup))
+
+
+def tag_conditions(tag_ids, match='any'):
+    """
+    any: 一个 EXISTS(tag_id IN ...); all: 每个标签一个 EXISTS
+    """
+    if match == 'all':
+        return [tag_exists([tag_id]) for tag_id in tag_ids]
+    return [tag_exists(tag_ids)]
+
+
+def filter_blogs(queryset, params):
+    """
+    按查询参数筛选博客查询集, 返回新的查询集
+    """
+    category_ids = parse_ids(params, 'category')
+    tag_ids = parse_ids(params, 'tag')
+    tag_match = params.get('tag_match', 'any')
+    if tag_match not in TAG_MATCH_MODES:
+        raise ValidationError({'tag_match': '应为 any 或 all'})
+    created_from = parse_time(params, 'created_from')
+    created_to = parse_time(params, 'created_to')
+    is_top = parse_bool(params, 'is_top')
+
+    if category_ids:
+        condition = category_condition(category_ids, params.get('descendants') in TRUE_VALUES)
+        if condition is None:
+            return queryset.none()
+        queryset = queryset.filter(condition)
+    if tag_ids:
+        queryset = queryset.filter(*tag_conditions(tag_ids, tag_match))
+    if created_from is not None:
+        if not isinstance(created_from, datetime):
+            created_from = datetime.combine(created_from, time.min)
+        queryset = queryset.filter(created_at__gte=created_from)
+    if isinstance(created_to, datetime):
+        queryset = queryset.filter(created_at__lte=created_to)
+    elif created_to is not None:
+        # 只有日期时包含当天全天: 小于次日零点
+        queryset = queryset.filter(created_at__lt=datetime.combine(created_to + timedelta(days=1), time.min))
+    if is_top is not None:
+        queryset = queryset.filter(is_top=is_top)
+    return queryset
@@ -0,0 +1,293 @@
+"""
+热门博客排行
+
+得分 = Σ 事件权重 × 2 ^ ((事件时间 - 基准时间) / 半衰期)
+
+这是"前向衰减"的写法: 新事件的贡献按指数变大, 等价于让旧事件随时间衰减,
+因此每个事件只需对有序集合执行一次 ZINCRBY, 排名在任意时刻都正确。
+发布、阅读和评论都是事件, 权重和半衰期见 settings.BLOG_HOT_WEIGHTS / BLOG_HOT_HALF_LIFE_HOURS。
+
+得分随时间指数增长, rebuildhotscores 命令会把基准时间重置为当前时间并从数据库重算,
+建议每月执行一次(半衰期 72 小时时, 约 8 年后才会超出浮点数范围)。
+"""
+import threading
+import time
+
+from django.conf import settings
+
+GLOBAL_KEY = 'blog:hot'
+CATEGORY_KEY = 'blog:hot:category:{}'
+CATEGORIES_KEY = 'blog:hot:categories'
+EPOCH_KEY = 'blog:hot:epoch'
+
+
+def event_score(kind, timestamp, epoch, amount=1):
+    half_life = settings.BLOG_HOT_HALF_LIFE_HOURS * 3600
+    return settings.BLOG_HOT_WEIGHTS[kind] * amount * 2 ** ((timestamp - epoch) / half_life)
+
+
+def rescale(score, from_epoch, to_epoch):
+    """
+    把按 from_epoch 计算的得分换算为按 to_epoch 计算的得分
+    """
+    half_life = settings.BLOG_HOT_HALF_LIFE_HOURS * 3600
+    return score * 2 ** ((from_epoch - to_epoch) / half_life)
+
+
+def category_keys(category_ids):
+    return [CATEGORY_KEY.format(category_id) for category_id in category_ids]
+
+
+class RedisHotStore:
+    """
+    基于 Redis 有序集合的排行, 全站一个集合, 每个分类一个集合
+    基准时间首次读取后缓存在进程内; 其他进程执行 rebuildhotscores 后, 下一次 incr 在同一个事务中
+    读到新的基准时间, 按新基准补正本次写入的得分并更新缓存, 每个事件仍只需一次往返
+    """
+
+    def __init__(self, redis=None):
+        if redis is None:
+            from django_redis import get_redis_connection
+            redis = get_redis_connection('default')
+        self.redis = redis
+        self.epoch = None
+
+    def get_epoch(self):
+        if self.epoch is None:
+            pipe = self.redis.pipeline()
+            pipe.setnx(EPOCH_KEY, time.time())
+            pipe.get(EPOCH_KEY)
+            self.epoch = float(pipe.execute()[-1])
+        return self.epoch
+
+    def incr(self, blog_id, category_id, score):
+        """
+        score 按 get_epoch() 返回的基准时间计算
+        """
+        epoch = self.get_epoch()
+        pipe = self.redis.pipeline()
+        pipe.zincrby(GLOBAL_KEY, score, blog_id)
+        pipe.zincrby(CATEGORY_KEY.format(category_id), score, blog_id)
+        pipe.sadd(CATEGORIES_KEY, category_id)
+        pipe.get(EPOCH_KEY)
+        current = pipe.execute()[-1]
+        if current is None:
+            # 基准时间被清除, 下次重新读取
+            self.epoch = None
+        elif float(current) != epoch:
+            # 排行已按新的基准时间重建, 补正本次写入的得分
+            self.epoch = float(current)
+            correction = rescale(score, epoch, self.epoch) - score
+            pipe = self.redis.pipeline()
+            pipe.zincrby(GLOBAL_KEY, correction, blog_id)
+            pipe.zincrby(CATEGORY_KEY.format(category_id), correction, blog_id)
+            pipe.execute()
+
+    def move(self, blog_id, category_id):
+        score = self.redis.zscore(GLOBAL_KEY, blog_id)
+        pipe = self.redis.pipeline()
+        for other in self.redis.smembers(CATEGORIES_KEY):
+            pipe.zrem(CATEGORY_KEY.format(int(other)), blog_id)
+        if score is not None:
+            pipe.zadd(CATEGORY_KEY.format(category_id), {blog_id: score})
+            pipe.sadd(CATEGORIES_KEY, category_id)
+        pipe.execute()
+
+    def remove(self, blog_id):
+        pipe = self.redis.pipeline()
+        pipe.zrem(GLOBAL_KEY, blog_id)
+        for other in self.redis.smembers(CATEGORIES_KEY):
+            pipe.zrem(CATEGORY_KEY.format(int(other)), blog_id)
+        pipe.execute()
+
+    def count(self, category_ids=None):
+        if not category_ids:
+            return self.redis.zcard(GLOBAL_KEY)
+        pipe = self.redis.pipeline()
+        for key in category_keys(category_ids):
+            pipe.zcard(key)
+        return sum(pipe.execute())
+
+    def range(self, start, stop, category_ids=None):
+        """
+        多个分类时, 各分类的前 stop 名合并后再取 [start, stop), 分类之间没有重复的博客, 结果与合并后的排行一致
+        """
+        if stop <= start:
+            return []
+        if not category_ids:
+            ranked = self.redis.zrevrange(GLOBAL_KEY, start, stop - 1, withscores=True)
+            return [(int(member), score) for member, score in ranked]
+        pipe = self.redis.pipeline()
+        for key in category_keys(category_ids):
+            pipe.zrevrange(key, 0, stop - 1, withscores=True)
+        ranked = [(int(member), score) for result in pipe.execute() for member, score in result]
+        ranked.sort(key=lambda item: (-item[1], -item[0]))
+        return ranked[start:stop]
+
+    def replace(self, scores, epoch):
+        """
+        用重算的得分整体替换排行; 先写入临时键再 RENAME, 替换过程中读取不受影响
+        scores: {blog_id: (category_id, score)}
+        """
+        by_category = {}
+        for blog_id, (category_id, score) in scores.items():
+            by_category.setdefault(category_id, {})[blog_id] = score
+        old_categories = {int(c) for c in self.redis.smembers(CATEGORIES_KEY)}
+
+        pipe = self.redis.pipeline()
+        batches = [(GLOBAL_KEY, {blog_id: score for blog_id, (_, score) in scores.items()})]
+        batches += [(CATEGORY_KEY.format(c), members) for c, members in by_category.items()]
+        for key, members in batches:
+            tmp_key = f'{key}:rebuild'
+            pipe.delete(tmp_key)
+            if members:
+                pipe.zadd(tmp_key, members)
+                pipe.rename(tmp_key, key)
+            else:
+                pipe.delete(key)
+        for category_id in old_categories - set(by_category):
+            pipe.delete(CATEGORY_KEY.format(category_id))
+        pipe.delete(CATEGORIES_KEY)
+        if by_category:
+            pipe.sadd(CATEGORIES_KEY, *by_category)
+        pipe.set(EPOCH_KEY, epoch)
+        pipe.execute()
+        self.epoch = epoch
+
+
+class MemoryHotStore:
+    """
+    进程内的排行, 仅用于本地开发和测试
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.epoch = None
+        self.scores = {}
+        self.categories = {}
+
+    def get_epoch(self):
+        with self.lock:
+            if self.epoch is None:
+                self.epoch = time.time()
+            return self.epoch
+
+    def incr(self, blog_id, category_id, score):
+        with self.lock:
+            self.scores[blog_id] = self.scores.get(blog_id, 0) + score
+            self.categories[blog_id] = category_id
+
+    def move(self, blog_id, category_id):
+        with self.lock:
+            if blog_id in self.scores:
+                self.categories[blog_id] = category_id
+
+    def remove(self, blog_id):
+        with self.lock:
+            self.scores.pop(blog_id, None)
+            self.categories.pop(blog_id, None)
+
+    def _members(self, category_ids):
+        if not category_ids:
+            return self.scores.items()
+        return [(b, s) for b, s in self.scores.items() if self.categories.get(b) in category_ids]
+
+    def count(self, category_ids=None):
+        with self.lock:
+            return len(self._members(category_ids))
+
+    def range(self, start, stop, category_ids=None):
+        with self.lock:
+            ranked = sorted(self._members(category_ids), key=lambda item: (-item[1], -item[0]))
+        return ranked[start:stop]
+
+    def replace(self, scores, epoch):
+        with self.lock:
+            self.scores = {blog_id: score for blog_id, (_, score) in scores.items()}
+            self.categories = {blog_id: category_id for blog_id, (category_id, _) in scores.items()}
+            self.epoch = epoch
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """
+    根据 BLOG_STORE_BACKEND 配置返回当前进程使用的排行存储
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = MemoryHotStore() if settings.BLOG_STORE_BACKEND == 'memory' else RedisHotStore()
+    return _store
+
+
+def record(blog_id, category_id, kind, when=None, amount=1):
+    """
+    记录一次事件(publish/view/comment), amount 为负数时撤销事件
+    """
+    store = get_store()
+    timestamp = when.timestamp() if when is not None else time.time()
+    store.incr(blog_id, category_id, event_score(kind, timestamp, store.get_epoch(), amount))
+
+
+def move(blog_id, category_id):
+    get_store().move(blog_id, category_id)
+
+
+def remove(blog_id):
+    get_store().remove(blog_id)
+
+
+class HotRanking:
+    """
+    排行的只读序列视图, 支持 len() 和切片, 可以直接交给分页器使用
+    category_ids 为空时是全站排行, 否则是这些分类的合并排行
+    切片结果为 [(blog_id, score)]
+    """
+
+    def __init__(self, category_ids=None):
+        self.category_ids = list(category_ids or [])
+        self.store = get_store()
+
+    def __len__(self):
+        return self.store.count(self.category_ids)
+
+    def count(self):
+        return len(self)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self.store.range(index, index + 1, self.category_ids)[0]
+        start = index.start or 0
+        stop = index.stop if index.stop is not None else len(self)
+        return self.store.range(start, stop, self.category_ids)
+
+
+def rebuild():
+    """
+    以当前时间为基准从数据库重算全部得分:
+    - 发布事件按博客创建时间计算
+    - 评论事件按评论时间计算
+    - 历史阅读没有时间记录, 按博客创建时间计算
+    返回重算的博客数量
+    """
+    from .models import Blog, Comment
+
+    epoch = time.time()
+    scores = {}
+    blogs = Blog.objects.values_list('id', 'category_id', 'created_at', 'view_count').iterator(chunk_size=2000)
+    for blog_id, category_id, created_at, view_count in blogs:
+        created = created_at.timestamp()
+        score = event_score('publish', created, epoch) + event_score('view', created, epoch, view_count)
+        scores[blog_id] = [category_id, score]
+
+    comments = Comment.objects.values_list('blog_id', 'time').iterator(chunk_size=5000)
+    for blog_id, commented_at in comments:
+        if blog_id in scores:
+            scores[blog_id][1] += event_score('comment', commented_at.timestamp(), epoch)
+
+    get_store().replace({blog_id: tuple(value) for blog_id, value in scores.items()}, epoch)
+    return len(scores)
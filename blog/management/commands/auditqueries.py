@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from blog import queryaudit
+
+
+class Command(BaseCommand):
+    help = '对各接口实际执行的查询运行 EXPLAIN, 标记全表扫描和额外排序'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--timing', action='store_true', help='同时统计每条查询的平均耗时')
+        parser.add_argument('--repeat', type=int, default=20, help='统计耗时时每条查询的执行次数')
+        parser.add_argument('--verbose-plan', action='store_true', help='输出完整的执行计划')
+        parser.add_argument('--fail-on-issues', action='store_true', help='存在问题时以非零状态退出')
+
+    def handle(self, *args, **options):
+        flagged = 0
+        for name, queryset in queryaudit.audited_queries():
+            plan, issues = queryaudit.explain(queryset)
+            issues, accepted, reason = queryaudit.split_accepted(name, issues)
+            line = f'{name}: ' + (', '.join(issues) if issues else 'OK')
+            if accepted:
+                line += f" (已接受: {', '.join(accepted)}, {reason})"
+            if options['timing']:
+                line += f" ({queryaudit.time_query(queryset, options['repeat']):.2f} ms)"
+            self.stdout.write(self.style.WARNING(line) if issues else line)
+            if options['verbose_plan']:
+                self.stdout.write(plan)
+            flagged += bool(issues)
+
+        if flagged and options['fail_on_issues']:
+            raise CommandError(f'{flagged} 条查询存在全表扫描或额外排序')
+        self.stdout.write(self.style.SUCCESS(f'审计完成, {flagged} 条查询存在问题'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from blog import markdownio
+from blog.models import Blog
+
+
+class Command(BaseCommand):
+    help = '把博客导出为带 front matter 的 Markdown 文件'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='导出目录, 不存在时自动创建')
+        parser.add_argument('--chunk-size', type=int, default=500, help='每批读取的博客数量')
+        parser.add_argument('--category', type=int, help='只导出指定分类的博客')
+
+    def handle(self, *args, **options):
+        queryset = Blog.objects.all()
+        if options['category']:
+            queryset = queryset.filter(category_id=options['category'])
+        total = markdownio.export_posts(
+            options['directory'],
+            queryset=queryset,
+            chunk_size=options['chunk_size'],
+            stdout=self.stdout,
+        )
+        self.stdout.write(self.style.SUCCESS(f"导出完成, 共 {total} 篇博客, 保存在 {options['directory']}"))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from blog import viewcounter
+import time
+
+
+class Command(BaseCommand):
+    help = '把缓冲区中的博客阅读量批量写回数据库(可配合 crontab 定时执行, 或使用 --interval 常驻运行)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='常驻运行时每次写回的间隔秒数, 默认只执行一次'
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        while True:
+            deltas = viewcounter.flush()
+            self.stdout.write(self.style.SUCCESS(
+                f'已写回 {len(deltas)} 篇博客的阅读量, 共 {sum(deltas.values())} 次阅读'
+            ))
+            if interval <= 0:
+                break
+            time.sleep(interval)
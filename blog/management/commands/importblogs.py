@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+from myblog_backend.versioning import bump_version
+from blog import archive, hot, markdownio, related, search
+from blog.models import Blog
+
+
+class Command(BaseCommand):
+    help = '从目录批量导入 Markdown 博客(带 front matter: title/summary/category/tags)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Markdown 文件所在目录(包含子目录)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='每批插入的博客数量')
+        parser.add_argument(
+            '--allow-duplicates',
+            action='store_true',
+            help='导入与已有博客标题相同的文件(默认跳过)'
+        )
+        parser.add_argument(
+            '--skip-derived',
+            action='store_true',
+            help='不更新全文索引、归档、相关博客和热门排行(之后需手动执行对应的重建命令)'
+        )
+
+    def handle(self, *args, **options):
+        paths = list(markdownio.iter_markdown_files(options['directory']))
+        if not paths:
+            raise CommandError(f"目录 {options['directory']} 中没有 .md 文件")
+
+        blog_ids, skipped, errors = markdownio.import_posts(
+            paths,
+            batch_size=options['batch_size'],
+            skip_existing=not options['allow_duplicates'],
+            stdout=self.stdout,
+        )
+        for path, error in errors:
+            self.stdout.write(self.style.WARNING(f'{path}: {error}'))
+
+        if blog_ids and not options['skip_derived']:
+            # bulk_create 不触发信号, 在这里批量更新派生数据; 正文在首次读取时渲染, 也可执行 renderblogs
+            self.stdout.write('正在更新全文索引...')
+            search.rebuild_index(Blog.objects.filter(id__in=blog_ids), stdout=self.stdout)
+            archive.rebuild()
+            related.rebuild()
+            for blog_id, category_id, created_at in Blog.objects.filter(id__in=blog_ids).values_list('id', 'category_id', 'created_at').iterator():
+                hot.record(blog_id, category_id, 'publish', when=created_at)
+        if blog_ids:
+            bump_version('blogs', 'taxonomy')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'导入完成: 新增 {len(blog_ids)} 篇, 跳过 {skipped} 篇重复博客, {len(errors)} 个文件出错'
+        ))
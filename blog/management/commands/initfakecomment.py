@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
 from blog.models import Blog, Comment
+from blog import counters
 from faker import Faker
 import random
 
@@ -50,9 +51,8 @@ class Command(BaseCommand):
                 )
                 comments.append(comment)
             
-            # 更新博客的评论计数
-            blog.comment_count = len(comments)
-            blog.save()
+            # 更新博客的评论计数(累加, 保留博客原有的评论)
+            counters.increment(blog.id, 'comment_count', len(comments))
             
             self.stdout.write(
                 self.style.SUCCESS(f'成功为博客 "{blog.title}" 添加了 {comment_count} 条评论')
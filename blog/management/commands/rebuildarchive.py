@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from blog import archive
+
+
+class Command(BaseCommand):
+    help = '从博客表重算按月归档的博客数量'
+
+    def handle(self, *args, **options):
+        total = archive.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'归档重算完成, 共 {total} 个月份'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from blog import hot, viewcounter
+
+
+class Command(BaseCommand):
+    help = '以当前时间为基准, 从数据库重算全部博客的热门得分'
+
+    def handle(self, *args, **options):
+        # 先写回缓冲区中的阅读量, 避免重算时丢失
+        viewcounter.flush()
+        total = hot.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'热门得分重算完成, 共 {total} 篇博客'))
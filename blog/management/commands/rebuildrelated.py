@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from blog import related
+
+
+class Command(BaseCommand):
+    help = '全量重算每篇博客的相关博客'
+
+    def handle(self, *args, **options):
+        total = related.rebuild(stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'相关博客计算完成, 共 {total} 篇博客'))
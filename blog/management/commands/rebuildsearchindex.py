@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from blog import search
+from blog.models import Blog
+
+
+class Command(BaseCommand):
+    help = '批量重建博客全文检索索引'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=200,
+            help='每批读取并写入的博客数量'
+        )
+        parser.add_argument(
+            'blog_ids',
+            nargs='*',
+            type=int,
+            help='只重建指定博客的索引, 默认重建全部'
+        )
+
+    def handle(self, *args, **options):
+        queryset = Blog.objects.filter(id__in=options['blog_ids']) if options['blog_ids'] else None
+        total = search.rebuild_index(queryset, chunk_size=options['chunk_size'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'索引重建完成, 共 {total} 篇博客'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from blog import counters
+
+
+class Command(BaseCommand):
+    help = '按实际数据重算博客的计数字段(评论数), 修正计数偏差'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--field',
+            choices=sorted(counters.RECOUNTABLE),
+            action='append',
+            help='要校正的计数字段, 可指定多次, 默认全部',
+        )
+        parser.add_argument('--batch-size', type=int, default=counters.BATCH_SIZE, help='每条 UPDATE 语句处理的博客数量')
+        parser.add_argument('--dry-run', action='store_true', help='只报告偏差, 不修改数据')
+
+    def handle(self, *args, **options):
+        for field in options['field'] or sorted(counters.RECOUNTABLE):
+            drift = counters.reconcile(field, batch_size=options['batch_size'], dry_run=options['dry_run'])
+            for blog_id, (current, actual) in sorted(drift.items())[:20]:
+                self.stdout.write(f'博客 {blog_id}: {field} {current} -> {actual}')
+            if len(drift) > 20:
+                self.stdout.write(f'... 共 {len(drift)} 篇博客')
+            action = '发现' if options['dry_run'] else '已修正'
+            self.stdout.write(self.style.SUCCESS(f'{field}: {action} {len(drift)} 篇博客的计数偏差'))
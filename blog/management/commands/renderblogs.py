@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from blog import rendering
+from blog.models import Blog
+
+
+class Command(BaseCommand):
+    help = '批量渲染博客正文(HTML、目录、字数和阅读时间)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='正文未变化的博客也重新渲染(例如升级了渲染规则之后)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=200,
+            help='每批读取的博客数量'
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        blogs = Blog.objects.only('id', 'content', 'updated_at').order_by('id').iterator(chunk_size=options['chunk_size'])
+        for blog in blogs:
+            rendering.render_blog(blog, force=options['force'])
+            total += 1
+            if total % options['chunk_size'] == 0:
+                self.stdout.write(f'已渲染 {total} 篇博客')
+        self.stdout.write(self.style.SUCCESS(f'渲染完成, 共 {total} 篇博客'))
@@ -0,0 +1,258 @@
+"""
+博客的 Markdown 导入/导出
+
+每篇博客对应一个 .md 文件, 文件开头是 front matter, 之后是正文:
+
+    ---
+    title: "标题"
+    summary: "摘要"
+    category: "分类名称"
+    tags: ["Python", "Django"]
+    created_at: "2024-01-01T12:00:00"
+    is_top: false
+    ---
+    正文...
+
+front matter 使用 YAML 的一个子集(字符串、布尔值、行内列表和 "- " 开头的块列表), 不依赖 YAML 库;
+导出时字符串和列表写为 JSON 格式, 同样是合法的 YAML。
+"""
+import json
+import os
+import uuid
+from datetime import datetime
+
+from django.db import connection, transaction
+from django.utils.text import slugify
+
+from .models import Blog, Category, Tag
+
+class FrontMatterError(ValueError):
+    pass
+
+
+def parse_scalar(value):
+    value = value.strip()
+    if not value:
+        return ''
+    if value[0] == '"' or value[0] == '[':
+        try:
+            return json.loads(value)
+        except ValueError:
+            if value[0] == '[' and value.endswith(']'):
+                return [parse_scalar(item) for item in value[1:-1].split(',') if item.strip()]
+            raise FrontMatterError(f'无法解析的值: {value}')
+    if value[0] == "'" and value.endswith("'") and len(value) > 1:
+        return value[1:-1].replace("''", "'")
+    if value.lower() in ('true', 'false'):
+        return value.lower() == 'true'
+    return value
+
+
+def parse_front_matter(text):
+    """
+    返回 (front matter 字典, 正文)
+    """
+    if text.startswith('\ufeff'):
+        text = text[1:]
+    lines = text.split('\n')
+    if not lines or lines[0].strip() != '---':
+        raise FrontMatterError('缺少 front matter')
+    meta, key = {}, None
+    for index, line in enumerate(lines[1:], start=1):
+        if line.strip() == '---':
+            return meta, '\n'.join(lines[index + 1:]).lstrip('\n')
+        if not line.strip() or line.lstrip().startswith('#'):
+            continue
+        if line.lstrip().startswith('- ') and key is not None:
+            if not isinstance(meta.get(key), list):
+                meta[key] = []
+            meta[key].append(parse_scalar(line.lstrip()[2:]))
+            continue
+        if ':' not in line:
+            raise FrontMatterError(f'第 {index + 1} 行格式错误: {line}')
+        key, value = line.split(':', 1)
+        key = key.strip()
+        meta[key] = parse_scalar(value)
+    raise FrontMatterError('front matter 没有结束标记')
+
+
+def dump_front_matter(meta, body):
+    lines = ['---']
+    for key, value in meta.items():
+        lines.append(f'{key}: {json.dumps(value, ensure_ascii=False)}')
+    lines.append('---')
+    return '\n'.join(lines) + '\n' + body
+
+
+def iter_markdown_files(directory):
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            if name.endswith('.md'):
+                yield os.path.join(root, name)
+
+
+def read_post(path):
+    with open(path, encoding='utf-8') as file:
+        meta, body = parse_front_matter(file.read())
+    if not meta.get('title'):
+        raise FrontMatterError('缺少 title')
+    if not meta.get('category'):
+        raise FrontMatterError('缺少 category')
+    tags = meta.get('tags') or []
+    if isinstance(tags, str):
+        tags = [tag.strip() for tag in tags.split(',')]
+    created_at = meta.get('created_at')
+    post = {
+        'title': str(meta['title']),
+        'summary': str(meta.get('summary') or ''),
+        'category': str(meta['category']),
+        'tags': [str(tag) for tag in tags if str(tag).strip()],
+        'created_at': datetime.fromisoformat(str(created_at)) if created_at else None,
+        'is_top': bool(meta.get('is_top', False)),
+        'content': body,
+    }
+    # bulk_create 不执行字段校验, 在这里检查长度限制
+    for name, model, values in (
+        ('title', Blog, [post['title']]),
+        ('category', Category, [post['category']]),
+        ('tags', Tag, post['tags']),
+    ):
+        max_length = model._meta.get_field('title' if model is Blog else 'name').max_length
+        if any(len(value) > max_length for value in values):
+            raise FrontMatterError(f'{name} 超过 {max_length} 个字符')
+    return post
+
+
+def resolve_categories(names):
+    """
+    按名称批量获取分类, 不存在的分类创建为顶级分类; 返回 {名称: id}
+    """
+    existing = dict(Category.objects.filter(name__in=names).values_list('name', 'id'))
+    for name in sorted(set(names) - set(existing)):
+        # 分类需要维护物化路径, 逐个保存(分类数量很少)
+        existing[name] = Category.objects.create(name=name).id
+    return existing
+
+
+def resolve_tags(names):
+    """
+    按名称批量获取标签, 不存在的标签批量创建; 返回 {名称: id}
+    """
+    existing = dict(Tag.objects.filter(name__in=names).values_list('name', 'id'))
+    missing = sorted(set(names) - set(existing))
+    if missing:
+        Tag.objects.bulk_create([Tag(name=name) for name in missing], ignore_conflicts=True)
+        existing.update(Tag.objects.filter(name__in=missing).values_list('name', 'id'))
+    return existing
+
+
+def insert_blogs(blogs):
+    """
+    批量插入博客并为实例设置 id
+    数据库不支持批量插入后返回主键时(MySQL), 本批博客写入同一个随机的 import_batch, 插入后按该标识查出
+    本批的行; 自增 id 按插入顺序分配, 按 id 排序即与 blogs 一一对应。其他并发插入的行没有该标识,
+    同名博客也不会对应错; 不预先分配 id, 可以与其他写入博客的操作并发执行
+    """
+    batch = uuid.uuid4().hex
+    for blog in blogs:
+        blog.import_batch = batch
+    Blog.objects.bulk_create(blogs)
+    if connection.features.can_return_rows_from_bulk_insert:
+        return
+    ids = list(Blog.objects.filter(import_batch=batch).order_by('id').values_list('id', flat=True))
+    if len(ids) != len(blogs):
+        raise RuntimeError(f'导入批次 {batch} 插入 {len(blogs)} 篇博客, 查到 {len(ids)} 篇')
+    for blog, blog_id in zip(blogs, ids):
+        blog.id = blog_id
+
+
+def restore_created_at(blogs, posts, batch_size):
+    """
+    bulk_create 时 created_at 由 auto_now_add 设为当前时间, 插入后用 bulk_update 写回文件中的原始发布时间
+    """
+    dated = []
+    for blog, post in zip(blogs, posts):
+        if post['created_at'] is not None:
+            blog.created_at = post['created_at']
+            dated.append(blog)
+    if dated:
+        Blog.objects.bulk_update(dated, ['created_at'], batch_size=batch_size)
+
+
+def import_posts(paths, batch_size=1000, skip_existing=True, stdout=None):
+    """
+    导入 Markdown 文件, 返回 ([新博客 id], 跳过数量, [(文件, 错误)])
+    每批在一个事务中完成: 解析文件、批量解析分类和标签、bulk_create 博客和标签关联、bulk_update 发布时间
+    """
+    imported, skipped, errors = [], 0, []
+    paths = list(paths)
+    through = Blog.tags.through
+    for start in range(0, len(paths), batch_size):
+        posts = []
+        for path in paths[start:start + batch_size]:
+            try:
+                posts.append(read_post(path))
+            except (OSError, UnicodeDecodeError, ValueError) as e:
+                errors.append((path, str(e)))
+        if skip_existing and posts:
+            titles = set(Blog.objects.filter(title__in=[post['title'] for post in posts]).values_list('title', flat=True))
+            skipped += sum(post['title'] in titles for post in posts)
+            posts = [post for post in posts if post['title'] not in titles]
+        if not posts:
+            continue
+
+        with transaction.atomic():
+            categories = resolve_categories({post['category'] for post in posts})
+            tags = resolve_tags({tag for post in posts for tag in post['tags']})
+            blogs = [
+                Blog(
+                    title=post['title'],
+                    summary=post['summary'],
+                    content=post['content'],
+                    category_id=categories[post['category']],
+                    is_top=post['is_top'],
+                )
+                for post in posts
+            ]
+            insert_blogs(blogs)
+            restore_created_at(blogs, posts, batch_size)
+            through.objects.bulk_create([
+                through(blog_id=blog.id, tag_id=tags[name])
+                for blog, post in zip(blogs, posts)
+                for name in dict.fromkeys(post['tags'])
+            ], batch_size=batch_size)
+        imported.extend(blog.id for blog in blogs)
+        if stdout is not None:
+            stdout.write(f'已导入 {len(imported)} 篇博客')
+    return imported, skipped, errors
+
+
+def post_filename(blog):
+    slug = slugify(blog.title, allow_unicode=True)[:50]
+    return f'{blog.id}-{slug}.md' if slug else f'{blog.id}.md'
+
+
+def export_posts(directory, queryset=None, chunk_size=500, stdout=None):
+    """
+    把博客逐批导出为 Markdown 文件, 返回导出数量
+    """
+    os.makedirs(directory, exist_ok=True)
+    if queryset is None:
+        queryset = Blog.objects.all()
+    blogs = queryset.select_related('category').prefetch_related('tags').order_by('id').iterator(chunk_size=chunk_size)
+    total = 0
+    for blog in blogs:
+        meta = {
+            'title': blog.title,
+            'summary': blog.summary,
+            'category': blog.category.name,
+            'tags': [tag.name for tag in blog.tags.all()],
+            'created_at': blog.created_at.isoformat(),
+            'is_top': blog.is_top,
+        }
+        with open(os.path.join(directory, post_filename(blog)), 'w', encoding='utf-8') as file:
+            file.write(dump_front_matter(meta, blog.content))
+        total += 1
+        if stdout is not None and total % chunk_size == 0:
+            stdout.write(f'已导出 {total} 篇博客')
+    return total
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_root_comment(apps, schema_editor):
+    """
+    为已有的回复补全所属的顶层评论
+    """
+    Comment = apps.get_model('blog', 'Comment')
+    parents = dict(Comment.objects.values_list('id', 'parent_comment_id'))
+    roots = {}
+    for comment_id, parent_id in parents.items():
+        if parent_id is None:
+            continue
+        root_id = parent_id
+        while parents.get(root_id) is not None:
+            root_id = parents[root_id]
+        roots.setdefault(root_id, []).append(comment_id)
+    for root_id, comment_ids in roots.items():
+        Comment.objects.filter(id__in=comment_ids).update(root_comment_id=root_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0010_alter_blog_options_remove_blog_published_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='root_comment',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='thread_comments', to='blog.comment', verbose_name='顶层评论'),
+        ),
+        migrations.RunPython(fill_root_comment, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0011_comment_root_comment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('blog', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='blog.blog', verbose_name='博客')),
+                ('title_length', models.PositiveIntegerField(default=0, verbose_name='标题词元数')),
+                ('summary_length', models.PositiveIntegerField(default=0, verbose_name='摘要词元数')),
+                ('content_length', models.PositiveIntegerField(default=0, verbose_name='正文词元数')),
+                ('checksum', models.CharField(max_length=40, verbose_name='文本摘要')),
+                ('indexed_at', models.DateTimeField(auto_now=True, verbose_name='索引时间')),
+            ],
+            options={
+                'verbose_name': '检索文档',
+                'verbose_name_plural': '检索文档',
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=32, verbose_name='词元')),
+                ('title_tf', models.PositiveIntegerField(default=0, verbose_name='标题词频')),
+                ('summary_tf', models.PositiveIntegerField(default=0, verbose_name='摘要词频')),
+                ('content_tf', models.PositiveIntegerField(default=0, verbose_name='正文词频')),
+                ('blog', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_postings', to='blog.blog', verbose_name='博客')),
+            ],
+            options={
+                'verbose_name': '倒排索引',
+                'verbose_name_plural': '倒排索引',
+                'indexes': [models.Index(fields=['term', 'blog'], name='blog_search_term_idx')],
+            },
+        ),
+    ]
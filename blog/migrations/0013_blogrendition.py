@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0012_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BlogRendition',
+            fields=[
+                ('blog', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rendition', serialize=False, to='blog.blog', verbose_name='博客')),
+                ('source_updated_at', models.DateTimeField(verbose_name='对应的博客更新时间')),
+                ('content_hash', models.CharField(max_length=40, verbose_name='正文摘要')),
+                ('html', models.TextField(verbose_name='HTML')),
+                ('toc', models.JSONField(default=list, verbose_name='目录')),
+                ('word_count', models.PositiveIntegerField(default=0, verbose_name='字数')),
+                ('reading_time', models.PositiveIntegerField(default=1, verbose_name='阅读时间(分钟)')),
+                ('rendered_at', models.DateTimeField(auto_now=True, verbose_name='渲染时间')),
+            ],
+            options={
+                'verbose_name': '博客渲染结果',
+                'verbose_name_plural': '博客渲染结果',
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:58
+
+from django.db import migrations, models
+
+
+def fill_category_path(apps, schema_editor):
+    """
+    为已有分类计算物化路径
+    """
+    Category = apps.get_model('blog', 'Category')
+    parents = dict(Category.objects.values_list('id', 'parent_id'))
+    paths = {}
+
+    def build(category_id):
+        if category_id not in paths:
+            parent_id = parents[category_id]
+            prefix = build(parent_id) if parent_id else '/'
+            paths[category_id] = f'{prefix}{category_id}/'
+        return paths[category_id]
+
+    for category_id in parents:
+        path = build(category_id)
+        Category.objects.filter(id=category_id).update(path=path, depth=path.count('/') - 2)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0013_blogrendition'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='层级'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255, verbose_name='路径'),
+        ),
+        migrations.RunPython(fill_category_path, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:06
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def fill_archive(apps, schema_editor):
+    """
+    按已有博客的创建时间统计每月数量
+    """
+    Blog = apps.get_model('blog', 'Blog')
+    BlogArchiveMonth = apps.get_model('blog', 'BlogArchiveMonth')
+    rows = (
+        Blog.objects.order_by()
+        .annotate(year=ExtractYear('created_at'), month=ExtractMonth('created_at'))
+        .values('year', 'month')
+        .annotate(blog_count=Count('id'))
+    )
+    BlogArchiveMonth.objects.bulk_create([BlogArchiveMonth(**row) for row in rows])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0015_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BlogArchiveMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField(verbose_name='年')),
+                ('month', models.PositiveSmallIntegerField(verbose_name='月')),
+                ('blog_count', models.PositiveIntegerField(default=0, verbose_name='博客数')),
+            ],
+            options={
+                'verbose_name': '博客归档',
+                'verbose_name_plural': '博客归档',
+                'ordering': ['-year', '-month'],
+                'constraints': [models.UniqueConstraint(fields=('year', 'month'), name='blog_archive_month_unique')],
+            },
+        ),
+        migrations.RunPython(fill_archive, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0016_blog_archive_month'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedBlogs',
+            fields=[
+                ('blog', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='related_entry', serialize=False, to='blog.blog', verbose_name='博客')),
+                ('signature', models.CharField(max_length=40, verbose_name='特征摘要')),
+                ('items', models.JSONField(default=list, verbose_name='相关博客')),
+                ('computed_at', models.DateTimeField(auto_now=True, verbose_name='计算时间')),
+            ],
+            options={
+                'verbose_name': '相关博客',
+                'verbose_name_plural': '相关博客',
+            },
+        ),
+    ]
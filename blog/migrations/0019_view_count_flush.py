@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0018_blog_category_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ViewCountFlush',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('batch_id', models.CharField(max_length=32, unique=True, verbose_name='批次号')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='写回时间')),
+            ],
+            options={
+                'verbose_name': '阅读量写回批次',
+                'verbose_name_plural': '阅读量写回批次',
+            },
+        ),
+    ]
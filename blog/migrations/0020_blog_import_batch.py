@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0019_view_count_flush'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blog',
+            name='import_batch',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=32, null=True, verbose_name='导入批次'),
+        ),
+    ]
@@ -0,0 +1,89 @@
+"""
+稀疏字段集(sparse fieldsets)
+
+- ?fields=a,b  只返回指定字段
+- ?omit=a,b    不返回指定字段
+- ?include=a,b 在默认字段之外附加序列化器 Meta.optional_fields 中声明的字段
+
+Meta.optional_fields 中的字段(如博客正文)默认不返回, 视图只在字段被请求时才从数据库读取对应的列。
+"""
+from rest_framework import permissions
+
+
+def split_query_param(request, name):
+    value = request.query_params.get(name, '') if request is not None else ''
+    return {item.strip() for item in value.split(',') if item.strip()}
+
+
+def select_field_names(request, available, optional=()):
+    """
+    根据请求参数计算需要输出的字段名
+    """
+    available = set(available)
+    optional = set(optional)
+    fields = split_query_param(request, 'fields')
+    if fields:
+        selected = fields & available
+    else:
+        selected = (available - optional) | (split_query_param(request, 'include') & optional)
+    return selected - split_query_param(request, 'omit')
+
+
+class SparseFieldsetSerializerMixin:
+    """
+    序列化器混入类: 读取请求时按 fields/omit/include 参数裁剪输出字段
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method not in permissions.SAFE_METHODS:
+            return
+        readable = [name for name, field in self.fields.items() if not field.write_only]
+        optional = getattr(self.Meta, 'optional_fields', ())
+        selected = select_field_names(request, readable, optional)
+        for name in readable:
+            if name not in selected:
+                self.fields.pop(name)
+
+
+def project_queryset(queryset, serializer, always_load=('id',)):
+    """
+    按序列化器实际输出的字段裁剪查询:
+    - 未输出的普通列使用 defer() 不再读取
+    - 外键字段被输出时才 select_related, 多对多字段被输出时才 prefetch_related
+    always_load 中的列始终读取(例如分页排序需要的字段)
+    """
+    model = queryset.model
+    sources = {
+        field.source.split('.')[0]
+        for field in serializer.fields.values()
+        if not field.write_only and field.source != '*'
+    }
+    deferred = []
+    for model_field in model._meta.get_fields():
+        if model_field.many_to_many and not model_field.auto_created:
+            if model_field.name in sources:
+                queryset = queryset.prefetch_related(model_field.name)
+        elif model_field.many_to_one:
+            if model_field.name in sources:
+                queryset = queryset.select_related(model_field.name)
+        elif model_field.concrete and not model_field.primary_key:
+            if model_field.name not in sources and model_field.name not in always_load:
+                deferred.append(model_field.name)
+    if deferred:
+        queryset = queryset.defer(*deferred)
+    return queryset
+
+
+class SparseFieldsetViewMixin:
+    """
+    视图混入类: 读取请求时只查询序列化器需要的列和关联
+    """
+    # 即使未输出也始终读取的列, 游标分页需要读取排序字段
+    sparse_always_load = ('id',)
+
+    def project_queryset(self, queryset):
+        if self.request.method not in permissions.SAFE_METHODS:
+            return queryset
+        return project_queryset(queryset, self.get_serializer(), self.sparse_always_load)
@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 
@@ -10,6 +12,10 @@ class Category(models.Model):
     updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
     parent = models.ForeignKey('self', null=True, blank=True, on_delete=models.CASCADE, related_name='children', verbose_name='父分类')
     order = models.IntegerField(default=0, verbose_name='排序')
+    # 物化路径, 例如 /1/5/12/, 子孙分类的路径都以祖先的路径开头
+    # 路径只包含数字和斜杠, 前缀查询使用 istartswith(MySQL 中 startswith 会生成 LIKE BINARY, 无法使用索引)
+    path = models.CharField(max_length=255, default='', editable=False, db_index=True, verbose_name='路径')
+    depth = models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='层级')
 
     class Meta:
         verbose_name = '分类'
@@ -19,6 +25,36 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+    def is_descendant_path(self, path):
+        """
+        判断 path 是否是当前分类自身或其子孙分类的路径
+        """
+        return bool(self.path) and path.startswith(self.path)
+
+    def save(self, *args, **kwargs):
+        """
+        保存时维护物化路径; 移动分类时用一条 UPDATE 同步整棵子树的路径
+        """
+        parent_path = ''
+        if self.parent_id:
+            parent_path = Category.objects.filter(pk=self.parent_id).values_list('path', flat=True).first() or ''
+            if self.pk and self.is_descendant_path(parent_path):
+                raise ValueError('不能把分类移动到自身或其子分类下')
+        old_path, old_depth = self.path, self.depth
+        super().save(*args, **kwargs)
+
+        new_path = f'{parent_path or "/"}{self.pk}/'
+        new_depth = new_path.count('/') - 2
+        if new_path == old_path:
+            return
+        Category.objects.filter(pk=self.pk).update(path=new_path, depth=new_depth)
+        if old_path:
+            Category.objects.filter(path__istartswith=old_path).exclude(pk=self.pk).update(
+                path=Concat(Value(new_path), Substr('path', len(old_path) + 1)),
+                depth=F('depth') + (new_depth - old_depth),
+            )
+        self.path, self.depth = new_path, new_depth
+
 class Tag(models.Model):
     name = models.CharField(max_length=10, unique=True, verbose_name='标签名称')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
@@ -43,11 +79,25 @@ class Blog(models.Model):
     comment_count = models.PositiveIntegerField(default=0, verbose_name='评论数')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+    # Markdown 批量导入时写入的批次标识, 用于在不返回主键的数据库(MySQL)上找回本批插入的行
+    import_batch = models.CharField(max_length=32, null=True, blank=True, editable=False, db_index=True, verbose_name='导入批次')
 
     class Meta:
         verbose_name = '博客'
         verbose_name_plural = verbose_name
         ordering = ['-is_top', '-created_at']
+        indexes = [
+            # 列表默认排序(及游标分页)
+            models.Index(fields=['is_top', 'created_at', 'id'], name='blog_list_order_idx'),
+            # 按分类筛选后排序
+            models.Index(fields=['category', 'is_top', 'created_at', 'id'], name='blog_category_order_idx'),
+            # 最新博客、上一篇/下一篇
+            models.Index(fields=['created_at', 'id'], name='blog_created_idx'),
+            # 同一分类内的上一篇/下一篇
+            models.Index(fields=['category', 'created_at', 'id'], name='blog_category_created_idx'),
+            # 按阅读量排序
+            models.Index(fields=['view_count'], name='blog_view_count_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -62,11 +112,131 @@ class Comment(models.Model):
     content = models.TextField(verbose_name='评论内容')
     blog = models.ForeignKey(Blog, on_delete=models.CASCADE, related_name='comments', verbose_name='关联的博客')
     parent_comment = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='child_comments', verbose_name='父评论')
+    # 回复所属的顶层评论, 用于一次查询取出整棵回复树; 顶层评论为空
+    root_comment = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='thread_comments', verbose_name='顶层评论')
 
     class Meta:
         verbose_name = '评论'
         verbose_name_plural = verbose_name
         ordering = ['-time']
+        indexes = [
+            # 按博客获取评论并按时间排序
+            models.Index(fields=['blog', 'time'], name='comment_blog_time_idx'),
+            # 按博客分页获取顶层评论
+            models.Index(fields=['blog', 'parent_comment', 'time', 'id'], name='comment_blog_root_idx'),
+            # 获取顶层评论下的全部回复
+            models.Index(fields=['root_comment', 'time', 'id'], name='comment_thread_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user.username}的评论 - {self.time}'
+
+    def save(self, *args, **kwargs):
+        if self.parent_comment_id and not self.root_comment_id:
+            parent = self.parent_comment
+            self.root_comment_id = parent.root_comment_id or parent.id
+        super().save(*args, **kwargs)
+
+class BlogRendition(models.Model):
+    """
+    博客正文的渲染结果, 只有 source_updated_at 与博客的 updated_at 一致时才有效
+    """
+    blog = models.OneToOneField(Blog, on_delete=models.CASCADE, primary_key=True, related_name='rendition', verbose_name='博客')
+    source_updated_at = models.DateTimeField(verbose_name='对应的博客更新时间')
+    content_hash = models.CharField(max_length=40, verbose_name='正文摘要')
+    html = models.TextField(verbose_name='HTML')
+    toc = models.JSONField(default=list, verbose_name='目录')
+    word_count = models.PositiveIntegerField(default=0, verbose_name='字数')
+    reading_time = models.PositiveIntegerField(default=1, verbose_name='阅读时间(分钟)')
+    rendered_at = models.DateTimeField(auto_now=True, verbose_name='渲染时间')
+
+    class Meta:
+        verbose_name = '博客渲染结果'
+        verbose_name_plural = verbose_name
+
+
+class SearchDocument(models.Model):
+    """
+    全文检索文档: 记录每篇博客各字段的词元数量, 用于 BM25 的长度归一化
+    """
+    blog = models.OneToOneField(Blog, on_delete=models.CASCADE, primary_key=True, related_name='search_document', verbose_name='博客')
+    title_length = models.PositiveIntegerField(default=0, verbose_name='标题词元数')
+    summary_length = models.PositiveIntegerField(default=0, verbose_name='摘要词元数')
+    content_length = models.PositiveIntegerField(default=0, verbose_name='正文词元数')
+    checksum = models.CharField(max_length=40, verbose_name='文本摘要')
+    indexed_at = models.DateTimeField(auto_now=True, verbose_name='索引时间')
+
+    class Meta:
+        verbose_name = '检索文档'
+        verbose_name_plural = verbose_name
+
+
+class SearchPosting(models.Model):
+    """
+    倒排索引: 词元在某篇博客各字段中出现的次数
+    """
+    term = models.CharField(max_length=32, verbose_name='词元')
+    blog = models.ForeignKey(Blog, on_delete=models.CASCADE, related_name='search_postings', verbose_name='博客')
+    title_tf = models.PositiveIntegerField(default=0, verbose_name='标题词频')
+    summary_tf = models.PositiveIntegerField(default=0, verbose_name='摘要词频')
+    content_tf = models.PositiveIntegerField(default=0, verbose_name='正文词频')
+
+    class Meta:
+        verbose_name = '倒排索引'
+        verbose_name_plural = verbose_name
+        indexes = [
+            models.Index(fields=['term', 'blog'], name='blog_search_term_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.term} - {self.blog_id}'
+
+
+class BlogArchiveMonth(models.Model):
+    """
+    按月归档的博客数量, 博客创建和删除时通过信号增量维护, 可用 rebuildarchive 命令重算
+    """
+    year = models.PositiveSmallIntegerField(verbose_name='年')
+    month = models.PositiveSmallIntegerField(verbose_name='月')
+    blog_count = models.PositiveIntegerField(default=0, verbose_name='博客数')
+
+    class Meta:
+        verbose_name = '博客归档'
+        verbose_name_plural = verbose_name
+        ordering = ['-year', '-month']
+        constraints = [
+            models.UniqueConstraint(fields=['year', 'month'], name='blog_archive_month_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.year}-{self.month:02d} ({self.blog_count})'
+
+
+class RelatedBlogs(models.Model):
+    """
+    预先计算的相关博客, items 为按相似度降序的 [[博客id, 相似度], ...]
+    """
+    blog = models.OneToOneField(Blog, on_delete=models.CASCADE, primary_key=True, related_name='related_entry', verbose_name='博客')
+    # 计算时博客的分类和标签摘要, 未变化时保存博客不会重新计算
+    signature = models.CharField(max_length=40, verbose_name='特征摘要')
+    items = models.JSONField(default=list, verbose_name='相关博客')
+    computed_at = models.DateTimeField(auto_now=True, verbose_name='计算时间')
+
+    class Meta:
+        verbose_name = '相关博客'
+        verbose_name_plural = verbose_name
+
+
+class ViewCountFlush(models.Model):
+    """
+    已写回数据库的阅读量批次, 与增量在同一事务中写入; 写回提交后进程中断时, 同一批次不会重复累加
+    """
+    batch_id = models.CharField(max_length=32, unique=True, verbose_name='批次号')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='写回时间')
+
+    class Meta:
+        verbose_name = '阅读量写回批次'
+        verbose_name_plural = verbose_name
 
     def __str__(self):
-        return f'{self.user.username}的评论 - {self.time}'
\ No newline at end of file
+        return self.batch_id
@@ -0,0 +1,52 @@
+"""
+博客详情的上一篇/下一篇
+
+- 按发布时间排序, previous 为更早发布的一篇, next 为更晚发布的一篇; 发布时间相同时按 id 排序
+- 每个方向一条只取一行的查询, 使用 (created_at, id) 索引, ?neighbors=category 时限定在同一分类内,
+  使用 (category, created_at, id) 索引
+- 结果随博客详情一起缓存: 请求包含上一篇/下一篇时, 详情的版本还依赖 SEQUENCE_VERSION,
+  博客新增、修改或删除时该版本号更新(见 signals.py)
+"""
+from .mixins import split_query_param
+from .models import Blog
+
+SEQUENCE_VERSION = 'blog_sequence'
+FIELDS = ('previous', 'next')
+SCOPE_QUERY_PARAM = 'neighbors'
+SCOPES = ('all', 'category')
+
+
+def get_scope(request):
+    scope = request.query_params.get(SCOPE_QUERY_PARAM) if request is not None else None
+    return scope if scope in SCOPES else 'all'
+
+
+def is_requested(request):
+    """
+    请求是否会输出上一篇/下一篇(需要通过 ?include= 或 ?fields= 显式请求)
+    """
+    return any(split_query_param(request, name) & set(FIELDS) for name in ('include', 'fields'))
+
+
+def neighbor_queryset(blog, direction, scope='all'):
+    """
+    direction 为 'previous' 或 'next'
+    """
+    # created_at 的范围条件可以直接使用索引, 再排除发布时间相同且 id 不在该方向上的博客;
+    # 写成 a < x OR (a = x AND b < y) 时部分数据库会合并两次索引查找并额外排序
+    if direction == 'previous':
+        queryset = Blog.objects.filter(created_at__lte=blog.created_at).exclude(created_at=blog.created_at, id__gte=blog.id)
+        ordering = ('-created_at', '-id')
+    else:
+        queryset = Blog.objects.filter(created_at__gte=blog.created_at).exclude(created_at=blog.created_at, id__lte=blog.id)
+        ordering = ('created_at', 'id')
+    if scope == 'category':
+        queryset = queryset.filter(category_id=blog.category_id)
+    return queryset.order_by(*ordering).values('id', 'title', 'created_at')[:1]
+
+
+def get_neighbor(blog, direction, scope='all'):
+    """
+    返回 {'id', 'title', 'created_at'}, 没有相邻的博客时返回 None
+    """
+    return next(iter(neighbor_queryset(blog, direction, scope)), None)
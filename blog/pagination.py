@@ -1,6 +1,196 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
 
 class BlogPageNumberPagination(PageNumberPagination):
     page_size = 6  # 每页显示6条
     page_size_query_param = 'page_size'  # 允许客户端通过此参数自定义每页数量
-    max_page_size = 20  # 最大每页数量限制 
\ No newline at end of file
+    max_page_size = 20  # 最大每页数量限制
+
+
+class KeysetCursorPagination(BasePagination):
+    """
+    键集(游标)分页:
+    - 按 ordering 中的全部字段构造 WHERE 条件定位下一页, 不执行 COUNT(*) 和 OFFSET
+    - ordering 的最后一个字段必须唯一(通常是 id), 保证顺序稳定
+    - 游标中保存当前页首/尾记录的排序字段值, 每页只读取 page_size + 1 条记录
+    """
+    ordering = ('-id',)
+    page_size = 6
+    page_size_query_param = 'page_size'
+    max_page_size = 20
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = '无效的游标'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.model = queryset.model
+
+        position, reverse = self.decode_cursor(request)
+        ordering = self.get_ordering(reverse)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.build_position_filter(ordering, position))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        # 向后翻页时, 游标之后一定还有数据; 向前翻页时, 游标之前一定还有数据
+        if reverse:
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+            if page_size > 0:
+                return min(page_size, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    def get_ordering(self, reverse=False):
+        if not reverse:
+            return list(self.ordering)
+        return [field[1:] if field.startswith('-') else f'-{field}' for field in self.ordering]
+
+    def build_position_filter(self, ordering, position):
+        """
+        (a, b, c) 在 (x, y, z) 之后 <=> a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+        降序字段使用 < 比较
+        展开为 OR 条件而不是行值比较 (a, b, c) < (x, y, z): 本类对 ordering 通用, 子类的排序可以升降序混合,
+        此时无法用一个行值比较表达; 并且 Django ORM 没有可移植的行值比较查询
+        """
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def get_position(self, instance):
+        # 记录可以是模型实例, 也可以是 values() 返回的字典
+        if isinstance(instance, dict):
+            return [instance[field.lstrip('-')] for field in self.ordering]
+        return [getattr(instance, field.lstrip('-')) for field in self.ordering]
+
+    def encode_cursor(self, instance, reverse):
+        position = []
+        for value in self.get_position(instance):
+            position.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        payload = json.dumps({'p': position, 'r': int(reverse)}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+            raw_position = payload['p']
+            if len(raw_position) != len(self.ordering):
+                raise ValueError
+            position = [
+                self.model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, raw_position)
+            ]
+            return position, bool(payload.get('r'))
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, self.encode_cursor(self.page[-1], False))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, self.encode_cursor(self.page[0], True))
+
+
+class BlogCursorPagination(KeysetCursorPagination):
+    """
+    博客列表游标分页, 与默认排序一致并以 id 保证顺序稳定
+    """
+    ordering = ('-is_top', '-created_at', '-id')
+    page_size = BlogPageNumberPagination.page_size
+    max_page_size = BlogPageNumberPagination.max_page_size
+
+
+class BlogPagination(BasePagination):
+    """
+    博客列表分页器:
+    - 默认使用页码分页, 兼容现有前端
+    - ?pagination=cursor 时使用游标分页, 翻到任意深度都只读取一页数据
+    """
+    mode_query_param = 'pagination'
+    page_number_class = BlogPageNumberPagination
+    cursor_class = BlogCursorPagination
+
+    def get_delegate(self, request):
+        if request.query_params.get(self.mode_query_param) == 'cursor':
+            return self.cursor_class()
+        return self.page_number_class()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.delegate = self.get_delegate(request)
+        return self.delegate.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.delegate.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.page_number_class().get_paginated_response_schema(schema)
+
+    def get_schema_operation_parameters(self, view):
+        return self.page_number_class().get_schema_operation_parameters(view) + [{
+            'name': self.mode_query_param,
+            'required': False,
+            'in': 'query',
+            'description': '分页模式, cursor 表示游标分页',
+            'schema': {'type': 'string', 'enum': ['page', 'cursor']},
+        }]
+
+
+class CommentCursorPagination(KeysetCursorPagination):
+    """
+    顶层评论游标分页, 最新的评论在前
+    """
+    ordering = ('-time', '-id')
+    page_size = 10
+    max_page_size = 50
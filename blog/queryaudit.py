@@ -0,0 +1,186 @@
+"""
+接口查询的执行计划审计
+
+从各视图集构造与线上一致的查询(相同的筛选、排序、字段裁剪和分页大小),
+对每条查询执行 EXPLAIN, 标记全表扫描(full scan)和额外排序(filesort)。
+ACCEPTED_ISSUES 中登记的问题是已知且可以接受的, 报告中单独标出, 不计入问题数。
+auditqueries 命令和 benchmarks/bench_indexes.py 共用这里的查询清单。
+"""
+import json
+import re
+import time
+from datetime import datetime
+
+from django.db import connection
+from django.db.models import Q
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+# {查询名称: ({问题}, 原因)}
+ACCEPTED_ISSUES = {
+    '博客列表 ?category 时间范围': ({'filesort'}, (
+        '排序为 (is_top, created_at), 时间范围作用在第二个排序列上, 任何单个索引都无法同时按范围定位和按序读取; '
+        '由 blog_category_created_idx 定位后只对该分类在时间范围内的博客排序'
+    )),
+    '按月归档': ({'filesort'}, (
+        '排序为 (is_top, created_at), 月份范围作用在第二个排序列上, 任何单个索引都无法同时按范围定位和按序读取; '
+        '由 blog_created_idx 定位后只对当月的博客排序'
+    )),
+}
+
+
+def viewset_queryset(viewset_class, action, params=None, **kwargs):
+    """
+    以指定的 action 和查询参数实例化视图集, 返回其 get_queryset() 的结果
+    """
+    request = Request(RequestFactory().get('/', params or {}))
+    view = viewset_class(action=action, request=request, args=(), kwargs=kwargs, format_kwarg=None)
+    return view.get_queryset()
+
+
+def sample_ids():
+    """
+    取各表中的一条记录作为查询参数, 表为空时使用 0; tags 为最多两个实际存在的标签 ID
+    """
+    from msgboard.models import Message
+    from .models import Blog, Category, Comment, Tag
+
+    def first(queryset):
+        return queryset.values_list('pk', flat=True).first() or 0
+
+    return {
+        'blog': first(Blog.objects.order_by('-comment_count')),
+        'category': first(Category.objects.order_by('-pk')),
+        'tag': first(Tag.objects.order_by('-pk')),
+        'tags': ','.join(str(pk) for pk in Tag.objects.order_by('-pk').values_list('pk', flat=True)[:2]) or '0',
+        'comment': first(Comment.objects.filter(parent_comment__isnull=True).order_by('-pk')),
+        'message': first(Message.objects.order_by('-pk')),
+    }
+
+
+def audited_queries():
+    """
+    返回 [(名称, 查询集)], 每个查询集都与对应接口实际执行的 SQL 一致
+    """
+    from msgboard.models import Reply
+    from msgboard.paginations import MessagePagination, ReplyPagination
+    from msgboard.views import MessageViewSet
+    from .models import Blog, Comment, SearchPosting
+    from .pagination import BlogCursorPagination, BlogPageNumberPagination, CommentCursorPagination
+    from .neighbors import neighbor_queryset
+    from .search import query_terms
+    from .views import BlogViewSet, CommentViewSet
+
+    ids = sample_ids()
+    page_size = BlogPageNumberPagination.page_size
+    blog_list = viewset_queryset(BlogViewSet, 'list')
+    cursor_blog = Blog.objects.filter(pk=ids['blog']).first()
+    cursor = BlogCursorPagination()
+    cursor_filter = (
+        cursor.build_position_filter(cursor.ordering, cursor.get_position(cursor_blog))
+        if cursor_blog is not None else Q()
+    )
+
+    queries = [
+        ('博客列表', blog_list[:page_size]),
+        ('博客列表 ?category', viewset_queryset(BlogViewSet, 'list', {'category': ids['category']})[:page_size]),
+        ('博客列表 ?tag', viewset_queryset(BlogViewSet, 'list', {'tag': ids['tag']})[:page_size]),
+        ('博客列表 多标签(全部)', viewset_queryset(BlogViewSet, 'list', {'tag': ids['tags'], 'tag_match': 'all'})[:page_size]),
+        ('博客列表 ?category 时间范围', viewset_queryset(BlogViewSet, 'list', {
+            'category': ids['category'], 'created_from': '2024-01-01', 'created_to': '2024-12-31',
+        })[:page_size]),
+        ('博客列表 游标分页', blog_list.order_by(*cursor.ordering).filter(cursor_filter)[:page_size + 1]),
+        ('热门博客(按阅读量)', viewset_queryset(BlogViewSet, 'hot').order_by('-view_count')[:10]),
+        ('最新博客', viewset_queryset(BlogViewSet, 'latest').order_by('-created_at')[:10]),
+        ('上一篇', neighbor_queryset(cursor_blog, 'previous') if cursor_blog else Blog.objects.none()),
+        ('上一篇 同分类', neighbor_queryset(cursor_blog, 'previous', 'category') if cursor_blog else Blog.objects.none()),
+        ('按月归档', viewset_queryset(BlogViewSet, 'archive_month').filter(created_at__gte=datetime(2024, 1, 1), created_at__lt=datetime(2024, 2, 1))[:page_size]),
+        ('博客详情', viewset_queryset(BlogViewSet, 'retrieve').filter(pk=ids['blog'])),
+        ('博客详情 内嵌评论', Comment.objects.filter(blog_id=ids['blog']).select_related('user', 'parent_comment__user').order_by('-time')),
+        ('评论列表', viewset_queryset(CommentViewSet, 'list', {'blog_id': ids['blog']})),
+        ('评论树 顶层评论', Comment.objects.filter(blog_id=ids['blog'], parent_comment__isnull=True)
+            .select_related('user').order_by(*CommentCursorPagination.ordering)[:CommentCursorPagination.page_size + 1]),
+        ('评论树 回复', Comment.objects.filter(root_comment_id=ids['comment']).select_related('user').order_by('time', 'id')),
+        ('留言列表', viewset_queryset(MessageViewSet, 'list').order_by(*MessagePagination.ordering)[:MessagePagination.page_size + 1]),
+        ('留言回复', Reply.objects.filter(message_id=ids['message']).select_related('user')
+            .order_by(*ReplyPagination.ordering)[:ReplyPagination.page_size + 1]),
+        ('全文检索 倒排索引', SearchPosting.objects.filter(term__in=query_terms('博客')).values_list('term', 'blog_id')),
+    ]
+    return queries
+
+
+def explain(queryset):
+    """
+    返回 (执行计划文本, [问题描述])
+    """
+    vendor = connection.vendor
+    if vendor == 'mysql':
+        plan = queryset.explain(format='json')
+        return plan, analyze_mysql_plan(json.loads(plan))
+    plan = queryset.explain()
+    if vendor == 'sqlite':
+        return plan, analyze_sqlite_plan(plan)
+    if vendor == 'postgresql':
+        return plan, analyze_postgresql_plan(plan)
+    return plan, []
+
+
+def split_accepted(name, issues):
+    """
+    将问题分为 (未接受的问题, 已接受的问题, 原因)
+    """
+    accepted, reason = ACCEPTED_ISSUES.get(name, (set(), ''))
+    remaining = [issue for issue in issues if issue not in accepted]
+    known = [issue for issue in issues if issue in accepted]
+    return remaining, known, reason
+
+
+def analyze_mysql_plan(node, issues=None):
+    if issues is None:
+        issues = []
+    if isinstance(node, dict):
+        table = node.get('table')
+        if isinstance(table, dict) and table.get('access_type') == 'ALL':
+            issues.append(f"全表扫描 {table.get('table_name')}")
+        if node.get('using_filesort'):
+            issues.append('filesort')
+        if node.get('using_temporary_table'):
+            issues.append('临时表')
+        for value in node.values():
+            analyze_mysql_plan(value, issues)
+    elif isinstance(node, list):
+        for value in node:
+            analyze_mysql_plan(value, issues)
+    return issues
+
+
+def analyze_sqlite_plan(plan):
+    issues = []
+    for line in plan.splitlines():
+        match = re.search(r'\bSCAN (\S+)(.*)', line)
+        if match and 'INDEX' not in match.group(2):
+            issues.append(f'全表扫描 {match.group(1)}')
+        if 'USE TEMP B-TREE FOR ORDER BY' in line:
+            issues.append('filesort')
+    return issues
+
+
+def analyze_postgresql_plan(plan):
+    issues = []
+    for line in plan.splitlines():
+        match = re.search(r'Seq Scan on (\S+)', line)
+        if match:
+            issues.append(f'全表扫描 {match.group(1)}')
+        if re.search(r'->\s+Sort\b|^\s*Sort\b', line):
+            issues.append('filesort')
+    return issues
+
+
+def time_query(queryset, repeat=20):
+    """
+    重复执行查询, 返回平均耗时(毫秒)
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        list(queryset.all())
+    return (time.perf_counter() - start) * 1000 / repeat
@@ -0,0 +1,260 @@
+"""
+相关博客
+
+相似度 = 标签权重 × 加权标签 Jaccard + 分类权重 × 分类亲近度 (+ 词元权重 × 标题/摘要词元 Jaccard, 默认关闭)
+- 加权 Jaccard: Σ(共同标签的 idf) / Σ(全部标签的 idf), 越少见的标签权重越高
+- 分类亲近度: 两个分类物化路径的公共前缀层数 / 较深分类的层数, 同一分类为 1
+- 候选集: 有共同标签的博客(按标签从少见到常见依次取最新的博客, 最多 TAG_CANDIDATES 篇),
+  以及同分类下最新的若干篇博客; 候选数量有上限, 计算量不随热门标签下的博客数量增长
+
+每篇博客的前 RELATED_LIMIT 篇相关博客保存在 RelatedBlogs 中:
+- 标签变化(m2m_changed)或分类变化时, 在事务提交后(schedule_refresh)重新计算该博客,
+  并按相似度的对称性更新候选博客的列表; 计算不在写入博客的事务中执行, 只锁定列表需要变化的行
+- 已删除的博客在读取时跳过; 标签的 idf 随时间漂移, 建议定期执行 rebuildrelated 命令重算
+"""
+import hashlib
+import heapq
+import math
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+
+from myblog_backend.versioning import bump_version
+from .models import Blog, RelatedBlogs, SearchPosting
+
+RELATED_LIMIT = 10
+# 同分类候选的数量
+CATEGORY_CANDIDATES = 20
+# 共同标签候选的数量上限
+TAG_CANDIDATES = 200
+TAG_WEIGHT = 0.7
+CATEGORY_WEIGHT = 0.3
+BULK_BATCH_SIZE = 500
+
+
+def term_weight():
+    return settings.BLOG_RELATED_TERM_WEIGHT
+
+
+def signature(category_id, tag_ids):
+    text = f'{category_id}:' + ','.join(map(str, sorted(tag_ids)))
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def category_affinity(path_a, path_b):
+    if not path_a or not path_b:
+        return 0.0
+    a, b = path_a.strip('/').split('/'), path_b.strip('/').split('/')
+    common = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        common += 1
+    return common / max(len(a), len(b))
+
+
+def weighted_jaccard(a, b, idf):
+    if not a or not b:
+        return 0.0
+    shared = a & b
+    if not shared:
+        return 0.0
+    return sum(idf[t] for t in shared) / sum(idf[t] for t in a | b)
+
+
+def inverse_frequencies(sets):
+    """
+    由 {博客: 特征集合} 计算 {特征: idf}
+    """
+    df = defaultdict(int)
+    for features in sets.values():
+        for feature in features:
+            df[feature] += 1
+    total = max(len(sets), 1)
+    return {feature: math.log(1 + total / count) for feature, count in df.items()}
+
+
+class Corpus:
+    """
+    计算相似度需要的数据: 标签集合、分类路径、(可选)词元集合及其 idf
+    """
+
+    def __init__(self, blogs, tags, term_sets=None, tag_idf=None, term_idf=None):
+        # blogs: {blog_id: (category_id, path)}
+        self.blogs = blogs
+        self.tags = tags
+        self.terms = term_sets or {}
+        self.tag_idf = tag_idf if tag_idf is not None else inverse_frequencies(tags)
+        self.term_idf = term_idf if term_idf is not None else inverse_frequencies(self.terms)
+
+    def score(self, a, b):
+        tag_score = weighted_jaccard(self.tags.get(a, set()), self.tags.get(b, set()), self.tag_idf)
+        category_score = category_affinity(self.blogs[a][1], self.blogs[b][1])
+        result = TAG_WEIGHT * tag_score + CATEGORY_WEIGHT * category_score
+        if self.terms:
+            result += term_weight() * weighted_jaccard(self.terms.get(a, set()), self.terms.get(b, set()), self.term_idf)
+        return result
+
+    def score_candidates(self, blog_id, candidates):
+        """
+        返回 {候选博客: 相似度}, 只保留相似度大于 0 的候选
+        """
+        scores = {}
+        for candidate in candidates:
+            if candidate != blog_id and candidate in self.blogs:
+                value = self.score(blog_id, candidate)
+                if value > 0:
+                    scores[candidate] = round(value, 4)
+        return scores
+
+
+def top(scores, limit=RELATED_LIMIT):
+    # 相似度相同时较新的博客优先
+    return [[blog_id, score] for blog_id, score in heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], item[0]))]
+
+
+def load_term_sets(blog_ids=None):
+    postings = SearchPosting.objects.filter(Q(title_tf__gt=0) | Q(summary_tf__gt=0))
+    if blog_ids is not None:
+        postings = postings.filter(blog_id__in=blog_ids)
+    sets = defaultdict(set)
+    for blog_id, term in postings.values_list('blog_id', 'term').iterator(chunk_size=5000):
+        sets[blog_id].add(term)
+    return sets
+
+
+def load_tag_idf(tag_ids):
+    """
+    指定标签的 idf, 文档总数按全部博客计算
+    """
+    through = Blog.tags.through
+    total = Blog.objects.count() or 1
+    df = through.objects.filter(tag_id__in=tag_ids).values('tag_id').annotate(count=Count('blog_id')).values_list('tag_id', 'count')
+    return {tag_id: math.log(1 + total / count) for tag_id, count in df}
+
+
+def tag_candidates(tag_ids, idf, newest):
+    """
+    按标签从少见到常见(idf 从高到低)依次加入带该标签的最新博客, 达到 TAG_CANDIDATES 篇后停止
+    newest(tag_id, limit) 返回带该标签的博客 id, 按 id 降序
+    """
+    candidates = set()
+    for tag_id in sorted(tag_ids, key=lambda tag_id: (-idf.get(tag_id, 0), tag_id)):
+        if len(candidates) >= TAG_CANDIDATES:
+            break
+        candidates.update(newest(tag_id, TAG_CANDIDATES - len(candidates)))
+    return candidates
+
+
+def schedule_refresh(blog_id):
+    """
+    在当前事务提交后重新计算(不在事务中时立即执行), 事务回滚时不计算;
+    同一事务中多次调度时, 第一次计算后分类和标签的摘要已是最新, 之后的调度直接跳过
+    """
+    transaction.on_commit(lambda: refresh(blog_id))
+
+
+def refresh(blog_id, force=False):
+    """
+    重新计算一篇博客的相关博客, 并把新的相似度同步到候选博客的列表中
+    分类和标签未变化时跳过(force=True 时强制计算), 返回是否重新计算
+    """
+    through = Blog.tags.through
+    category_id = Blog.objects.filter(id=blog_id).values_list('category_id', flat=True).first()
+    if category_id is None:
+        return False
+    tag_ids = set(through.objects.filter(blog_id=blog_id).values_list('tag_id', flat=True))
+    digest = signature(category_id, tag_ids)
+    entry = RelatedBlogs.objects.filter(blog_id=blog_id).first()
+    if entry is not None and entry.signature == digest and not force:
+        return False
+
+    def newest(tag_id, limit):
+        return through.objects.filter(tag_id=tag_id).order_by('-blog_id').values_list('blog_id', flat=True)[:limit]
+
+    candidates = tag_candidates(tag_ids, load_tag_idf(tag_ids), newest)
+    candidates.update(
+        Blog.objects.filter(category_id=category_id).order_by('-id').values_list('id', flat=True)[:CATEGORY_CANDIDATES + 1]
+    )
+    previous = {item[0] for item in entry.items} if entry is not None else set()
+    involved = candidates | previous | {blog_id}
+
+    tags = defaultdict(set)
+    for other, tag_id in through.objects.filter(blog_id__in=involved).values_list('blog_id', 'tag_id'):
+        tags[other].add(tag_id)
+    blogs = {other: (c, p) for other, c, p in Blog.objects.filter(id__in=involved).values_list('id', 'category_id', 'category__path')}
+    tag_idf = load_tag_idf({tag_id for features in tags.values() for tag_id in features})
+    corpus = Corpus(blogs, tags, load_term_sets(involved) if term_weight() else None, tag_idf=tag_idf)
+    scores = corpus.score_candidates(blog_id, candidates | previous)
+
+    def merge(other):
+        items = [item for item in other.items if item[0] != blog_id]
+        if other.blog_id in scores:
+            items.append([blog_id, scores[other.blog_id]])
+        return top(dict(map(tuple, items)))
+
+    # 相似度是对称的: 把本博客的新得分合并进候选博客的列表; 先不加锁找出需要变化的行, 只锁定这些行
+    others = RelatedBlogs.objects.filter(blog_id__in=(candidates | previous) - {blog_id})
+    stale = [other.blog_id for other in others if merge(other) != other.items]
+    with transaction.atomic():
+        RelatedBlogs.objects.update_or_create(blog_id=blog_id, defaults={'signature': digest, 'items': top(scores)})
+        changed = []
+        for other in RelatedBlogs.objects.select_for_update().filter(blog_id__in=stale).order_by('blog_id'):
+            items = merge(other)
+            if items != other.items:
+                other.items = items
+                changed.append(other)
+        RelatedBlogs.objects.bulk_update(changed, ['items'], batch_size=BULK_BATCH_SIZE)
+    bump_version(('blog', blog_id), *[('blog', other.blog_id) for other in changed])
+    return True
+
+
+def rebuild(stdout=None):
+    """
+    全量重算: 一次读入全部标签关系, 通过倒排表(标签 -> 博客)只比较有共同标签的博客,
+    每篇博客的候选数量有上限, 总计算量与博客数量成正比; 返回计算的博客数量
+    """
+    through = Blog.tags.through
+    blogs = {blog_id: (c, p) for blog_id, c, p in Blog.objects.values_list('id', 'category_id', 'category__path').iterator(chunk_size=5000)}
+    tags = defaultdict(set)
+    postings = defaultdict(list)
+    for blog_id, tag_id in through.objects.values_list('blog_id', 'tag_id').iterator(chunk_size=5000):
+        tags[blog_id].add(tag_id)
+        postings[tag_id].append(blog_id)
+    for blog_ids in postings.values():
+        blog_ids.sort(reverse=True)
+    by_category = defaultdict(list)
+    for blog_id in sorted(blogs, reverse=True):
+        by_category[blogs[blog_id][0]].append(blog_id)
+
+    # 与 load_tag_idf 一致, 文档总数按全部博客计算
+    idf = {tag_id: math.log(1 + max(len(blogs), 1) / len(blog_ids)) for tag_id, blog_ids in postings.items()}
+    corpus = Corpus(blogs, tags, load_term_sets() if term_weight() else None, tag_idf=idf)
+
+    entries = []
+    for blog_id, (category_id, _) in blogs.items():
+        candidates = tag_candidates(tags.get(blog_id, ()), idf, lambda tag_id, limit: postings[tag_id][:limit])
+        candidates.update(by_category[category_id][:CATEGORY_CANDIDATES + 1])
+        entries.append(RelatedBlogs(
+            blog_id=blog_id,
+            signature=signature(category_id, tags.get(blog_id, ())),
+            items=top(corpus.score_candidates(blog_id, candidates)),
+        ))
+        if stdout is not None and len(entries) % 1000 == 0:
+            stdout.write(f'已计算 {len(entries)} 篇博客')
+
+    with transaction.atomic():
+        RelatedBlogs.objects.all().delete()
+        RelatedBlogs.objects.bulk_create(entries, batch_size=BULK_BATCH_SIZE)
+    bump_version(*[('blog', blog_id) for blog_id in blogs])
+    return len(entries)
+
+
+def get_related(blog_id, limit=RELATED_LIMIT):
+    """
+    返回 [(博客id, 相似度)]
+    """
+    items = RelatedBlogs.objects.filter(blog_id=blog_id).values_list('items', flat=True).first() or []
+    return [(item[0], item[1]) for item in items[:limit]]
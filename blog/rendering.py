@@ -0,0 +1,104 @@
+"""
+博客正文渲染
+
+把 Markdown 正文渲染为经过清洗的 HTML, 同时提取目录、字数和阅读时间。
+结果保存在 BlogRendition 中, 按 (blog.id, updated_at) 判断是否有效:
+- 博客保存时通过信号重新渲染(正文未变化时只更新对应的 updated_at)
+- 读取时发现结果过期会重新渲染并保存, 同一个博客实例只读取一次
+- renderblogs 命令可批量重新渲染全部博客
+"""
+import hashlib
+import math
+import re
+
+import markdown
+import nh3
+from markdown.extensions.toc import slugify_unicode
+
+from .models import BlogRendition
+from .search import CJK_RANGES
+
+MARKDOWN_EXTENSIONS = ['extra', 'sane_lists', 'toc']
+MARKDOWN_EXTENSION_CONFIGS = {'toc': {'slugify': slugify_unicode}}
+
+# 在 nh3 默认白名单的基础上, 保留标题锚点和代码块语言
+ALLOWED_ATTRIBUTES = {tag: set(attrs) for tag, attrs in nh3.ALLOWED_ATTRIBUTES.items()}
+for heading in ('h1', 'h2', 'h3', 'h4', 'h5', 'h6'):
+    ALLOWED_ATTRIBUTES.setdefault(heading, set()).add('id')
+ALLOWED_ATTRIBUTES.setdefault('code', set()).add('class')
+
+# 阅读速度: 中文每分钟 400 字, 英文每分钟 200 词
+CJK_CHARS_PER_MINUTE = 400
+WORDS_PER_MINUTE = 200
+CJK_RE = re.compile(f'[{CJK_RANGES}]')
+WORD_RE = re.compile(r'[A-Za-z0-9]+(?:[\'’.-][A-Za-z0-9]+)*')
+TAG_RE = re.compile(r'<[^>]+>')
+
+
+def content_hash(content):
+    return hashlib.sha1((content or '').encode('utf-8')).hexdigest()
+
+
+def simplify_toc(tokens):
+    return [
+        {
+            'level': token['level'],
+            'id': token['id'],
+            'name': token['name'],
+            'children': simplify_toc(token['children']),
+        }
+        for token in tokens
+    ]
+
+
+def count_words(text):
+    """
+    返回 (中文字数, 英文单词数)
+    """
+    return len(CJK_RE.findall(text)), len(WORD_RE.findall(CJK_RE.sub(' ', text)))
+
+
+def render_markdown(content):
+    """
+    渲染 Markdown, 返回 {'html', 'toc', 'word_count', 'reading_time'}
+    """
+    md = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS, extension_configs=MARKDOWN_EXTENSION_CONFIGS)
+    html = nh3.clean(md.convert(content or ''), attributes=ALLOWED_ATTRIBUTES)
+    cjk_chars, words = count_words(TAG_RE.sub(' ', html))
+    minutes = cjk_chars / CJK_CHARS_PER_MINUTE + words / WORDS_PER_MINUTE
+    return {
+        'html': html,
+        'toc': simplify_toc(md.toc_tokens),
+        'word_count': cjk_chars + words,
+        'reading_time': max(1, math.ceil(minutes)),
+    }
+
+
+def render_blog(blog, force=False):
+    """
+    渲染并保存一篇博客, 返回 BlogRendition; 正文未变化时不会重新渲染
+    """
+    digest = content_hash(blog.content)
+    rendition = BlogRendition.objects.filter(blog_id=blog.id).first()
+    if rendition is not None and not force and rendition.content_hash == digest:
+        if rendition.source_updated_at != blog.updated_at:
+            rendition.source_updated_at = blog.updated_at
+            BlogRendition.objects.filter(blog_id=blog.id).update(source_updated_at=blog.updated_at)
+    else:
+        rendition = BlogRendition(blog_id=blog.id, source_updated_at=blog.updated_at, content_hash=digest, **render_markdown(blog.content))
+        rendition.save()
+    blog._rendition = rendition
+    return rendition
+
+
+def get_rendition(blog):
+    """
+    读取博客当前版本的渲染结果, 结果过期或不存在时重新渲染
+    """
+    rendition = getattr(blog, '_rendition', None)
+    if rendition is None:
+        rendition = BlogRendition.objects.filter(blog_id=blog.id).first()
+    if rendition is None or rendition.source_updated_at != blog.updated_at:
+        rendition = render_blog(blog)
+    blog._rendition = rendition
+    return rendition
@@ -0,0 +1,292 @@
+"""
+博客全文检索
+
+- 分词: 中日韩文字按单字 + 二元组(bigram)切分, 字母数字按单词切分, 不依赖外部分词库
+- 索引: SearchPosting 保存 (词元, 博客) 在标题/摘要/正文中的词频, SearchDocument 保存各字段长度
+- 排序: BM25F, 标题和摘要的权重高于正文
+- 博客保存时通过信号增量更新索引, rebuildsearchindex 命令可批量重建
+"""
+import hashlib
+import html
+import math
+import re
+import unicodedata
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Avg, Count
+
+from .models import Blog, SearchDocument, SearchPosting
+
+# 字段权重
+FIELD_WEIGHTS = {'title': 3.0, 'summary': 2.0, 'content': 1.0}
+# BM25 参数
+K1 = 1.2
+B = 0.75
+# 词元最大长度, 与 SearchPosting.term 一致
+MAX_TERM_LENGTH = 32
+# 批量写入倒排索引时每批的行数
+BULK_BATCH_SIZE = 2000
+
+CJK_RANGES = (
+    '\u3040-\u30ff'  # 日文假名
+    '\u3400-\u4dbf'  # 扩展 A
+    '\u4e00-\u9fff'  # 基本汉字
+    '\uac00-\ud7af'  # 韩文
+    '\uf900-\ufaff'  # 兼容汉字
+)
+TOKEN_RE = re.compile(f'([{CJK_RANGES}]+)|([a-z0-9]+)')
+
+
+def normalize(text):
+    """
+    全角转半角并转为小写
+    """
+    return unicodedata.normalize('NFKC', text or '').lower()
+
+
+def tokenize(text):
+    """
+    索引时使用的分词: 中文连续片段产生所有单字和二元组, 英文/数字产生单词
+    """
+    tokens = []
+    for match in TOKEN_RE.finditer(normalize(text)):
+        cjk, word = match.groups()
+        if cjk:
+            tokens.extend(cjk)
+            tokens.extend(cjk[i:i + 2] for i in range(len(cjk) - 1))
+        else:
+            tokens.append(word[:MAX_TERM_LENGTH])
+    return tokens
+
+
+def query_terms(query):
+    """
+    查询时使用的分词: 中文片段只使用二元组(单字片段使用单字), 比单字匹配更精确
+    """
+    terms = []
+    for match in TOKEN_RE.finditer(normalize(query)):
+        cjk, word = match.groups()
+        if cjk:
+            if len(cjk) == 1:
+                terms.append(cjk)
+            else:
+                terms.extend(cjk[i:i + 2] for i in range(len(cjk) - 1))
+        else:
+            terms.append(word[:MAX_TERM_LENGTH])
+    return list(dict.fromkeys(terms))
+
+
+def highlight_patterns(query):
+    """
+    高亮时使用的片段: 完整的中文片段/英文单词优先, 其次是其中的二元组
+    """
+    pieces = [cjk or word for cjk, word in TOKEN_RE.findall(normalize(query))]
+    return sorted(set(pieces) | set(query_terms(query)), key=len, reverse=True)
+
+
+def compute_checksum(blog):
+    text = '\x1f'.join([blog.title or '', blog.summary or '', blog.content or ''])
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def build_index_rows(blog):
+    """
+    为一篇博客生成 (SearchDocument, [SearchPosting]), 不写数据库
+    """
+    counters = {field: Counter(tokenize(getattr(blog, field))) for field in FIELD_WEIGHTS}
+    document = SearchDocument(
+        blog_id=blog.id,
+        title_length=sum(counters['title'].values()),
+        summary_length=sum(counters['summary'].values()),
+        content_length=sum(counters['content'].values()),
+        checksum=compute_checksum(blog),
+    )
+    terms = set().union(*counters.values())
+    postings = [
+        SearchPosting(
+            term=term,
+            blog_id=blog.id,
+            title_tf=counters['title'][term],
+            summary_tf=counters['summary'][term],
+            content_tf=counters['content'][term],
+        )
+        for term in terms
+    ]
+    return document, postings
+
+
+def index_blog(blog, force=False):
+    """
+    增量更新一篇博客的索引; 文本未变化时跳过(例如只切换了置顶状态)
+    返回是否重新建立了索引
+    """
+    if not force:
+        checksum = SearchDocument.objects.filter(blog_id=blog.id).values_list('checksum', flat=True).first()
+        if checksum == compute_checksum(blog):
+            return False
+    document, postings = build_index_rows(blog)
+    with transaction.atomic():
+        SearchPosting.objects.filter(blog_id=blog.id).delete()
+        SearchDocument.objects.update_or_create(
+            blog_id=blog.id,
+            defaults={
+                'title_length': document.title_length,
+                'summary_length': document.summary_length,
+                'content_length': document.content_length,
+                'checksum': document.checksum,
+            },
+        )
+        SearchPosting.objects.bulk_create(postings, batch_size=BULK_BATCH_SIZE)
+    return True
+
+
+def rebuild_index(queryset=None, chunk_size=200, stdout=None):
+    """
+    批量重建索引, 逐批读取博客, 不会一次性加载全部正文
+    返回建立索引的博客数量
+    """
+    if queryset is None:
+        queryset = Blog.objects.all()
+        SearchPosting.objects.all().delete()
+        SearchDocument.objects.all().delete()
+    else:
+        SearchPosting.objects.filter(blog__in=queryset).delete()
+        SearchDocument.objects.filter(blog__in=queryset).delete()
+
+    documents, postings, total = [], [], 0
+    blogs = queryset.only('id', 'title', 'summary', 'content').order_by('id').iterator(chunk_size=chunk_size)
+    for blog in blogs:
+        document, blog_postings = build_index_rows(blog)
+        documents.append(document)
+        postings.extend(blog_postings)
+        total += 1
+        if len(documents) >= chunk_size:
+            _write_batch(documents, postings)
+            documents, postings = [], []
+            if stdout is not None:
+                stdout.write(f'已索引 {total} 篇博客')
+    _write_batch(documents, postings)
+    return total
+
+
+def _write_batch(documents, postings):
+    with transaction.atomic():
+        SearchDocument.objects.bulk_create(documents, batch_size=BULK_BATCH_SIZE)
+        SearchPosting.objects.bulk_create(postings, batch_size=BULK_BATCH_SIZE)
+
+
+def collection_stats():
+    """
+    返回 (文档总数, {字段: 平均长度})
+    """
+    stats = SearchDocument.objects.aggregate(
+        total=Count('blog_id'),
+        title=Avg('title_length'),
+        summary=Avg('summary_length'),
+        content=Avg('content_length'),
+    )
+    return stats['total'], {field: stats[field] or 1.0 for field in FIELD_WEIGHTS}
+
+
+def rank(query):
+    """
+    按 BM25F 计算相关度, 返回按得分降序的 [(blog_id, score)]
+    """
+    terms = query_terms(query)
+    if not terms:
+        return []
+    total, average = collection_stats()
+    if not total:
+        return []
+
+    rows = SearchPosting.objects.filter(term__in=terms).values_list(
+        'term', 'blog_id', 'title_tf', 'summary_tf', 'content_tf',
+        'blog__search_document__title_length',
+        'blog__search_document__summary_length',
+        'blog__search_document__content_length',
+    )
+    by_term = {}
+    for row in rows:
+        by_term.setdefault(row[0], []).append(row[1:])
+
+    scores = Counter()
+    for term, postings in by_term.items():
+        df = len(postings)
+        idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+        for blog_id, title_tf, summary_tf, content_tf, title_len, summary_len, content_len in postings:
+            weighted_tf = 0.0
+            for field, tf, length in (
+                ('title', title_tf, title_len),
+                ('summary', summary_tf, summary_len),
+                ('content', content_tf, content_len),
+            ):
+                if tf:
+                    norm = 1 - B + B * (length or 0) / average[field]
+                    weighted_tf += FIELD_WEIGHTS[field] * tf / norm
+            scores[blog_id] += idf * weighted_tf / (K1 + weighted_tf)
+
+    return sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+
+
+def normalize_with_offsets(text):
+    """
+    逐字符规范化, 返回 (规范化文本, 每个规范化字符在原文中的位置)
+    全角字符、连字等规范化后长度可能变化, 通过位置表把匹配结果对应回原文
+    """
+    if text.isascii():
+        return text.lower(), range(len(text))
+    chars, offsets = [], []
+    for index, char in enumerate(text):
+        normalized = char.lower() if char.isascii() else normalize(char)
+        chars.append(normalized)
+        offsets.extend([index] * len(normalized))
+    return ''.join(chars), offsets
+
+
+def match_spans(text, patterns):
+    """
+    在规范化文本上匹配, 返回原文中不重叠的 [(开始, 结束)]
+    """
+    normalized, offsets = normalize_with_offsets(text)
+    matcher = re.compile('|'.join(re.escape(p) for p in patterns))
+    spans = []
+    for match in matcher.finditer(normalized):
+        start, end = offsets[match.start()], offsets[match.end() - 1] + 1
+        if spans and start < spans[-1][1]:
+            # 一个原文字符规范化为多个字符时, 相邻的匹配可能落在同一个原文字符上
+            spans[-1] = (spans[-1][0], max(end, spans[-1][1]))
+        else:
+            spans.append((start, end))
+    return spans
+
+
+def highlight(text, query, length=None):
+    """
+    转义 HTML 后用 <mark> 标出匹配片段; 指定 length 时截取第一个匹配附近的摘要
+    匹配与索引使用相同的规范化(全角转半角、忽略大小写), 标记的是原文中对应的字符
+    """
+    text = text or ''
+    patterns = highlight_patterns(query)
+    if not patterns:
+        return html.escape(text[:length] if length else text)
+    spans = match_spans(text, patterns)
+    if length:
+        start = max(0, spans[0][0] - length // 4) if spans else 0
+        end = start + length
+        prefix = '...' if start > 0 else ''
+        suffix = '...' if end < len(text) else ''
+    else:
+        start, end, prefix, suffix = 0, len(text), '', ''
+
+    parts = []
+    position = start
+    for span_start, span_end in spans:
+        span_start, span_end = max(span_start, start), min(span_end, end)
+        if span_start >= span_end:
+            continue
+        parts.append(html.escape(text[position:span_start]))
+        parts.append(f'<mark>{html.escape(text[span_start:span_end])}</mark>')
+        position = span_end
+    parts.append(html.escape(text[position:end]))
+    return prefix + ''.join(parts) + suffix
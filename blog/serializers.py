@@ -1,6 +1,9 @@
 from rest_framework import serializers
 from .models import Category, Tag, Blog, Comment
 from bloguser.serializers import UserModelSerializer
+from .mixins import SparseFieldsetSerializerMixin
+from .rendering import get_rendition
+from . import neighbors, related
 
 class CommentSerializer(serializers.ModelSerializer):
     """
@@ -22,6 +25,36 @@ class CommentSerializer(serializers.ModelSerializer):
             return obj.parent_comment.user.name
         return None
 
+class CommentThreadSerializer(CommentSerializer):
+    """
+    评论树序列化器, 回复需事先通过 attach_comment_replies 挂载到 thread_replies 上
+    """
+    replies = serializers.SerializerMethodField()
+
+    class Meta(CommentSerializer.Meta):
+        fields = CommentSerializer.Meta.fields + ['replies']
+
+    def get_replies(self, obj):
+        return CommentThreadSerializer(getattr(obj, 'thread_replies', []), many=True, context=self.context).data
+
+def attach_comment_replies(roots, replies):
+    """
+    在内存中组装评论树:
+    - 把 replies 挂到各自父评论的 thread_replies 上(按传入顺序)
+    - 同时填充 parent_comment 缓存, 使 reply_to 不再触发额外查询
+    """
+    nodes = {comment.id: comment for comment in roots}
+    replies = list(replies)
+    nodes.update((reply.id, reply) for reply in replies)
+    for comment in nodes.values():
+        comment.thread_replies = []
+    for reply in replies:
+        parent = nodes.get(reply.parent_comment_id)
+        if parent is not None:
+            reply.parent_comment = parent
+            parent.thread_replies.append(reply)
+    return roots
+
 class CommentCreateSerializer(serializers.ModelSerializer):
     """
     评论创建序列化器
@@ -54,6 +87,7 @@ class CommentCreateSerializer(serializers.ModelSerializer):
                 parent_comment = Comment.objects.get(id=parent_comment_id, blog=blog)
             except Comment.DoesNotExist:
                 raise serializers.ValidationError({'parent_comment_id': '父评论不存在'})
+            attrs['parent_comment'] = parent_comment
             
         attrs['blog'] = blog
 
@@ -62,14 +96,51 @@ class CommentCreateSerializer(serializers.ModelSerializer):
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
-        fields = ['id', 'name', 'parent', 'order', 'created_at', 'updated_at']
+        fields = ['id', 'name', 'parent', 'order', 'depth', 'created_at', 'updated_at']
+        read_only_fields = ['depth']
+
+    def validate_parent(self, parent):
+        """
+        不能把分类移动到自身或其子分类下
+        """
+        if parent is not None and self.instance is not None and self.instance.is_descendant_path(parent.path):
+            raise serializers.ValidationError('不能把分类移动到自身或其子分类下')
+        return parent
+
+def build_category_tree(categories):
+    """
+    在内存中把分类列表组装成树, categories 需带有 blog_count 注解
+    每个节点的 total_blog_count 为该分类及其全部子孙分类的博客数
+    """
+    nodes = {}
+    for category in categories:
+        nodes[category.id] = {
+            'id': category.id,
+            'name': category.name,
+            'parent': category.parent_id,
+            'order': category.order,
+            'depth': category.depth,
+            'blog_count': category.blog_count,
+            'total_blog_count': category.blog_count,
+            'children': [],
+        }
+    roots = []
+    for node in nodes.values():
+        parent = nodes.get(node['parent'])
+        (parent['children'] if parent else roots).append(node)
+    # 从最深的分类开始向上累加博客数
+    for node in sorted(nodes.values(), key=lambda item: item['depth'], reverse=True):
+        parent = nodes.get(node['parent'])
+        if parent:
+            parent['total_blog_count'] += node['total_blog_count']
+    return roots
 
 class TagSerializer(serializers.ModelSerializer):
     class Meta:
         model = Tag
         fields = ['id', 'name', 'created_at', 'updated_at']
 
-class BlogSerializer(serializers.ModelSerializer):
+class BlogSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
     tags = TagSerializer(many=True, read_only=True)
     category_id = serializers.IntegerField(write_only=True, required=True)
@@ -133,18 +204,72 @@ class BlogSerializer(serializers.ModelSerializer):
         
         return blog
 
+class BlogListSerializer(BlogSerializer):
+    """
+    博客列表序列化器, 默认不返回正文, 需要时通过 ?include=content 获取
+    """
+
+    class Meta(BlogSerializer.Meta):
+        optional_fields = ['content']
+
 class BlogDetailSerializer(BlogSerializer):
     """
     博客详情序列化器
+    - html/toc/word_count/reading_time 为预渲染结果, 默认不返回, 需要时使用 ?include=html,toc
+    - related 为预先计算的相关博客(id/title/score), 默认不返回, 需要时使用 ?include=related
+    - previous/next 为上一篇/下一篇(id/title/created_at), 默认不返回, 需要时使用 ?include=previous,next,
+      ?neighbors=category 时只在同一分类内查找
     """
     comments = serializers.SerializerMethodField()
+    html = serializers.SerializerMethodField()
+    toc = serializers.SerializerMethodField()
+    word_count = serializers.SerializerMethodField()
+    reading_time = serializers.SerializerMethodField()
+    related = serializers.SerializerMethodField()
+    previous = serializers.SerializerMethodField()
+    next = serializers.SerializerMethodField()
 
     class Meta:
         model = Blog
-        fields = BlogSerializer.Meta.fields + ['comments']
+        fields = BlogSerializer.Meta.fields + ['comments', 'html', 'toc', 'word_count', 'reading_time', 'related', 'previous', 'next']
+        optional_fields = ['html', 'toc', 'word_count', 'reading_time', 'related', 'previous', 'next']
+
+    def get_html(self, obj):
+        return get_rendition(obj).html
+
+    def get_toc(self, obj):
+        return get_rendition(obj).toc
+
+    def get_word_count(self, obj):
+        return get_rendition(obj).word_count
+
+    def get_reading_time(self, obj):
+        return get_rendition(obj).reading_time
+
+    def get_related(self, obj):
+        scores = dict(related.get_related(obj.id))
+        titles = dict(Blog.objects.filter(id__in=scores).values_list('id', 'title'))
+        # 已删除的博客不返回
+        return [
+            {'id': blog_id, 'title': titles[blog_id], 'score': score}
+            for blog_id, score in scores.items() if blog_id in titles
+        ]
+
+    def get_previous(self, obj):
+        return neighbors.get_neighbor(obj, 'previous', neighbors.get_scope(self.context.get('request')))
+
+    def get_next(self, obj):
+        return neighbors.get_neighbor(obj, 'next', neighbors.get_scope(self.context.get('request')))
 
     def get_comments(self, obj):
         """
-        获取所有评论, 包括对博客的评论和对评论的回复
+        获取评论, 包括对博客的评论和对评论的回复
+        - ?comments_limit=N 只返回最新的 N 条评论, ?omit=comments 不返回评论
+        - 分页浏览完整评论树请使用 /blogs/<id>/comments/ 接口
         """
-        return CommentSerializer(obj.comments.all().order_by('-time'), many=True).data 
\ No newline at end of file
+        comments = obj.comments.select_related('user', 'parent_comment__user').order_by('-time')
+        request = self.context.get('request')
+        limit = request.query_params.get('comments_limit') if request is not None else None
+        if limit is not None and limit.isdigit():
+            comments = comments[:int(limit)]
+        return CommentSerializer(comments, many=True).data 
\ No newline at end of file
@@ -0,0 +1,166 @@
+from django.conf import settings
+from django.db.models import QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+from myblog_backend.versioning import bump_version
+from .models import Blog, Category, Comment, Tag
+from . import archive, hot, neighbors, related, rendering, search
+
+
+@receiver(post_save, sender=Blog, dispatch_uid='blog_update_search_index')
+def update_search_index(sender, instance, raw=False, **kwargs):
+    """
+    博客保存后增量更新全文索引(删除博客时索引随外键级联删除)
+    """
+    if raw:
+        return
+    search.index_blog(instance)
+
+
+@receiver(post_save, sender=Blog, dispatch_uid='blog_render_content')
+def render_content(sender, instance, raw=False, **kwargs):
+    """
+    博客保存后重新渲染正文(正文未变化时不会重复渲染)
+    """
+    if raw:
+        return
+    rendering.render_blog(instance)
+
+
+@receiver(post_save, sender=Blog, dispatch_uid='blog_update_hot_ranking')
+def update_hot_ranking(sender, instance, created=False, raw=False, **kwargs):
+    """
+    新发布的博客计入发布事件; 已有博客保存时同步所属分类的排行
+    """
+    if raw:
+        return
+    if created:
+        hot.record(instance.id, instance.category_id, 'publish', when=instance.created_at)
+    else:
+        hot.move(instance.id, instance.category_id)
+
+
+@receiver(post_delete, sender=Blog, dispatch_uid='blog_remove_hot_ranking')
+def remove_hot_ranking(sender, instance, **kwargs):
+    hot.remove(instance.id)
+
+
+@receiver(post_save, sender=Comment, dispatch_uid='comment_add_hot_score')
+def add_comment_hot_score(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        hot.record(instance.blog_id, instance.blog.category_id, 'comment', when=instance.time)
+
+
+@receiver(post_delete, sender=Comment, dispatch_uid='comment_remove_hot_score')
+def remove_comment_hot_score(sender, instance, origin=None, **kwargs):
+    """
+    删除评论时按评论时间撤销对应的得分
+    删除博客时级联删除的评论(origin 为博客或博客查询集)跳过, 博客的排行由 remove_hot_ranking 整体移除
+    """
+    if isinstance(origin, Blog) or (isinstance(origin, QuerySet) and origin.model is Blog):
+        return
+    blog = Blog.objects.filter(id=instance.blog_id).only('category_id').first()
+    if blog is not None:
+        hot.record(instance.blog_id, blog.category_id, 'comment', when=instance.time, amount=-1)
+
+
+@receiver(post_save, sender=Blog, dispatch_uid='blog_bump_version_on_save')
+@receiver(post_delete, sender=Blog, dispatch_uid='blog_bump_version_on_delete')
+def bump_blog_version(sender, instance, **kwargs):
+    """
+    博客变化后更新详情和列表的版本号(条件请求的 ETag 随之失效)
+    """
+    bump_version(('blog', instance.id), 'blogs', neighbors.SEQUENCE_VERSION)
+
+
+@receiver(post_save, sender=Comment, dispatch_uid='comment_bump_version_on_save')
+@receiver(post_delete, sender=Comment, dispatch_uid='comment_bump_version_on_delete')
+def bump_comment_version(sender, instance, **kwargs):
+    bump_version(('blog', instance.blog_id), 'blogs')
+
+
+# 博客详情和评论树中嵌入的评论者资料
+USER_PROFILE_FIELDS = ('name', 'avatar')
+
+
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL, dispatch_uid='user_detect_profile_change')
+def detect_profile_change(sender, instance, update_fields=None, raw=False, **kwargs):
+    """
+    记录评论者的昵称或头像是否变化(只更新其他字段时, 例如登录时间, 不查询)
+    """
+    instance._profile_changed = False
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and not set(update_fields) & set(USER_PROFILE_FIELDS):
+        return
+    previous = sender.objects.filter(pk=instance.pk).values_list(*USER_PROFILE_FIELDS).first()
+    instance._profile_changed = previous is not None and previous != tuple(getattr(instance, name) for name in USER_PROFILE_FIELDS)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL, dispatch_uid='user_bump_commented_blogs')
+def bump_commented_blogs_version(sender, instance, **kwargs):
+    """
+    评论者的昵称或头像变化后, 更新其评论过的博客的版本号(详情缓存和 ETag 随之失效)
+    """
+    if not getattr(instance, '_profile_changed', False):
+        return
+    blog_ids = Comment.objects.filter(user=instance).values_list('blog_id', flat=True).distinct()
+    namespaces = [('blog', blog_id) for blog_id in blog_ids]
+    if namespaces:
+        bump_version(*namespaces)
+
+
+@receiver(m2m_changed, sender=Blog.tags.through, dispatch_uid='blog_tags_bump_version')
+def bump_blog_tags_version(sender, instance, action, reverse=False, pk_set=None, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        bump_version(('blog', instance.id), 'blogs')
+    elif pk_set:
+        bump_version(*[('blog', blog_id) for blog_id in pk_set], 'blogs')
+    else:
+        # 从标签一侧 clear() 时 pk_set 为空, 无法确定受影响的博客, 使全部博客的版本失效
+        bump_version('taxonomy', 'blogs')
+
+
+@receiver(post_save, sender=Category, dispatch_uid='category_bump_version_on_save')
+@receiver(post_delete, sender=Category, dispatch_uid='category_bump_version_on_delete')
+@receiver(post_save, sender=Tag, dispatch_uid='tag_bump_version_on_save')
+@receiver(post_delete, sender=Tag, dispatch_uid='tag_bump_version_on_delete')
+def bump_taxonomy_version(sender, instance, **kwargs):
+    """
+    分类和标签变化后更新 taxonomy 版本号, 博客详情和列表中的分类/标签名称依赖该版本
+    """
+    bump_version('taxonomy')
+
+
+@receiver(post_save, sender=Blog, dispatch_uid='blog_archive_add')
+def add_to_archive(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        archive.adjust(instance.created_at, 1)
+
+
+@receiver(post_delete, sender=Blog, dispatch_uid='blog_archive_remove')
+def remove_from_archive(sender, instance, **kwargs):
+    archive.adjust(instance.created_at, -1)
+
+
+@receiver(post_save, sender=Blog, dispatch_uid='blog_refresh_related')
+def refresh_related(sender, instance, raw=False, **kwargs):
+    """
+    博客保存的事务提交后重新计算相关博客(分类和标签未变化时跳过)
+    """
+    if not raw:
+        related.schedule_refresh(instance.id)
+
+
+@receiver(m2m_changed, sender=Blog.tags.through, dispatch_uid='blog_tags_refresh_related')
+def refresh_related_on_tags_changed(sender, instance, action, reverse=False, pk_set=None, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        related.schedule_refresh(instance.id)
+    else:
+        # 从标签一侧 clear() 时无法确定受影响的博客, 需要执行 rebuildrelated
+        for blog_id in pk_set or ():
+            related.schedule_refresh(blog_id)
@@ -1,3 +1,1045 @@
-from django.test import TestCase
+import gzip
+import hashlib
+import importlib.util
+import io
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.http import QueryDict
+from django.db import connection
+from django.test import TestCase, override_settings
+from rest_framework import serializers
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from myblog_backend import compression
+from myblog_backend.renderers import OrjsonParser, OrjsonRenderer
+
+from . import detailcache, hot, markdownio, related, search, viewcounter
+from .fastserializers import UnsupportedField, ValuesPlan, compile_plan
+from .filters import filter_blogs
+from .models import Blog, Category, Comment, RelatedBlogs, Tag, ViewCountFlush
+from .views import BlogViewSet, CommentViewSet
+from .serializers import BlogDetailSerializer, BlogListSerializer, CommentSerializer
 
 # Create your tests here.
+
+
+class FastSerializationParityTests(TestCase):
+    """
+    values() 快速路径与序列化器的输出必须完全一致
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.user = User.objects.create_user(email='reader@example.com', name='读者', telephone='13800000001', password='password')
+        cls.other = User.objects.create_user(email='writer@example.com', name='作者', telephone='13800000002', password='password')
+        parent = Category.objects.create(name='后端')
+        child = Category.objects.create(name='Django', parent=parent)
+        tags = [Tag.objects.create(name=name) for name in ('Python', 'Django', 'ORM')]
+        for index, tag in enumerate(tags):
+            Tag.objects.filter(id=tag.id).update(created_at=datetime(2024, 1, 1) + timedelta(days=index))
+        for index in range(5):
+            blog = Blog.objects.create(
+                title=f'测试博客标题{index}',
+                summary='测试博客的摘要内容',
+                content='测试博客的正文内容' * 10,
+                category=child if index % 2 else parent,
+                is_top=index == 3,
+            )
+            blog.tags.set(tags[:index % 4])
+        cls.blog = Blog.objects.order_by('id').first()
+        root = Comment.objects.create(user=cls.user, blog=cls.blog, content='第一条评论的内容')
+        Comment.objects.create(user=cls.other, blog=cls.blog, content='对第一条评论的回复', parent_comment=root)
+
+    def render(self, data):
+        return JSONRenderer().render(data)
+
+    def context(self, params=None):
+        return {'request': Request(APIRequestFactory().get('/', params or {}))}
+
+    def assert_parity(self, serializer_class, queryset, params=None):
+        context = self.context(params)
+        plan = ValuesPlan(serializer_class(context=context))
+        fast = plan.serialize(plan.values(queryset), context)
+        slow = serializer_class(queryset, many=True, context=context).data
+        self.assertEqual(self.render(fast), self.render(slow))
+
+    def test_blog_list_matches_serializer(self):
+        queryset = Blog.objects.order_by('-is_top', '-created_at', '-id')
+        for params in ({}, {'include': 'content'}, {'fields': 'id,title,tags'}, {'omit': 'category,tags'}):
+            with self.subTest(params=params):
+                self.assert_parity(BlogListSerializer, queryset, params)
+
+    def test_comment_list_matches_serializer(self):
+        self.assert_parity(CommentSerializer, Comment.objects.filter(blog=self.blog).order_by('-time', '-id'))
+
+    @override_settings(BLOG_FAST_SERIALIZATION=True)
+    def test_unsupported_serializer_is_not_compiled(self):
+        self.assertIsNone(compile_plan(BlogDetailSerializer(context=self.context())))
+        self.assertIsNotNone(compile_plan(BlogListSerializer(context=self.context())))
+
+    def test_related_fields(self):
+        declared = {
+            'tag_ids': lambda: serializers.PrimaryKeyRelatedField(source='tags', many=True, read_only=True),
+            'tag_names': lambda: serializers.SlugRelatedField(source='tags', slug_field='name', many=True, read_only=True),
+            'category_name': lambda: serializers.StringRelatedField(source='category'),
+            'category_slug': lambda: serializers.SlugRelatedField(source='category', slug_field='name', read_only=True),
+        }
+
+        def serializer_class(name):
+            meta = type('Meta', (), {'model': Blog, 'fields': ['id', name]})
+            attrs = {'Meta': meta}
+            if name in declared:
+                attrs[name] = declared[name]()
+            return type('RelatedSerializer', (serializers.ModelSerializer,), attrs)
+
+        # 外键的主键可以走快速路径, 输出一致
+        self.assert_parity(serializer_class('category'), Blog.objects.order_by('id'))
+        # 多对多和需要模型实例的关联字段回退到原序列化器
+        for name in ('tag_ids', 'tag_names', 'category_name', 'category_slug'):
+            with self.subTest(field=name):
+                serializer = serializer_class(name)(context=self.context())
+                with self.assertRaises(UnsupportedField):
+                    ValuesPlan(serializer)
+                with override_settings(BLOG_FAST_SERIALIZATION=True):
+                    self.assertIsNone(compile_plan(serializer))
+
+    def test_api_responses_match(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        category = Category.objects.get(name='Django')
+        urls = [
+            '/api/blog/blogs/?include=content',
+            '/api/blog/blogs/?pagination=cursor&page_size=2',
+            '/api/blog/blogs/latest/',
+            f'/api/blog/categories/{category.id}/blogs/',
+            f'/api/blog/comments/?blog_id={self.blog.id}',
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                with override_settings(BLOG_FAST_SERIALIZATION=False):
+                    slow = client.get(url)
+                with override_settings(BLOG_FAST_SERIALIZATION=True):
+                    fast = client.get(url)
+                self.assertEqual(slow.status_code, 200)
+                self.assertEqual(fast.content, slow.content)
+
+    def test_comments_for_unknown_blog(self):
+        client = APIClient()
+        self.assertEqual(client.get(f'/api/blog/blogs/{self.blog.id}/comments/').status_code, 200)
+        for pk in ('abc', '0'):
+            with self.subTest(pk=pk):
+                self.assertEqual(client.get(f'/api/blog/blogs/{pk}/comments/').status_code, 404)
+
+
+class BlogFilterTests(TestCase):
+    """
+    博客列表组合筛选: 结果正确, 不产生重复行, 查询次数与不筛选时相同
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.parent = Category.objects.create(name='后端')
+        cls.child = Category.objects.create(name='Django', parent=cls.parent)
+        cls.other = Category.objects.create(name='前端')
+        cls.python, cls.django, cls.vue = [Tag.objects.create(name=name) for name in ('Python', 'Django', 'Vue')]
+        specs = [
+            # (分类, 标签, 发布日期, 置顶)
+            (cls.parent, [cls.python], datetime(2024, 1, 5), False),
+            (cls.child, [cls.python, cls.django], datetime(2024, 1, 31, 18), True),
+            (cls.child, [cls.django], datetime(2024, 2, 10), False),
+            (cls.other, [cls.vue], datetime(2024, 3, 1), False),
+            (cls.other, [], datetime(2024, 3, 2), False),
+        ]
+        cls.blogs = []
+        for index, (category, tags, created_at, is_top) in enumerate(specs):
+            blog = Blog.objects.create(title=f'筛选测试{index}', content='正文', category=category, is_top=is_top)
+            blog.tags.set(tags)
+            Blog.objects.filter(pk=blog.pk).update(created_at=created_at)
+            cls.blogs.append(blog.pk)
+
+    def list_ids(self, params):
+        response = APIClient().get('/api/blog/blogs/', {'page_size': 20, **params})
+        self.assertEqual(response.status_code, 200)
+        return sorted(self.blogs.index(item['id']) for item in response.json()['results'])
+
+    def test_tags_any_returns_each_blog_once(self):
+        self.assertEqual(self.list_ids({'tag': f'{self.python.id},{self.django.id}'}), [0, 1, 2])
+
+    def test_tags_all(self):
+        params = {'tag': f'{self.python.id},{self.django.id}', 'tag_match': 'all'}
+        self.assertEqual(self.list_ids(params), [1])
+
+    def test_categories(self):
+        self.assertEqual(self.list_ids({'category': f'{self.child.id},{self.other.id}'}), [1, 2, 3, 4])
+        self.assertEqual(self.list_ids({'category': self.parent.id, 'descendants': 'true'}), [0, 1, 2])
+
+    def test_created_range(self):
+        self.assertEqual(self.list_ids({'created_from': '2024-01-05', 'created_to': '2024-01-31'}), [0, 1])
+        self.assertEqual(self.list_ids({'created_to': '2024-01-31T12:00:00'}), [0])
+        self.assertEqual(self.list_ids({'created_from': '2024-02-10'}), [2, 3, 4])
+
+    def test_is_top(self):
+        self.assertEqual(self.list_ids({'is_top': 'true'}), [1])
+        self.assertEqual(self.list_ids({'is_top': 'false'}), [0, 2, 3, 4])
+
+    def test_combined(self):
+        params = {
+            'category': self.parent.id, 'descendants': 'true', 'tag': self.django.id,
+            'created_from': '2024-01-01', 'created_to': '2024-02-28', 'is_top': 'false',
+        }
+        self.assertEqual(self.list_ids(params), [2])
+
+    def test_invalid_params(self):
+        client = APIClient()
+        for params in ({'tag': 'abc'}, {'category': '1;2'}, {'tag_match': 'some'}, {'created_from': '2024-13-01'},
+                       {'created_from': '2024-01-01T00:00:00+08:00'}, {'created_to': '2024-01-31T12:00:00Z'}, {'is_top': 'yes'}):
+            with self.subTest(params=params):
+                response = client.get('/api/blog/blogs/', params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(next(iter(params)), response.json())
+
+    def test_tag_filters_use_exists_without_join_or_distinct(self):
+        params = QueryDict(f'tag={self.python.id},{self.django.id}&tag_match=all&category={self.child.id}')
+        sql = str(filter_blogs(Blog.objects.all(), params).query).upper()
+        self.assertIn('EXISTS', sql)
+        self.assertNotIn('JOIN', sql)
+        self.assertNotIn('DISTINCT', sql)
+
+    def test_query_count_does_not_grow_with_filters(self):
+        client = APIClient()
+        # 总数、当前页、当前页的标签
+        with self.assertNumQueries(3):
+            client.get('/api/blog/blogs/')
+        with self.assertNumQueries(3):
+            client.get('/api/blog/blogs/', {
+                'tag': f'{self.python.id},{self.django.id}', 'tag_match': 'all',
+                'category': f'{self.child.id},{self.other.id}', 'created_from': '2024-01-01', 'is_top': 'true',
+            })
+        # 包含子孙分类时额外读取一次分类路径
+        with self.assertNumQueries(4):
+            client.get('/api/blog/blogs/', {'category': self.parent.id, 'descendants': 'true', 'tag': self.python.id})
+
+    def test_query_audit_has_no_unaccepted_issues(self):
+        out = io.StringIO()
+        call_command('auditqueries', '--fail-on-issues', stdout=out)
+        self.assertIn('审计完成, 0 条查询存在问题', out.getvalue())
+
+
+class RendererNegotiationTests(TestCase):
+    """
+    按 Accept / Content-Type 协商 JSON 和 MessagePack, 请求和响应都能往返
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(email='reader@example.com', name='读者', telephone='13800000001', password='password')
+        category = Category.objects.create(name='后端')
+        cls.blog = Blog.objects.create(title='协商测试', summary='摘要', content='正文', category=category)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def comment_payload(self):
+        return {'blog_id': self.blog.id, 'content': '一条足够长的评论内容 \u2028 emoji 😀'}
+
+    def test_json_round_trip(self):
+        response = self.client.get('/api/blog/blogs/', HTTP_ACCEPT='application/json')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.json()['results'][0]['title'], '协商测试')
+
+        body = OrjsonRenderer().render(self.comment_payload())
+        response = self.client.post('/api/blog/comments/', body, content_type='application/json', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(OrjsonParser().parse(io.BytesIO(response.content))['content'], self.comment_payload()['content'])
+
+    @skipUnless(settings.MSGPACK_ENABLED, '未安装 msgpack')
+    def test_msgpack_round_trip(self):
+        import msgpack
+
+        json_data = self.client.get('/api/blog/blogs/', HTTP_ACCEPT='application/json').json()
+        response = self.client.get('/api/blog/blogs/', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content), json_data)
+
+        body = msgpack.packb(self.comment_payload())
+        response = self.client.post('/api/blog/comments/', body, content_type='application/msgpack', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(msgpack.unpackb(response.content)['content'], self.comment_payload()['content'])
+
+    def test_etag_depends_on_media_type(self):
+        for url in ('/api/blog/blogs/', f'/api/blog/blogs/{self.blog.id}/'):
+            with self.subTest(url=url):
+                json_response = self.client.get(url, HTTP_ACCEPT='application/json')
+                html_response = self.client.get(url, HTTP_ACCEPT='text/html')
+                self.assertNotEqual(json_response['ETag'], html_response['ETag'])
+                self.assertIn('Accept', json_response['Vary'])
+                # 同一格式返回 304, 另一种格式的 ETag 不会命中
+                not_modified = self.client.get(url, HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=json_response['ETag'])
+                self.assertEqual(not_modified.status_code, 304)
+                self.assertIn('Accept', not_modified['Vary'])
+                response = self.client.get(url, HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=html_response['ETag'])
+                self.assertEqual(response.status_code, 200)
+
+    def test_msgpack_not_acceptable_without_renderer(self):
+        # 未安装 msgpack 时不注册 MessagePack 渲染器和解析器, 协商失败返回 406 / 415 而不是 500
+        renderers = [name for name in settings.REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] if 'MessagePack' in name]
+        self.assertEqual(bool(renderers), settings.MSGPACK_ENABLED)
+        with mock.patch.object(BlogViewSet, 'renderer_classes', [OrjsonRenderer]):
+            self.assertEqual(self.client.get('/api/blog/blogs/', HTTP_ACCEPT='application/msgpack').status_code, 406)
+        with mock.patch.object(CommentViewSet, 'parser_classes', [OrjsonParser]):
+            response = self.client.post('/api/blog/comments/', b'\x80', content_type='application/msgpack')
+            self.assertEqual(response.status_code, 415)
+
+
+class ViewCountFlushTests(TestCase):
+    """
+    阅读量写回: 加锁, 批次号保证提交后中断不会重复累加, 写回期间阅读量不变小
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.blog = Blog.objects.create(title='阅读量', summary='摘要', content='正文', category=Category.objects.create(name='分类'))
+
+    def use_buffer(self, buffer):
+        patcher = mock.patch.object(viewcounter, '_buffer', buffer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return buffer
+
+    def redis_buffer(self):
+        import fakeredis
+        return self.use_buffer(viewcounter.RedisViewCountBuffer(fakeredis.FakeRedis()))
+
+    def view_count(self):
+        return Blog.objects.get(pk=self.blog.pk).view_count
+
+    def test_memory_flush(self):
+        buffer = self.use_buffer(viewcounter.MemoryViewCountBuffer())
+        buffer.incr(self.blog.id, 3)
+        self.assertEqual(viewcounter.flush(), {self.blog.id: 3})
+        self.assertEqual(self.view_count(), 3)
+        self.assertEqual(viewcounter.flush(), {})
+
+    def test_memory_pending_includes_inflight(self):
+        buffer = self.use_buffer(viewcounter.MemoryViewCountBuffer())
+        buffer.incr(self.blog.id, 2)
+        self.assertEqual(buffer.take(), (None, {self.blog.id: 2}))
+        self.assertEqual(buffer.incr(self.blog.id), 3)
+        self.assertEqual(buffer.pending_many([self.blog.id]), {self.blog.id: 3})
+        # 写回失败时保留已取出的增量, 下次重新处理
+        with mock.patch.object(viewcounter, 'apply_deltas', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                viewcounter.flush()
+        self.assertEqual(buffer.pending(self.blog.id), 3)
+        self.assertEqual(viewcounter.flush(), {self.blog.id: 2})
+        self.assertEqual(viewcounter.flush(), {self.blog.id: 1})
+        self.assertEqual(self.view_count(), 3)
+
+    def test_detail_count_during_flush(self):
+        buffer = self.use_buffer(viewcounter.MemoryViewCountBuffer())
+        url = f'/api/blog/blogs/{self.blog.id}/'
+        counts = [self.client.get(url, HTTP_ACCEPT='application/json').json()['view_count'] for _ in range(2)]
+        buffer.take()
+        # 已取出但尚未写回的阅读量仍计入
+        counts.append(self.client.get(url, HTTP_ACCEPT='application/json').json()['view_count'])
+        self.assertEqual(counts, [1, 2, 3])
+
+    def test_flush_skipped_while_locked(self):
+        buffer = self.use_buffer(viewcounter.MemoryViewCountBuffer())
+        buffer.incr(self.blog.id)
+        with buffer.flush_lock() as acquired:
+            self.assertTrue(acquired)
+            self.assertEqual(viewcounter.flush(), {})
+        self.assertEqual(viewcounter.flush(), {self.blog.id: 1})
+
+    @skipUnless(importlib.util.find_spec('fakeredis'), 'fakeredis 未安装')
+    def test_redis_flush(self):
+        buffer = self.redis_buffer()
+        self.assertEqual(buffer.take(), (None, {}))
+        self.assertEqual(buffer.take(), (None, {}))
+        buffer.incr(self.blog.id, 2)
+        self.assertEqual(viewcounter.flush(), {self.blog.id: 2})
+        self.assertEqual(self.view_count(), 2)
+        self.assertEqual(buffer.pending(self.blog.id), 0)
+        with buffer.flush_lock() as acquired:
+            self.assertTrue(acquired)
+            buffer.incr(self.blog.id)
+            self.assertEqual(viewcounter.flush(), {})
+
+    @skipUnless(importlib.util.find_spec('fakeredis'), 'fakeredis 未安装')
+    def test_redis_pending_includes_flushing(self):
+        buffer = self.redis_buffer()
+        buffer.incr(self.blog.id, 2)
+        batch_id, deltas = buffer.take()
+        self.assertEqual(buffer.incr(self.blog.id, 1), 3)
+        self.assertEqual(deltas, {self.blog.id: 2})
+        self.assertEqual(buffer.pending_many([self.blog.id]), {self.blog.id: 3})
+        # 未完成的批次按原批次号重新处理, 新的阅读量留到下次
+        self.assertEqual(buffer.take(), (batch_id, {self.blog.id: 2}))
+
+    @skipUnless(importlib.util.find_spec('fakeredis'), 'fakeredis 未安装')
+    def test_redis_batch_not_applied_twice(self):
+        buffer = self.redis_buffer()
+        buffer.incr(self.blog.id, 5)
+        batch_id, deltas = buffer.take()
+        # 写回已提交, 清理缓冲区之前进程中断
+        self.assertTrue(viewcounter.apply_batch(batch_id, deltas))
+        self.assertEqual(viewcounter.flush(), {})
+        self.assertEqual(self.view_count(), 5)
+        self.assertTrue(ViewCountFlush.objects.filter(batch_id=batch_id).exists())
+        self.assertEqual(buffer.pending(self.blog.id), 0)
+
+    @skipUnless(importlib.util.find_spec('fakeredis'), 'fakeredis 未安装')
+    def test_redis_failed_flush_is_retried(self):
+        buffer = self.redis_buffer()
+        buffer.incr(self.blog.id, 4)
+        with mock.patch.object(viewcounter, 'apply_deltas', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                viewcounter.flush()
+        self.assertEqual(buffer.pending(self.blog.id), 4)
+        self.assertEqual(viewcounter.flush(), {self.blog.id: 4})
+        self.assertEqual(self.view_count(), 4)
+
+
+class MarkdownImportExportTests(TestCase):
+    """
+    front matter 解析, 以及导出后再导入的往返结果
+    """
+
+    def write(self, directory, name, text):
+        path = os.path.join(directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(text)
+        return path
+
+    def test_parse_front_matter(self):
+        meta, body = markdownio.parse_front_matter(
+            '\ufeff---\n'
+            'title: "带: 冒号的标题"\n'
+            "summary: '单引号''摘要'\n"
+            '# 注释\n'
+            'category: 后端\n'
+            'tags: [Python, "Django"]\n'
+            'series:\n'
+            '  - 第一篇\n'
+            '  - "第二篇"\n'
+            'is_top: True\n'
+            '---\n\n'
+            '正文第一行\n---\n正文第二行'
+        )
+        self.assertEqual(meta, {
+            'title': '带: 冒号的标题',
+            'summary': "单引号'摘要",
+            'category': '后端',
+            'tags': ['Python', 'Django'],
+            'series': ['第一篇', '第二篇'],
+            'is_top': True,
+        })
+        self.assertEqual(body, '正文第一行\n---\n正文第二行')
+
+    def test_parse_front_matter_errors(self):
+        for text in ('没有 front matter', '---\ntitle: "标题"\n', '---\n没有冒号\n---\n', '---\ntitle: "未闭合\n---\n'):
+            with self.subTest(text=text):
+                with self.assertRaises(markdownio.FrontMatterError):
+                    markdownio.parse_front_matter(text)
+
+    def test_read_post_validation(self):
+        with tempfile.TemporaryDirectory() as directory:
+            missing = self.write(directory, 'a.md', '---\ntitle: "标题"\n---\n正文')
+            long_title = self.write(directory, 'b.md', f'---\ntitle: "{"长" * 300}"\ncategory: "分类"\n---\n')
+            with self.assertRaisesMessage(markdownio.FrontMatterError, '缺少 category'):
+                markdownio.read_post(missing)
+            with self.assertRaisesMessage(markdownio.FrontMatterError, 'title 超过'):
+                markdownio.read_post(long_title)
+
+    def assert_round_trip(self):
+        parent = Category.objects.create(name='后端')
+        tags = [Tag.objects.create(name=name) for name in ('Python', 'Django')]
+        originals = []
+        for index in range(3):
+            blog = Blog.objects.create(
+                title='同名博客' if index < 2 else '第三篇: "引号" 和\'单引号\'',
+                summary=f'摘要{index}',
+                content=f'# 标题{index}\n\n---\n正文',
+                category=parent,
+                is_top=index == 1,
+            )
+            blog.tags.set(tags[:index])
+            Blog.objects.filter(pk=blog.pk).update(created_at=datetime(2024, 1, 1 + index, 8, 30))
+            originals.append(blog.pk)
+
+        def snapshot(blogs):
+            return sorted(
+                (blog.title, blog.summary, blog.content, blog.category.name, blog.is_top, blog.created_at,
+                 sorted(tag.name for tag in blog.tags.all()))
+                for blog in blogs.select_related('category').prefetch_related('tags')
+            )
+
+        with tempfile.TemporaryDirectory() as directory:
+            self.assertEqual(markdownio.export_posts(directory), 3)
+            exported = snapshot(Blog.objects.filter(pk__in=originals))
+            paths = list(markdownio.iter_markdown_files(directory))
+            self.assertEqual(markdownio.import_posts(paths)[1:], (3, []))
+            imported, skipped, errors = markdownio.import_posts(paths, batch_size=2, skip_existing=False)
+        self.assertEqual((len(imported), skipped, errors), (3, 0, []))
+        self.assertEqual(snapshot(Blog.objects.filter(pk__in=imported)), exported)
+        self.assertEqual(len(set(imported) | set(originals)), 6)
+        # 导入不修改字段定义, 之后新建的博客仍使用当前时间
+        self.assertTrue(Blog._meta.get_field('created_at').auto_now_add)
+        self.assertGreater(Blog.objects.create(title='新博客', category=parent).created_at, datetime(2025, 1, 1))
+
+    def test_round_trip(self):
+        self.assert_round_trip()
+
+    def test_round_trip_without_returning_ids(self):
+        # MySQL 批量插入后不返回主键
+        features = type(connection.features)
+        with mock.patch.object(features, 'can_return_rows_from_bulk_insert', new_callable=mock.PropertyMock, return_value=False):
+            self.assert_round_trip()
+
+    def test_insert_without_returning_ids_with_concurrent_duplicates(self):
+        category = Category.objects.create(name='分类')
+        bulk_create = Blog.objects.bulk_create
+
+        def concurrent_bulk_create(blogs):
+            # 插入前后其他请求写入了同名博客
+            Blog.objects.create(title='同名', content='并发写入', category=category)
+            result = bulk_create(blogs)
+            Blog.objects.create(title='同名', content='并发写入', category=category)
+            return result
+
+        blogs = [Blog(title='同名', content=f'导入{index}', category=category) for index in range(3)]
+        features = type(connection.features)
+        with mock.patch.object(features, 'can_return_rows_from_bulk_insert', new_callable=mock.PropertyMock, return_value=False), \
+                mock.patch.object(Blog.objects, 'bulk_create', side_effect=concurrent_bulk_create):
+            markdownio.insert_blogs(blogs)
+        self.assertEqual(
+            [Blog.objects.get(pk=blog.id).content for blog in blogs],
+            ['导入0', '导入1', '导入2'],
+        )
+        self.assertEqual(Blog.objects.filter(title='同名').count(), 5)
+
+
+class RelatedBlogsTests(TestCase):
+    """
+    相关博客: 相似度计算, 事务提交后增量更新, 与全量重算一致, 候选数量有上限
+    """
+
+    def setUp(self):
+        self.backend = Category.objects.create(name='后端')
+        self.django = Category.objects.create(name='Django', parent=self.backend)
+        self.frontend = Category.objects.create(name='前端')
+        self.tags = {name: Tag.objects.create(name=name) for name in ('Python', 'Django', 'ORM', 'Vue')}
+
+    def create(self, title, category, tags):
+        with self.captureOnCommitCallbacks(execute=True):
+            blog = Blog.objects.create(title=title, category=category)
+            blog.tags.set([self.tags[name] for name in tags])
+        return blog
+
+    def items(self, blog):
+        return RelatedBlogs.objects.get(blog=blog).items
+
+    def test_scores(self):
+        self.assertEqual(related.category_affinity('/1/2/', '/1/2/'), 1)
+        self.assertEqual(related.category_affinity('/1/', '/1/2/'), 0.5)
+        self.assertEqual(related.category_affinity('/1/', '/3/'), 0)
+        self.assertEqual(related.weighted_jaccard({1, 2}, {2, 3}, {1: 1, 2: 2, 3: 1}), 0.5)
+        self.assertEqual(related.weighted_jaccard({1}, set(), {1: 1}), 0)
+        corpus = related.Corpus({1: (1, '/1/'), 2: (2, '/1/2/'), 3: (3, '/3/')}, {1: {10}, 2: {10}, 3: {11}})
+        self.assertAlmostEqual(corpus.score(1, 2), related.TAG_WEIGHT + related.CATEGORY_WEIGHT * 0.5)
+        self.assertEqual(corpus.score_candidates(1, [1, 2, 3, 4]), {2: round(corpus.score(1, 2), 4)})
+        self.assertEqual(related.top({1: 0.5, 2: 0.5, 3: 0.9}, 2), [[3, 0.9], [2, 0.5]])
+
+    def test_refresh_after_commit(self):
+        first = self.create('第一篇', self.django, ['Python', 'Django'])
+        with self.captureOnCommitCallbacks() as callbacks:
+            second = Blog.objects.create(title='第二篇', category=self.django)
+            second.tags.set([self.tags['Django']])
+        # 事务提交前不计算, 提交后才写入
+        self.assertFalse(RelatedBlogs.objects.filter(blog=second).exists())
+        for callback in callbacks:
+            callback()
+        self.assertEqual([item[0] for item in self.items(second)], [first.id])
+        # 对称更新: 第一篇的列表中加入第二篇
+        self.assertEqual([item[0] for item in self.items(first)], [second.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.category = self.frontend
+            second.save()
+            second.tags.set([self.tags['Vue']])
+        self.assertEqual(self.items(second), [])
+        self.assertEqual(self.items(first), [])
+
+    def test_refresh_matches_rebuild(self):
+        blogs = [
+            self.create('Django ORM', self.django, ['Python', 'Django', 'ORM']),
+            self.create('Django 入门', self.django, ['Django']),
+            self.create('Python 基础', self.backend, ['Python']),
+            self.create('Vue 入门', self.frontend, ['Vue']),
+            self.create('ORM 进阶', self.backend, ['ORM', 'Python']),
+        ]
+        # 增量计算时标签的 idf 随博客增加而漂移, 只比较相关博客本身
+        incremental = {blog.id: [item[0] for item in self.items(blog)] for blog in blogs}
+        self.assertEqual(related.rebuild(), len(blogs))
+        rebuilt = {blog.id: self.items(blog) for blog in blogs}
+        self.assertEqual({blog_id: [item[0] for item in items] for blog_id, items in rebuilt.items()}, incremental)
+        for blog in blogs:
+            self.assertTrue(related.refresh(blog.id, force=True))
+        self.assertEqual({blog.id: self.items(blog) for blog in blogs}, rebuilt)
+        self.assertEqual(related.get_related(blogs[0].id, 1), [tuple(rebuilt[blogs[0].id][0])])
+
+    def test_candidates_are_bounded(self):
+        postings = {1: list(range(100, 0, -1)), 2: [300, 200]}
+        idf = {1: 0.1, 2: 5.0}
+        with mock.patch.object(related, 'TAG_CANDIDATES', 5):
+            candidates = related.tag_candidates({1, 2}, idf, lambda tag_id, limit: postings[tag_id][:limit])
+        # 少见的标签优先, 之后按 id 降序补足
+        self.assertEqual(candidates, {300, 200, 100, 99, 98})
+
+
+class DetailCacheTests(TestCase):
+    """
+    博客详情缓存: 评论者资料变化后失效, 命中统计默认关闭
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(email='commenter@example.com', name='评论者', telephone='13800000003', password='password')
+        cls.blog = Blog.objects.create(title='缓存', summary='摘要', content='正文', category=Category.objects.create(name='分类'))
+        Comment.objects.create(user=cls.user, blog=cls.blog, content='一条评论')
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.url = f'/api/blog/blogs/{self.blog.id}/'
+
+    def commenter(self):
+        response = self.client.get(self.url, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['comments'][0]['user']
+
+    def test_profile_change_invalidates(self):
+        self.assertEqual(self.commenter()['name'], '评论者')
+        etag = self.client.get(self.url).headers['ETag']
+        self.user.last_login = datetime(2024, 1, 1)
+        self.user.save(update_fields=['last_login'])
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.user.name = '新昵称'
+        self.user.avatar = '/media/avatar/new.png'
+        self.user.save()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        user = self.commenter()
+        self.assertEqual(user['name'], '新昵称')
+        self.assertTrue(user['avatar_url'].endswith('/media/avatar/new.png'))
+
+    def test_stats(self):
+        self.commenter()
+        self.commenter()
+        self.assertEqual(detailcache.stats()['hits'], 0)
+        with override_settings(BLOG_DETAIL_CACHE_STATS=True):
+            self.commenter()
+        self.assertEqual(detailcache.stats(), {'hits': 1, 'misses': 0, 'hit_ratio': 1.0})
+
+
+@override_settings(BLOG_HOT_HALF_LIFE_HOURS=1, BLOG_HOT_WEIGHTS={'publish': 10, 'view': 1, 'comment': 5})
+class HotRankingTests(TestCase):
+    """
+    热门排行: 得分衰减, 从数据库重算, 排行为空时的分页, 级联删除评论不逐条撤销得分
+    """
+
+    def setUp(self):
+        patcher = mock.patch.object(hot, '_store', hot.MemoryHotStore())
+        self.store = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = get_user_model().objects.create_user(email='hot@example.com', name='热门', telephone='13800000004', password='password')
+        self.category = Category.objects.create(name='分类')
+        self.blogs = [Blog.objects.create(title=f'热门{index}', category=self.category) for index in range(3)]
+
+    def test_decay(self):
+        epoch = 1_000_000
+        self.assertEqual(hot.event_score('view', epoch, epoch), 1)
+        self.assertEqual(hot.event_score('comment', epoch + 3600, epoch), 10)
+        self.assertEqual(hot.event_score('publish', epoch - 7200, epoch, amount=2), 5)
+        # 一个半衰期前的两次阅读与现在的一次阅读得分相同
+        self.assertEqual(hot.event_score('view', epoch - 3600, epoch, 2), hot.event_score('view', epoch, epoch))
+
+    def test_rebuild(self):
+        now = datetime.now()
+        old, recent, viewed = self.blogs
+        Blog.objects.filter(pk=old.pk).update(created_at=now - timedelta(hours=10))
+        Blog.objects.filter(pk=viewed.pk).update(created_at=now - timedelta(hours=1), view_count=20)
+        Comment.objects.create(user=self.user, blog=old, content='评论')
+        self.assertEqual(hot.rebuild(), 3)
+        ranked = hot.HotRanking()[:3]
+        self.assertEqual([blog_id for blog_id, _ in ranked], [viewed.id, recent.id, old.id])
+        self.assertAlmostEqual(dict(ranked)[viewed.id], 30 * 2 ** -1, places=2)
+        self.assertEqual(len(hot.HotRanking([self.category.id])), 3)
+
+    def test_fallback_pagination(self):
+        hot.rebuild()
+        self.store.replace({}, self.store.get_epoch())
+        for index, blog in enumerate(self.blogs):
+            Blog.objects.filter(pk=blog.pk).update(view_count=index)
+        with mock.patch('blog.views.BlogPageNumberPagination.page_size', 2):
+            first = self.client.get('/api/blog/blogs/hot/?page=1', HTTP_ACCEPT='application/json').json()
+            second = self.client.get('/api/blog/blogs/hot/?page=2', HTTP_ACCEPT='application/json').json()
+        self.assertEqual(first['count'], 3)
+        self.assertEqual([blog['id'] for blog in first['results']], [self.blogs[2].id, self.blogs[1].id])
+        self.assertEqual([blog['id'] for blog in second['results']], [self.blogs[0].id])
+        response = self.client.get('/api/blog/blogs/hot/', HTTP_ACCEPT='application/json')
+        self.assertEqual([blog['id'] for blog in response.json()], [blog.id for blog in reversed(self.blogs)])
+
+    def test_cascade_comment_delete(self):
+        blog = self.blogs[0]
+        comments = [Comment.objects.create(user=self.user, blog=blog, content=f'评论{index}') for index in range(3)]
+        with mock.patch.object(hot, 'record') as record:
+            comments[0].delete()
+        self.assertEqual(record.call_args.kwargs['amount'], -1)
+        with mock.patch.object(hot, 'record') as record:
+            blog.delete()
+        record.assert_not_called()
+        self.assertNotIn(blog.id, dict(hot.HotRanking()[:10]))
+
+    def test_multiple_categories(self):
+        child = Category.objects.create(name='子分类', parent=self.category)
+        other = Category.objects.create(name='其他')
+        child_blog = Blog.objects.create(title='子分类博客', category=child)
+        other_blog = Blog.objects.create(title='其他博客', category=other)
+        for blog, views in zip([*self.blogs, child_blog, other_blog], [1, 2, 3, 5, 4]):
+            hot.record(blog.id, blog.category_id, 'view', amount=views)
+
+        def hot_ids(params):
+            response = self.client.get('/api/blog/blogs/hot/', params, HTTP_ACCEPT='application/json')
+            self.assertEqual(response.status_code, 200)
+            return [blog['id'] for blog in response.json()]
+
+        self.assertEqual(hot_ids({'category': f'{self.category.id},{other.id}'}), [other_blog.id, *[blog.id for blog in reversed(self.blogs)]])
+        self.assertEqual(hot_ids({'category': self.category.id, 'descendants': 'true'}), [child_blog.id, *[blog.id for blog in reversed(self.blogs)]])
+        self.assertEqual(len(hot.HotRanking([child.id, other.id])), 2)
+        self.assertEqual(self.client.get('/api/blog/blogs/hot/', {'category': 'a'}).status_code, 400)
+
+    @skipUnless(importlib.util.find_spec('fakeredis'), 'fakeredis 未安装')
+    def test_redis_store(self):
+        import fakeredis
+        redis = fakeredis.FakeRedis()
+        store, other_process = hot.RedisHotStore(redis), hot.RedisHotStore(redis)
+        epoch = store.get_epoch()
+        with mock.patch.object(redis, 'pipeline', wraps=redis.pipeline) as pipeline:
+            self.assertEqual(store.get_epoch(), epoch)
+        pipeline.assert_not_called()
+
+        store.incr(1, 10, 3)
+        store.incr(2, 20, 2)
+        store.incr(3, 30, 1)
+        self.assertEqual(store.range(0, 2, [10, 30]), [(1, 3), (3, 1)])
+        self.assertEqual(store.range(1, 3, [10, 20, 30]), [(2, 2), (3, 1)])
+        self.assertEqual(store.count([20, 30]), 2)
+
+        # 其他进程重建排行后, 按旧基准计算的得分在写入时换算为新基准
+        new_epoch = epoch + settings.BLOG_HOT_HALF_LIFE_HOURS * 3600
+        other_process.replace({1: (10, 1.5)}, new_epoch)
+        store.incr(1, 10, 4)
+        self.assertEqual(store.get_epoch(), new_epoch)
+        self.assertAlmostEqual(dict(store.range(0, 1))[1], 1.5 + 2)
+        self.assertAlmostEqual(dict(store.range(0, 1, [10]))[1], 1.5 + 2)
+
+
+class SearchTests(TestCase):
+    """
+    全文检索: 分词, BM25F 排序, 高亮与索引使用相同的规范化
+    """
+
+    def test_tokenize(self):
+        self.assertEqual(search.tokenize('Ｄｊａｎｇｏ 缓存!'), ['django', '缓', '存', '缓存'])
+        self.assertEqual(search.tokenize('a' * 40), ['a' * search.MAX_TERM_LENGTH])
+        self.assertEqual(search.query_terms('数据库 ORM orm 库'), ['数据', '据库', 'orm', '库'])
+        patterns = search.highlight_patterns('数据库 ORM')
+        self.assertEqual(set(patterns[:2]), {'数据库', 'orm'})
+        self.assertEqual(set(patterns[2:]), {'数据', '据库'})
+
+    def test_rank(self):
+        category = Category.objects.create(name='分类')
+        in_title = Blog.objects.create(title='数据库索引', summary='摘要', content='正文内容', category=category)
+        in_content = Blog.objects.create(title='其他标题', summary='摘要', content='关于数据库索引的正文', category=category)
+        Blog.objects.create(title='无关', summary='摘要', content='正文内容', category=category)
+        ranked = search.rank('数据库')
+        self.assertEqual([blog_id for blog_id, _ in ranked], [in_title.id, in_content.id])
+        self.assertGreater(ranked[0][1], ranked[1][1])
+        # 修改后增量更新索引
+        in_content.content = '正文'
+        in_content.save()
+        self.assertEqual([blog_id for blog_id, _ in search.rank('数据库')], [in_title.id])
+        self.assertEqual(search.rank('!!'), [])
+
+    def test_highlight(self):
+        self.assertEqual(search.highlight('学习 Django 和 <b>', 'django'), '学习 <mark>Django</mark> 和 &lt;b&gt;')
+        # 全角原文与半角查询, 半角原文与全角查询
+        self.assertEqual(search.highlight('使用 Ｄｊａｎｇｏ 框架', 'django'), '使用 <mark>Ｄｊａｎｇｏ</mark> 框架')
+        self.assertEqual(search.highlight('使用 Django 框架', 'ＤＪＡＮＧＯ'), '使用 <mark>Django</mark> 框架')
+        self.assertEqual(search.highlight('ﬁle 和 ＦＩＬＥ', 'file'), '<mark>ﬁle</mark> 和 <mark>ＦＩＬＥ</mark>')
+        self.assertEqual(search.highlight('没有匹配', '!!'), '没有匹配')
+
+    def test_highlight_snippet(self):
+        text = '前' * 100 + 'Ｏｒｍ' + '后' * 100
+        snippet = search.highlight(text, 'orm', length=40)
+        self.assertEqual(snippet, '...' + '前' * 10 + '<mark>Ｏｒｍ</mark>' + '后' * 27 + '...')
+        self.assertEqual(search.highlight('短文本', 'orm', length=40), '短文本')
+
+
+@override_settings(RESPONSE_COMPRESSION=True, RESPONSE_COMPRESSION_MIN_SIZE=100)
+class CompressionTests(TestCase):
+    """
+    gzip 模板拼接的结果与完整压缩一致; 占位符缺失或重复时退回普通响应
+    """
+
+    def test_template_round_trip(self):
+        body = b'{"a":' + b'x' * 500 + b',"view_count":null,"b":"' + b'y' * 500 + b'","comment_count":null}'
+        template = compression.GzipTemplate(body, [b'"comment_count":null', b'"view_count":null'])
+        values = {b'"view_count":null': b'"view_count":12345', b'"comment_count":null': b'"comment_count":0'}
+        expected = body.replace(b'"view_count":null', values[b'"view_count":null']) \
+            .replace(b'"comment_count":null', values[b'"comment_count":null'])
+        length, content = template.render(values)
+        self.assertEqual(length, len(expected))
+        self.assertEqual(gzip.decompress(content), expected)
+        self.assertLess(len(content), len(expected))
+
+    def test_template_placeholder_errors(self):
+        for body in (b'{"view_count":1}', b'[{"view_count":null},{"view_count":null}]'):
+            with self.subTest(body=body):
+                with self.assertRaises(ValueError):
+                    compression.GzipTemplate(body, [b'"view_count":null'])
+
+    def test_choose_encoding(self):
+        request = APIRequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip;q=0.5, br')
+        with mock.patch.object(compression, 'brotli_available', return_value=False):
+            self.assertEqual(compression.choose_encoding(request), 'gzip')
+        with mock.patch.object(compression, 'brotli_available', return_value=True):
+            self.assertEqual(compression.choose_encoding(request), 'br')
+        self.assertIsNone(compression.choose_encoding(APIRequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip;q=0')))
+
+    def compressed_response(self, data):
+        request = Request(APIRequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip'))
+        request.accepted_renderer = OrjsonRenderer()
+        request.accepted_media_type = OrjsonRenderer.media_type
+        return detailcache.compressed_response(request, 1, '"v1"', detailcache.strip_counters(data), {'ETag': '"v1"'}, view_count=7, comment_count=2)
+
+    def test_detail_template_fallback(self):
+        from django.core.cache import cache
+        cache.clear()
+        data = {'id': 1, 'view_count': 0, 'comment_count': 0, 'content': '正文' * 200}
+        response = self.compressed_response(data)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['ETag'], 'W/"v1"')
+        self.assertEqual(gzip.decompress(response.content), OrjsonRenderer().render({**data, 'view_count': 7, 'comment_count': 2}))
+
+        cache.clear()
+        # 计数字段在嵌套数据中重复出现时不使用模板, 并记录为不适用
+        data['related'] = [{'view_count': None}]
+        with mock.patch.object(compression, 'GzipTemplate', wraps=compression.GzipTemplate) as template:
+            self.assertIsNone(self.compressed_response(data))
+            self.assertIsNone(self.compressed_response(data))
+        self.assertEqual(template.call_count, 1)
+
+    def test_detail_matches_identity(self):
+        category = Category.objects.create(name='分类')
+        blog = Blog.objects.create(title='压缩', summary='摘要', content='正文内容' * 300, category=category)
+        url = f'/api/blog/blogs/{blog.id}/'
+        identity = self.client.get(url, HTTP_ACCEPT='application/json').json()
+        response = self.client.get(url, HTTP_ACCEPT='application/json', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        compressed = json.loads(gzip.decompress(response.content))
+        self.assertEqual(compressed.pop('view_count'), identity.pop('view_count') + 1)
+        self.assertEqual(compressed, identity)
+        for response in (response, self.client.get(url, HTTP_ACCEPT='application/json')):
+            self.assertTrue(response['Vary'].startswith('Accept, Accept-Encoding'))
+
+    def test_compressed_cache_is_keyed_by_format(self):
+        from django.core.cache import cache
+        from django.http import HttpResponse
+        cache.clear()
+        body = b'{"content":"' + b'x' * 2000 + b'"}'
+        keys = set()
+        for renderer in (OrjsonRenderer(), BrowsableAPIRenderer()):
+            request = Request(APIRequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip'))
+            request.accepted_renderer = renderer
+            response = compression.compress_response(request, HttpResponse(body, content_type='application/json'))
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertEqual(response['Vary'], 'Accept, Accept-Encoding')
+            keys.add(compression.COMPRESSED_KEY.format(renderer.format, 'gzip', hashlib.md5(body).hexdigest()))
+        self.assertEqual(len(keys), 2)
+        self.assertTrue(all(cache.get(key) is not None for key in keys))
+
+
+class CategoryTreeTests(TestCase):
+    """
+    分类物化路径: 新建、移动子树、拒绝环、删除, 以及按子孙分类筛选博客
+    """
+
+    def setUp(self):
+        self.root = Category.objects.create(name='根')
+        self.child = Category.objects.create(name='子', parent=self.root)
+        self.leaf = Category.objects.create(name='叶', parent=self.child)
+        self.other = Category.objects.create(name='其他')
+
+    def paths(self):
+        return {category.name: (category.path, category.depth) for category in Category.objects.all()}
+
+    def test_paths(self):
+        self.assertEqual(self.paths(), {
+            '根': (f'/{self.root.id}/', 0),
+            '子': (f'/{self.root.id}/{self.child.id}/', 1),
+            '叶': (f'/{self.root.id}/{self.child.id}/{self.leaf.id}/', 2),
+            '其他': (f'/{self.other.id}/', 0),
+        })
+
+    def test_move_subtree(self):
+        self.child.parent = self.other
+        self.child.save()
+        self.assertEqual(self.paths()['子'], (f'/{self.other.id}/{self.child.id}/', 1))
+        self.assertEqual(self.paths()['叶'], (f'/{self.other.id}/{self.child.id}/{self.leaf.id}/', 2))
+        # 移动为顶级分类
+        self.child.parent = None
+        self.child.save()
+        self.assertEqual(self.paths()['子'], (f'/{self.child.id}/', 0))
+        self.assertEqual(self.paths()['叶'], (f'/{self.child.id}/{self.leaf.id}/', 1))
+        self.assertEqual(self.paths()['根'], (f'/{self.root.id}/', 0))
+
+    def test_reject_cycles(self):
+        for parent in (self.root, self.leaf):
+            with self.subTest(parent=parent.name):
+                self.root.parent = parent
+                with self.assertRaises(ValueError):
+                    self.root.save()
+        self.root.refresh_from_db()
+        self.assertIsNone(self.root.parent_id)
+
+        user = get_user_model().objects.create_superuser(email='admin@example.com', name='管理员', telephone='13800000005', password='password')
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.patch(f'/api/blog/categories/{self.root.id}/', {'parent': self.leaf.id}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('parent', response.json())
+
+    def test_delete_and_descendants(self):
+        blogs = {
+            category.name: Blog.objects.create(title=category.name, category=category)
+            for category in (self.root, self.child, self.leaf, self.other)
+        }
+
+        def filtered(category, descendants=True):
+            params = QueryDict(mutable=True)
+            params.update({'category': str(category.id), 'descendants': 'true' if descendants else 'false'})
+            return set(filter_blogs(Blog.objects.all(), params).values_list('title', flat=True))
+
+        self.assertEqual(filtered(self.root), {'根', '子', '叶'})
+        self.assertEqual(filtered(self.child), {'子', '叶'})
+        self.assertEqual(filtered(self.child, descendants=False), {'子'})
+        self.child.parent = self.other
+        self.child.save()
+        self.assertEqual(filtered(self.root), {'根'})
+        self.assertEqual(filtered(self.other), {'其他', '子', '叶'})
+
+        self.child.delete()
+        self.assertFalse(Category.objects.filter(pk__in=[self.child.id, self.leaf.id]).exists())
+        self.assertFalse(Blog.objects.filter(pk__in=[blogs['子'].id, blogs['叶'].id]).exists())
+        self.assertEqual(filtered(self.other), {'其他'})
+
+
+@override_settings(FRONTEND_URL='https://blog.example.com', SITE_URL='https://api.example.com', ALLOWED_HOSTS=['*'])
+class FeedTests(TestCase):
+    """
+    订阅和站点地图: 内容、按版本号缓存、分类子树, 以及站点链接与请求域名
+    """
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.root = Category.objects.create(name='后端')
+        self.child = Category.objects.create(name='Django', parent=self.root)
+        self.other = Category.objects.create(name='前端')
+        self.blogs = {
+            category.name: Blog.objects.create(title=f'{category.name}博客', summary='摘要 <b>', category=category)
+            for category in (self.root, self.child, self.other)
+        }
+        self.client = APIClient()
+
+    def get(self, url, **extra):
+        response = self.client.get(url, **extra)
+        self.assertEqual(response.status_code, 200)
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, content.decode()
+
+    def test_feed_content(self):
+        blog = self.blogs['后端']
+        _, rss = self.get('/api/blog/feeds/rss/')
+        self.assertIn(f'<link>https://blog.example.com/blog/{blog.id}</link>', rss)
+        self.assertIn('<description>摘要 &lt;b&gt;</description>', rss)
+        self.assertIn('href="https://api.example.com/api/blog/feeds/rss/" rel="self"', rss)
+        _, atom = self.get('/api/blog/feeds/atom/')
+        self.assertIn(f'<id>https://blog.example.com/blog/{blog.id}</id>', atom)
+        self.assertEqual(atom.count('<entry>'), 3)
+        self.assertEqual(self.client.get('/api/blog/feeds/json/').status_code, 404)
+
+    def test_cache_and_version_bump(self):
+        response, first = self.get('/api/blog/feeds/rss/')
+        self.assertTrue(response.streaming)
+        # 第二次请求命中缓存
+        response, cached = self.get('/api/blog/feeds/rss/')
+        self.assertFalse(response.streaming)
+        self.assertEqual(cached, first)
+        # 条件请求
+        self.assertEqual(self.client.get('/api/blog/feeds/rss/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        blog = self.blogs['前端']
+        blog.title = '新标题'
+        blog.save()
+        response, updated = self.get('/api/blog/feeds/rss/')
+        self.assertTrue(response.streaming)
+        self.assertIn('新标题', updated)
+
+    @override_settings(SITE_URL='')
+    def test_cache_is_keyed_by_host(self):
+        _, first = self.get('/api/blog/feeds/atom/', HTTP_HOST='a.example.com')
+        _, second = self.get('/api/blog/feeds/atom/', HTTP_HOST='b.example.com')
+        self.assertIn('href="http://a.example.com/api/blog/feeds/atom/" rel="self"', first)
+        self.assertIn('href="http://b.example.com/api/blog/feeds/atom/" rel="self"', second)
+
+    def test_category_subtree(self):
+        _, rss = self.get(f'/api/blog/feeds/category/{self.root.id}/rss/')
+        self.assertIn('后端博客', rss)
+        self.assertIn('Django博客', rss)
+        self.assertNotIn('前端博客', rss)
+        # 路径为空时只包含分类自身, 不会匹配全部博客
+        Category.objects.filter(pk=self.other.id).update(path='')
+        _, rss = self.get(f'/api/blog/feeds/category/{self.other.id}/rss/')
+        self.assertEqual(rss.count('<item>'), 1)
+        self.assertIn('前端博客', rss)
+        self.assertEqual(self.client.get('/api/blog/feeds/category/0/rss/').status_code, 404)
+
+    def test_sitemap(self):
+        _, sitemap = self.get('/sitemap.xml')
+        self.assertEqual(sitemap.count('<url>'), 3)
+        for blog in self.blogs.values():
+            self.assertIn(f'<loc>https://blog.example.com/blog/{blog.id}</loc>', sitemap)
+
+        # 超过单个文件的上限时返回索引, 分页文件的链接按 SITE_URL 生成
+        with mock.patch('blog.feeds.SITEMAP_LIMIT', 2):
+            _, index = self.get('/sitemap.xml')
+            self.assertIn('<sitemapindex', index)
+            self.assertIn('<loc>https://api.example.com/sitemap-2.xml</loc>', index)
+            _, page = self.get('/sitemap-2.xml')
+            self.assertEqual(page.count('<url>'), 1)
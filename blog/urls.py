@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import feeds, views
 
 router = DefaultRouter()
 router.register(r'categories', views.CategoryViewSet)
@@ -9,5 +9,9 @@ router.register(r'blogs', views.BlogViewSet, basename='blog')
 router.register(r'comments', views.CommentViewSet, basename='comment')
 
 urlpatterns = [
+    path('search/', views.BlogSearchView.as_view(), name='blog-search'),
+    path('feeds/<str:fmt>/', feeds.blog_feed, name='blog-feed'),
+    path('feeds/category/<int:pk>/<str:fmt>/', feeds.category_feed, name='category-feed'),
+    path('feeds/tag/<int:pk>/<str:fmt>/', feeds.tag_feed, name='tag-feed'),
     path('', include(router.urls)),
 ]
@@ -0,0 +1,256 @@
+"""
+博客阅读量写缓冲
+
+阅读请求只在 Redis(本地运行时为进程内字典)中累加增量,
+由 flushviewcounts 命令或定时任务批量写回 Blog.view_count,
+避免每次阅读都对同一行执行 UPDATE。
+
+写回过程由锁保护(同一时间只有一个写回进程); 每批增量带有批次号, 批次号与增量在同一事务中
+写入 ViewCountFlush, 写回已提交但清理缓冲区之前进程中断时, 下次写回会跳过该批次而不是重复累加。
+"""
+import contextlib
+import threading
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import counters
+
+# 待写回的阅读量增量(Redis 哈希: blog_id -> 增量)
+PENDING_KEY = 'blog:view_count:pending'
+# 正在写回的增量, 写回失败或进程中断时会在下次写回时重新处理
+FLUSHING_KEY = 'blog:view_count:flushing'
+# 正在写回的增量的批次号
+BATCH_KEY = 'blog:view_count:flushing:batch'
+# 写回锁及其过期时间(秒), 过期时间应大于一次写回的最长耗时
+LOCK_KEY = 'blog:view_count:lock'
+LOCK_TIMEOUT = 300
+# 每条 UPDATE 语句最多处理的博客数量
+FLUSH_BATCH_SIZE = 500
+# 已写回批次的保留时间, 超过后清理
+BATCH_RETENTION = timedelta(days=7)
+
+
+class RedisViewCountBuffer:
+    """
+    基于 Redis 哈希的阅读量缓冲, 多个进程共享同一份增量
+    """
+
+    def __init__(self, redis=None):
+        if redis is None:
+            from django_redis import get_redis_connection
+            redis = get_redis_connection('default')
+        self.redis = redis
+
+    def incr(self, blog_id, amount=1):
+        """
+        累加增量, 返回值与 pending_many([blog_id]) 相同(包括正在写回的部分), 一次往返完成
+        """
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hincrby(PENDING_KEY, blog_id, amount)
+        pipe.hget(FLUSHING_KEY, blog_id)
+        pending, flushing = pipe.execute()
+        return int(pending) + int(flushing or 0)
+
+    def pending(self, blog_id):
+        return self.pending_many([blog_id])[blog_id]
+
+    def pending_many(self, blog_ids):
+        """
+        尚未写回的增量, 包括正在写回的部分(写回期间阅读量不会暂时变小)
+        """
+        blog_ids = list(blog_ids)
+        if not blog_ids:
+            return {}
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hmget(PENDING_KEY, blog_ids)
+        pipe.hmget(FLUSHING_KEY, blog_ids)
+        pending, flushing = pipe.execute()
+        return {
+            blog_id: int(a or 0) + int(b or 0)
+            for blog_id, a, b in zip(blog_ids, pending, flushing)
+        }
+
+    @contextlib.contextmanager
+    def flush_lock(self):
+        """
+        SET NX 加锁(带过期时间, 持有锁的进程中断后自动释放), 已被其他进程持有时返回 False
+        """
+        lock = self.redis.lock(LOCK_KEY, timeout=LOCK_TIMEOUT, blocking=False)
+        if not lock.acquire():
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            try:
+                lock.release()
+            except Exception:
+                # 写回超过 LOCK_TIMEOUT, 锁已过期; 重复写回由批次号保证不会重复累加
+                pass
+
+    def take(self):
+        """
+        返回 (批次号, {blog_id: 增量}); 上次未完成的写回(FLUSHING_KEY 仍存在)按原批次号重新处理,
+        此时新的阅读量留在 PENDING_KEY 中, 等下次写回
+        """
+        if not self.redis.exists(FLUSHING_KEY):
+            batch_id = uuid.uuid4().hex
+            pipe = self.redis.pipeline()
+            # RENAMENX 是原子操作, 之后的阅读量会累加到新的 PENDING_KEY 中; PENDING_KEY 不存在时只会出错, 不影响批次号
+            pipe.renamenx(PENDING_KEY, FLUSHING_KEY)
+            pipe.set(BATCH_KEY, batch_id)
+            renamed = pipe.execute(raise_on_error=False)[0]
+            if renamed is not True:
+                self.redis.delete(BATCH_KEY)
+                return None, {}
+        batch_id = self.redis.get(BATCH_KEY)
+        if batch_id is None:
+            # 旧版本留下的 FLUSHING_KEY 没有批次号
+            batch_id = uuid.uuid4().hex.encode()
+            self.redis.set(BATCH_KEY, batch_id)
+        deltas = {int(k): int(v) for k, v in self.redis.hgetall(FLUSHING_KEY).items()}
+        return batch_id.decode(), deltas
+
+    def done(self):
+        self.redis.delete(FLUSHING_KEY, BATCH_KEY)
+
+
+class MemoryViewCountBuffer:
+    """
+    进程内的阅读量缓冲, 仅用于本地开发和测试
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flushing = threading.Lock()
+        self.deltas = {}
+        # 已取出但尚未写回完成的增量, 写回失败时下次重新处理
+        self.inflight = {}
+
+    def incr(self, blog_id, amount=1):
+        with self.lock:
+            value = self.deltas.get(blog_id, 0) + amount
+            self.deltas[blog_id] = value
+            return value + self.inflight.get(blog_id, 0)
+
+    def pending(self, blog_id):
+        return self.pending_many([blog_id])[blog_id]
+
+    def pending_many(self, blog_ids):
+        with self.lock:
+            return {blog_id: self.deltas.get(blog_id, 0) + self.inflight.get(blog_id, 0) for blog_id in blog_ids}
+
+    @contextlib.contextmanager
+    def flush_lock(self):
+        acquired = self.flushing.acquire(blocking=False)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                self.flushing.release()
+
+    def take(self):
+        """
+        进程内的增量不会在写回提交后残留, 不需要批次号; 上次写回失败的增量优先重新处理
+        """
+        with self.lock:
+            if not self.inflight:
+                self.inflight, self.deltas = self.deltas, {}
+            return None, dict(self.inflight)
+
+    def done(self):
+        with self.lock:
+            self.inflight = {}
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """
+    根据 BLOG_STORE_BACKEND 配置返回当前进程使用的缓冲区
+    """
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                if settings.BLOG_STORE_BACKEND == 'memory':
+                    _buffer = MemoryViewCountBuffer()
+                else:
+                    _buffer = RedisViewCountBuffer()
+    return _buffer
+
+
+def is_enabled():
+    return settings.BLOG_VIEW_COUNT_BUFFER
+
+
+def record_view(blog_id):
+    """
+    记录一次阅读, 返回该博客尚未写回数据库的阅读量增量(与 pending_many 相同, 包括正在写回的部分)
+    """
+    return get_buffer().incr(blog_id)
+
+
+def pending_views(blog_id):
+    return get_buffer().pending(blog_id)
+
+
+def merge_pending_views(items):
+    """
+    把尚未写回的阅读量合并到序列化后的博客数据中, 让阅读量看起来是实时的
+    """
+    items = [item for item in items if 'id' in item and 'view_count' in item]
+    if not items or not is_enabled():
+        return
+    pending = get_buffer().pending_many(item['id'] for item in items)
+    for item in items:
+        item['view_count'] += pending.get(item['id'], 0)
+
+
+def apply_deltas(deltas):
+    """
+    用 CASE WHEN 分批把增量写入 Blog.view_count, 不会修改 updated_at
+    """
+    counters.apply_deltas('view_count', deltas, FLUSH_BATCH_SIZE)
+
+
+def apply_batch(batch_id, deltas):
+    """
+    在一个事务中记录批次号并写入增量; 批次号已记录过(已写回, 但缓冲区未清理)时跳过, 返回 False
+    """
+    from .models import ViewCountFlush
+
+    with transaction.atomic():
+        if batch_id is not None:
+            _, created = ViewCountFlush.objects.get_or_create(batch_id=batch_id)
+            if not created:
+                return False
+            ViewCountFlush.objects.filter(created_at__lt=timezone.now() - BATCH_RETENTION).delete()
+        apply_deltas(deltas)
+    return True
+
+
+def flush():
+    """
+    把缓冲区中的阅读量写回数据库, 返回写回的 {blog_id: 增量};
+    其他进程正在写回时直接返回 {}
+    """
+    buffer = get_buffer()
+    with buffer.flush_lock() as acquired:
+        if not acquired:
+            return {}
+        batch_id, deltas = buffer.take()
+        deltas = {blog_id: delta for blog_id, delta in deltas.items() if delta}
+        if not deltas:
+            buffer.done()
+            return {}
+        # 写回失败时增量保留在缓冲区(FLUSHING_KEY / inflight)中, 下次写回按同一批次重试
+        applied = apply_batch(batch_id, deltas)
+        buffer.done()
+    return deltas if applied else {}
@@ -1,15 +1,63 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import F
+from rest_framework.views import APIView
+from django.db.models import Count
 from django.db import transaction
+from django.utils.cache import patch_vary_headers
+from django.utils.decorators import method_decorator
+from myblog_backend import compression
+from myblog_backend.versioning import conditional, not_modified_response
 from .models import Category, Tag, Blog, Comment
-from .serializers import CategorySerializer, TagSerializer, BlogSerializer, BlogDetailSerializer, CommentSerializer, CommentCreateSerializer
+from .serializers import CategorySerializer, TagSerializer, build_category_tree, BlogSerializer, BlogListSerializer, BlogDetailSerializer, CommentSerializer, CommentCreateSerializer, CommentThreadSerializer, attach_comment_replies
 from .permissions import IsSuperUserOrReadOnly
-from .pagination import BlogPageNumberPagination
+from bloguser.permissons import IsSuperUser
+from .pagination import BlogPagination, BlogPageNumberPagination, CommentCursorPagination
+from .mixins import SparseFieldsetViewMixin, project_queryset
+from . import archive, counters, detailcache, fastserializers, filters, hot as hot_ranking, neighbors, related, search, viewcounter
 
 # Create your views here.
 
+# 条件请求(ETag / Last-Modified)依赖的资源版本, 见 myblog_backend/versioning.py
+TAXONOMY_VERSIONS = conditional(lambda request, *args, **kwargs: ['taxonomy'])
+BLOG_LIST_VERSIONS = conditional(lambda request, *args, **kwargs: ['blogs', 'taxonomy'])
+BLOG_DETAIL_VERSIONS = conditional(lambda request, *args, **kwargs: [('blog', kwargs['pk'])])
+
+
+def serialize_list(view, queryset, serializer, paginator=None, always_load=None):
+    """
+    序列化列表(传入 paginator 时只序列化当前页)
+    - 序列化器的字段都支持时使用 values() 快速路径(见 fastserializers.py)
+    - 否则使用序列化器; 传入 always_load 时先按输出字段裁剪查询(见 mixins.project_queryset)
+    """
+    plan = fastserializers.compile_plan(serializer)
+    if plan is not None:
+        rows = plan.values(queryset, always_load or ('id',))
+        if paginator is not None:
+            rows = paginator.paginate_queryset(rows, view.request, view=view)
+        return plan.serialize(rows, serializer.context)
+    if always_load is not None:
+        queryset = project_queryset(queryset, serializer, always_load)
+    if paginator is not None:
+        queryset = paginator.paginate_queryset(queryset, view.request, view=view)
+    return type(serializer)(queryset, many=True, context=serializer.context).data
+
+
+def paginated_blog_list(view, queryset, blog_count):
+    """
+    分类/标签下的博客列表: 使用博客列表的分页器和序列化器, 只查询输出需要的列和关联
+    """
+    serializer = BlogListSerializer(context=view.get_serializer_context())
+    paginator = BlogPagination()
+    data = serialize_list(view, queryset, serializer, paginator, BlogViewSet.sparse_always_load)
+    viewcounter.merge_pending_views(data)
+    response = paginator.get_paginated_response(data)
+    response.data['blog_count'] = blog_count
+    return response
+
+
+@method_decorator(TAXONOMY_VERSIONS, name='list')
+@method_decorator(TAXONOMY_VERSIONS, name='retrieve')
 class CategoryViewSet(viewsets.ModelViewSet):
     """
     分类视图集
@@ -18,13 +66,32 @@ class CategoryViewSet(viewsets.ModelViewSet):
     serializer_class = CategorySerializer
     permission_classes = [IsSuperUserOrReadOnly]
 
+    @method_decorator(BLOG_LIST_VERSIONS)
+    @action(detail=False, methods=['get'])
+    def tree(self, request):
+        """
+        返回完整的分类树, 每个节点带有自身博客数和包含子孙分类的博客总数(一条聚合查询)
+        """
+        categories = Category.objects.annotate(blog_count=Count('blogs'))
+        return Response(build_category_tree(categories))
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'blogs':
+            queryset = queryset.annotate(blog_count=Count('blogs'))
+        return queryset
+
+    @method_decorator(BLOG_LIST_VERSIONS)
     @action(detail=True, methods=['get'])
     def blogs(self, request, pk=None):
+        """
+        分页获取分类下的博客, 分页和字段参数与博客列表相同; blog_count 为该分类的博客总数
+        """
         category = self.get_object()
-        blogs = Blog.objects.filter(category=category)
-        serializer = BlogSerializer(blogs, many=True)
-        return Response(serializer.data)
+        return paginated_blog_list(self, Blog.objects.filter(category_id=category.id), category.blog_count)
 
+@method_decorator(TAXONOMY_VERSIONS, name='list')
+@method_decorator(TAXONOMY_VERSIONS, name='retrieve')
 class TagViewSet(viewsets.ModelViewSet):
     """
     标签视图集
@@ -33,54 +100,122 @@ class TagViewSet(viewsets.ModelViewSet):
     serializer_class = TagSerializer
     permission_classes = [IsSuperUserOrReadOnly]
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'blogs':
+            queryset = queryset.annotate(blog_count=Count('blogs'))
+        return queryset
+
+    @method_decorator(BLOG_LIST_VERSIONS)
     @action(detail=True, methods=['get'])
     def blogs(self, request, pk=None):
+        """
+        分页获取标签下的博客, 分页和字段参数与博客列表相同; blog_count 为该标签的博客总数
+        """
         tag = self.get_object()
-        blogs = Blog.objects.filter(tags=tag)
-        serializer = BlogSerializer(blogs, many=True)
-        return Response(serializer.data)
+        return paginated_blog_list(self, Blog.objects.filter(filters.tag_exists([tag.id])), tag.blog_count)
 
-class BlogViewSet(viewsets.ModelViewSet):
+class BlogViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """
     博客视图集
+    - 读取接口支持 ?fields= / ?omit= / ?include= 裁剪返回字段, 未请求的列不会被查询
+    - 列表默认不返回正文, 需要时使用 ?include=content
+    - 列表接口支持按多个分类、多个标签(任一/全部)、发布时间范围和置顶组合筛选, 见 filters.py
+    - 列表、详情和评论接口支持条件请求, 版本号未变化时返回 304;
+      阅读量变化不会改变版本号, 304 时客户端显示的阅读量可能略有滞后
     """
     queryset = Blog.objects.all()
     serializer_class = BlogSerializer
     permission_classes = [IsSuperUserOrReadOnly]
-    pagination_class = BlogPageNumberPagination
+    pagination_class = BlogPagination
+    # 游标分页需要读取排序字段
+    sparse_always_load = ('id', 'is_top', 'created_at')
 
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return BlogDetailSerializer
+        if self.action in ['list', 'hot', 'latest', 'archive_month', 'related']:
+            return BlogListSerializer
         return super().get_serializer_class()
 
     def get_queryset(self):
-        queryset = Blog.objects.all()
-        
-        # 按分类筛选
-        category_id = self.request.query_params.get('category', None)
-        if category_id:
-            queryset = queryset.filter(category_id=category_id)
-        
-        # 按标签筛选
-        tag_id = self.request.query_params.get('tag', None)
-        if tag_id:
-            queryset = queryset.filter(tags__id=tag_id)
-        
-        return queryset.select_related('category').prefetch_related('tags')
+        return self.project_queryset(self.filter_blogs(Blog.objects.all()))
+
+    def filter_blogs(self, queryset):
+        # 按分类、标签、发布时间和置顶筛选, 见 filters.py
+        return filters.filter_blogs(queryset, self.request.query_params)
+
+    def serialize_blogs(self, queryset, paginate=False):
+        """
+        序列化博客列表(列表类接口共用), 合并尚未写回的阅读量
+        """
+        paginator = self.paginator if paginate else None
+        data = serialize_list(self, queryset, self.get_serializer(), paginator, self.sparse_always_load)
+        viewcounter.merge_pending_views(data)
+        return data
+
+    @method_decorator(BLOG_LIST_VERSIONS)
+    def list(self, request, *args, **kwargs):
+        data = self.serialize_blogs(self.filter_blogs(Blog.objects.all()), paginate=True)
+        return self.get_paginated_response(data)
 
     def retrieve(self, request, *args, **kwargs):
         """
         重写 retrieve 方法, 在获取文章详情时自动增加阅读量
+        - 详情数据来自读穿透缓存(见 detailcache.py), 每次请求只查询一次实时计数
         """
-        instance = self.get_object()
-        # 增加阅读量
-        Blog.objects.filter(id=instance.id).update(view_count=F('view_count') + 1)
-        # 重新获取更新后的实例
-        instance.refresh_from_db()
-        # 序列化并返回数据
-        serializer = self.get_serializer(instance)
-        return Response(serializer.data)
+        try:
+            row = Blog.objects.filter(pk=kwargs[self.lookup_field]) \
+                .values_list('id', 'category_id', 'view_count', 'comment_count').first()
+        except (TypeError, ValueError):
+            row = None
+        if row is None:
+            return Response({'detail': '博客不存在'}, status=status.HTTP_404_NOT_FOUND)
+        blog_id, category_id, view_count, comment_count = row
+
+        hot_ranking.record(blog_id, category_id, 'view')
+        if not viewcounter.is_enabled():
+            # 未开启写缓冲时直接更新数据库
+            counters.increment(blog_id, 'view_count')
+            view_count += 1
+        else:
+            # 阅读量先记入缓冲区, 返回时合并尚未写回的增量; 返回值与 pending_many 相同,
+            # 包括写回过程中已取出、尚未写入数据库的部分, 写回期间阅读量不会暂时变小
+            view_count += viewcounter.record_view(blog_id)
+
+        # 条件请求在记录阅读之后检查, 返回 304 的请求同样计入阅读量
+        versions = [('blog', blog_id), 'taxonomy']
+        if neighbors.is_requested(request):
+            # 上一篇/下一篇随其他博客的新增、修改和删除而变化
+            versions.append(neighbors.SEQUENCE_VERSION)
+        not_modified, headers = not_modified_response(request, versions)
+        if not_modified is not None:
+            return not_modified
+
+        data = detailcache.get_detail(
+            request, blog_id, headers['ETag'],
+            lambda: self.get_serializer(self.get_object()).data,
+        )
+        response = detailcache.compressed_response(
+            request, blog_id, headers['ETag'], data, headers,
+            view_count=view_count, comment_count=comment_count,
+        )
+        if response is None:
+            response = Response(detailcache.with_counters(data, view_count=view_count, comment_count=comment_count), headers=headers)
+        if compression.is_enabled():
+            # 是否压缩取决于 Accept-Encoding, 未压缩的响应同样需要 Vary
+            patch_vary_headers(response, ('Accept', 'Accept-Encoding'))
+        return response
+
+    @action(detail=False, methods=['get'], permission_classes=[IsSuperUser])
+    def cache_stats(self, request):
+        """
+        博客详情缓存的命中统计(仅限超级用户, 需开启 BLOG_DETAIL_CACHE_STATS), ?reset=true 时返回后清零
+        """
+        data = detailcache.stats()
+        if request.query_params.get('reset') in ('1', 'true'):
+            detailcache.reset_stats()
+        return Response(data)
 
     @action(detail=True, methods=['post'])
     def toggle_top(self, request, pk=None):
@@ -101,17 +236,130 @@ class BlogViewSet(viewsets.ModelViewSet):
             'is_top': blog.is_top
         })
 
+    @method_decorator(BLOG_DETAIL_VERSIONS)
+    @action(detail=True, methods=['get'])
+    def comments(self, request, pk=None):
+        """
+        分页获取博客的评论树:
+        - 顶层评论按时间倒序游标分页(?cursor=, ?page_size=)
+        - 每条顶层评论附带完整的回复树(replies), 回复按时间正序
+        - 每页固定 3 条查询: 博客是否存在、当页顶层评论、这些评论下的全部回复
+        """
+        if not pk.isdigit() or not Blog.objects.filter(pk=pk).exists():
+            return Response({'detail': '博客不存在'}, status=status.HTTP_404_NOT_FOUND)
+
+        roots = Comment.objects.filter(blog_id=pk, parent_comment__isnull=True).select_related('user')
+        paginator = CommentCursorPagination()
+        page = paginator.paginate_queryset(roots, request, view=self)
+        replies = Comment.objects.filter(root_comment__in=[comment.id for comment in page]) \
+            .select_related('user').order_by('time', 'id')
+        attach_comment_replies(page, replies)
+        serializer = CommentThreadSerializer(page, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(serializer.data)
+
+    @method_decorator(BLOG_DETAIL_VERSIONS)
+    @action(detail=True, methods=['get'])
+    def related(self, request, pk=None):
+        """
+        相关博客(按标签和分类的相似度预先计算), 返回格式与博客列表相同
+        - ?limit= 返回数量, 默认 5, 最多 10
+        """
+        limit = request.query_params.get('limit', '')
+        limit = min(int(limit), related.RELATED_LIMIT) if limit.isdigit() else 5
+        scores = dict(related.get_related(pk, limit)) if pk.isdigit() else {}
+        blogs = sorted(self.get_queryset().filter(id__in=scores), key=lambda blog: (-scores[blog.id], -blog.id))
+        serializer = self.get_serializer(blogs, many=True)
+        data = serializer.data
+        viewcounter.merge_pending_views(data)
+        return Response(data)
+
     @action(detail=False, methods=['get'])
     def hot(self, request):
-        hot_blogs = self.get_queryset().order_by('-view_count')[:10]
+        """
+        热门博客(综合阅读、评论和发布时间, 随时间衰减):
+        - 默认返回前 10 篇; 传入 ?page= 时分页返回
+        - ?category=1,2 返回这些分类的热门博客(合并排行), ?descendants=true 时包含子孙分类;
+          其他筛选参数同博客列表, 作用在排行结果上
+        - 排行尚未建立时(例如首次部署未执行 rebuildhotscores)按阅读量排序
+        """
+        category_ids = filters.parse_ids(request.query_params, 'category')
+        if category_ids and request.query_params.get('descendants') in filters.TRUE_VALUES:
+            categories = filters.subtree_categories(category_ids)
+            category_ids = list(categories.values_list('pk', flat=True)) if categories is not None else category_ids
+        ranking = hot_ranking.HotRanking(category_ids)
+        paginator = BlogPageNumberPagination() if 'page' in request.query_params else None
+
+        if not len(ranking):
+            # 排行为空时按阅读量排序(?category 由 get_queryset 筛选), 分页方式相同
+            fallback = self.get_queryset().order_by('-view_count', '-id')
+            hot_blogs = paginator.paginate_queryset(fallback, request, view=self) if paginator else list(fallback[:10])
+        else:
+            ranked = paginator.paginate_queryset(ranking, request, view=self) if paginator else ranking[:10]
+            scores = dict(ranked)
+            hot_blogs = sorted(self.get_queryset().filter(id__in=scores), key=lambda blog: -scores[blog.id])
         serializer = self.get_serializer(hot_blogs, many=True)
-        return Response(serializer.data)
+        data = serializer.data
+        viewcounter.merge_pending_views(data)
+        if paginator is not None:
+            return paginator.get_paginated_response(data)
+        return Response(data)
 
+    @method_decorator(BLOG_LIST_VERSIONS)
     @action(detail=False, methods=['get'])
     def latest(self, request):
-        latest_blogs = self.get_queryset().order_by('-created_at')[:10]
-        serializer = self.get_serializer(latest_blogs, many=True)
-        return Response(serializer.data)
+        return Response(self.serialize_blogs(self.filter_blogs(Blog.objects.order_by('-created_at'))[:10]))
+
+    @method_decorator(BLOG_LIST_VERSIONS)
+    @action(detail=False, methods=['get'])
+    def archive(self, request):
+        """
+        按年月归档的博客数量, 来自预先统计的 BlogArchiveMonth 表
+        """
+        return Response(archive.buckets())
+
+    @method_decorator(BLOG_LIST_VERSIONS)
+    @action(detail=False, methods=['get'], url_path=r'archive/(?P<year>\d{4})/(?P<month>\d{1,2})')
+    def archive_month(self, request, year=None, month=None):
+        """
+        分页获取某个月发布的博客, 分页参数与博客列表相同
+        """
+        try:
+            start, end = archive.month_range(int(year), int(month))
+        except ValueError:
+            return Response({'detail': '月份无效'}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = self.filter_blogs(Blog.objects.filter(created_at__gte=start, created_at__lt=end))
+        return self.get_paginated_response(self.serialize_blogs(queryset, paginate=True))
+
+class BlogSearchView(APIView):
+    """
+    博客全文检索
+    GET ?q=关键词: 按相关度(BM25)分页返回博客, 附带得分和高亮后的标题/摘要/正文片段
+    """
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'detail': '请输入搜索关键词'}, status=status.HTTP_400_BAD_REQUEST)
+
+        paginator = BlogPageNumberPagination()
+        page = paginator.paginate_queryset(search.rank(query), request, view=self)
+        scores = dict(page)
+
+        # 只读取当页的博客, 正文用于生成高亮片段
+        serializer = BlogListSerializer(context={'request': request})
+        blogs = project_queryset(Blog.objects.filter(id__in=scores), serializer, always_load=('id', 'title', 'summary', 'content'))
+        blogs = sorted(blogs, key=lambda blog: (-scores[blog.id], -blog.id))
+
+        data = BlogListSerializer(blogs, many=True, context={'request': request}).data
+        for item, blog in zip(data, blogs):
+            item['score'] = round(scores[blog.id], 4)
+            item['highlight'] = {
+                'title': search.highlight(blog.title, query),
+                'summary': search.highlight(blog.summary, query),
+                'content': search.highlight(blog.content, query, length=160),
+            }
+        viewcounter.merge_pending_views(data)
+        return paginator.get_paginated_response(data)
 
 class CommentViewSet(viewsets.ModelViewSet):
     """
@@ -128,11 +376,14 @@ class CommentViewSet(viewsets.ModelViewSet):
         if self.action == 'list':
             blog_id = self.request.query_params.get('blog_id')
             if blog_id:
-                return Comment.objects.filter(blog_id=blog_id).order_by('-time')
+                return Comment.objects.filter(blog_id=blog_id).select_related('user', 'parent_comment__user').order_by('-time')
             return Comment.objects.none()
         # 如果是其他操作（如删除），返回所有评论
         return Comment.objects.all()
 
+    def list(self, request, *args, **kwargs):
+        return Response(serialize_list(self, self.get_queryset(), self.get_serializer()))
+
     @transaction.atomic
     def create(self, request, *args, **kwargs):
         """
@@ -143,19 +394,18 @@ class CommentViewSet(viewsets.ModelViewSet):
             # 获取验证后的数据
             blog = serializer.validated_data['blog']
             content = serializer.validated_data['content']
-            parent_comment_id = serializer.validated_data.get('parent_comment_id')
+            parent_comment = serializer.validated_data.get('parent_comment')
             
             # 创建评论
             comment = Comment.objects.create(
                 user=request.user,
                 blog=blog,
                 content=content,
-                parent_comment_id=parent_comment_id
+                parent_comment=parent_comment
             )
             
-            # 更新博客的评论计数
-            blog.comment_count = F('comment_count') + 1
-            blog.save()
+            # 更新博客的评论计数(单列原子更新, 不修改 updated_at)
+            counters.increment(blog.id, 'comment_count')
             
             # 返回完整的评论数据
             return Response(CommentSerializer(comment).data, status=status.HTTP_201_CREATED)
@@ -176,12 +426,9 @@ class CommentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        # 更新博客的评论计数
-        blog = comment.blog
-        blog.comment_count = F('comment_count') - 1
-        blog.save()
-        
-        # 删除评论
-        comment.delete()
+        # 删除评论, 子孙回复会被级联删除, 评论计数按实际删除的数量减少
+        blog_id = comment.blog_id
+        _, deleted = comment.delete()
+        counters.decrement(blog_id, 'comment_count', deleted.get(Comment._meta.label, 0))
         return Response(status=status.HTTP_204_NO_CONTENT)
 
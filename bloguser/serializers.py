@@ -6,6 +6,7 @@ import redis
 from django.contrib.auth import authenticate
 from django.db.models import Q
 import base64
+from urllib.parse import urljoin
 
 # Redis连接配置
 redis_client = redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=1)
@@ -128,7 +129,21 @@ class RegisterSerializer(serializers.Serializer):
                 raise serializers.ValidationError({'telephone': '手机号码已被注册'})
         
         return attrs
-    
+
+
+def absolute_avatar_url(avatar, request=None):
+    """
+    头像的完整 URL: 有请求时按请求的地址生成, 否则使用 SITE_URL
+    """
+    if not avatar:
+        return avatar
+    if request is not None:
+        return request.build_absolute_uri(avatar)
+    if settings.SITE_URL:
+        return urljoin(settings.SITE_URL, avatar)
+    return avatar
+
+
 class UserModelSerializer(serializers.ModelSerializer):
     """
     用户模型序列化器 - 用于读取用户信息
@@ -142,12 +157,9 @@ class UserModelSerializer(serializers.ModelSerializer):
 
     def get_avatar_url(self, obj):
         """
-        获取头像的完整 URL
+        获取头像的完整 URL; 没有请求时(例如实时推送)使用 SITE_URL, 未配置时返回相对路径
         """
-        request = self.context.get('request')
-        if request and obj.avatar:
-            return request.build_absolute_uri(obj.avatar)
-        return obj.avatar
+        return absolute_avatar_url(obj.avatar, self.context.get('request'))
 
 class UserUpdateSerializer(serializers.Serializer):
     """
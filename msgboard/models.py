@@ -15,6 +15,10 @@ class Message(models.Model):
         verbose_name = '留言'
         verbose_name_plural = verbose_name
         ordering = ['-time']
+        indexes = [
+            # 留言列表按时间排序
+            models.Index(fields=['time', 'id'], name='message_time_idx'),
+        ]
 
     def __str__(self):
         return f'{self.user.name}的留言 - {self.time}'
@@ -35,6 +39,10 @@ class Reply(models.Model):
         verbose_name = '回复'
         verbose_name_plural = verbose_name
         ordering = ['time']
+        indexes = [
+            # 按留言获取回复并按时间排序
+            models.Index(fields=['message', 'time'], name='reply_message_time_idx'),
+        ]
 
     def __str__(self):
         return f'{self.user.name}的回复 - {self.time}'
@@ -1,8 +1,19 @@
-from rest_framework.pagination import PageNumberPagination
+from blog.pagination import KeysetCursorPagination
 
 
-class MessagePagination(PageNumberPagination):
+class MessagePagination(KeysetCursorPagination):
     """
-    留言分页器
+    留言游标分页, 最新的留言在前; 每页只读取 page_size + 1 条留言, 不执行 COUNT(*)
     """
+    ordering = ('-time', '-id')
     page_size = 3
+    max_page_size = 20
+
+
+class ReplyPagination(KeysetCursorPagination):
+    """
+    单条留言下的回复游标分页, 按回复时间先后排列
+    """
+    ordering = ('time', 'id')
+    page_size = 10
+    max_page_size = 50
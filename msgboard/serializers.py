@@ -1,7 +1,12 @@
 from rest_framework import serializers
+from django.db.models import Count, OuterRef, Prefetch, Subquery, prefetch_related_objects
+from django.db.models.functions import Coalesce
 from .models import Message, Reply
 from bloguser.serializers import UserModelSerializer
 
+# 留言列表中每条留言内嵌的回复数量, 其余回复通过 replies 接口分页读取
+REPLY_PREVIEW_SIZE = 3
+
 
 class ReplySerializer(serializers.ModelSerializer):
     """
@@ -27,17 +32,67 @@ class ReplySerializer(serializers.ModelSerializer):
 class MessageSerializer(serializers.ModelSerializer):
     """
     留言序列化器
+    - replies 只包含最早的 REPLY_PREVIEW_SIZE 条回复, reply_count 为回复总数
     """
     user = UserModelSerializer(read_only=True)
     replies = serializers.SerializerMethodField()
+    reply_count = serializers.SerializerMethodField()
 
     class Meta:
         model = Message
-        fields = ['id', 'user', 'time', 'content', 'replies']
+        fields = ['id', 'user', 'time', 'content', 'replies', 'reply_count']
         read_only_fields = ['id', 'time']
 
     def get_replies(self, obj):
         """
-        获取所有回复, 包括对留言的回复和对回复的回复
+        获取最早的几条回复, 包括对留言的回复和对回复的回复
+        列表和详情接口已通过 prefetch_reply_preview 预先读取
         """
-        return ReplySerializer(obj.replies.all(), many=True).data
+        replies = getattr(obj, 'preview_replies', None)
+        if replies is None:
+            replies = obj.replies.select_related('user').order_by('time', 'id')[:REPLY_PREVIEW_SIZE]
+        return ReplySerializer(replies, many=True).data
+
+    def get_reply_count(self, obj):
+        count = getattr(obj, 'reply_count', None)
+        return obj.replies.count() if count is None else count
+
+
+def with_reply_count(queryset):
+    """
+    为留言查询集附加回复总数(相关子查询, 使用 reply_message_time_idx 索引)
+    """
+    reply_count = (
+        Reply.objects.filter(message_id=OuterRef('pk'))
+        .order_by().values('message_id').annotate(count=Count('id')).values('count')
+    )
+    return queryset.annotate(reply_count=Coalesce(Subquery(reply_count), 0))
+
+
+def prefetch_reply_preview(messages):
+    """
+    一条查询读取一页留言各自最早的 REPLY_PREVIEW_SIZE 条回复(含用户), 保存在 preview_replies 上,
+    并在内存中填充父回复; 在分页之后调用, 只读取当前页的留言
+    切片的 Prefetch 由 Django 编译为 ROW_NUMBER() OVER (PARTITION BY message_id ...) 窗口函数
+    """
+    preview = Reply.objects.select_related('user').order_by('time', 'id')[:REPLY_PREVIEW_SIZE]
+    prefetch_related_objects(messages, Prefetch('replies', queryset=preview, to_attr='preview_replies'))
+    attach_reply_parents(reply for message in messages for reply in message.preview_replies)
+    return messages
+
+
+def attach_reply_parents(replies):
+    """
+    在内存中为回复填充 parent_reply 缓存, 使 reply_to 不再逐条查询父回复及其用户:
+    - 父回复在 replies 中时直接使用(回复需已 select_related('user'))
+    - 其余父回复(例如指向其他留言下的回复)一次批量读取
+    """
+    replies = list(replies)
+    nodes = {reply.id: reply for reply in replies}
+    missing = {reply.parent_reply_id for reply in replies if reply.parent_reply_id and reply.parent_reply_id not in nodes}
+    if missing:
+        nodes.update(Reply.objects.select_related('user').in_bulk(missing))
+    for reply in replies:
+        if reply.parent_reply_id in nodes:
+            reply.parent_reply = nodes[reply.parent_reply_id]
+    return replies
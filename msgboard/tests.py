@@ -1,3 +1,141 @@
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from django.contrib.auth import get_user_model
+from django.http import QueryDict
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from .models import Message, Reply
+from .serializers import REPLY_PREVIEW_SIZE
 
 # Create your tests here.
+
+
+class MessageListQueryBudgetTests(TestCase):
+    """
+    留言列表的查询次数固定, 不随留言和回复的数量增长
+    """
+    # 留言(含用户和回复总数)、预览回复(含用户)
+    QUERY_BUDGET = 2
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.users = [
+            User.objects.create_user(email=f'user{index}@example.com', name=f'用户{index}', telephone=f'1380000000{index}', password='password')
+            for index in range(3)
+        ]
+
+    def add_thread(self, replies):
+        """
+        新增一条留言和 replies 条回复, 每条回复回复上一条(第一条直接回复留言)
+        """
+        message = Message.objects.create(user=self.users[0], content='留言内容')
+        parent = None
+        for index in range(replies):
+            parent = Reply.objects.create(
+                user=self.users[index % len(self.users)], message=message, content=f'回复{index}', parent_reply=parent,
+            )
+        return message
+
+    def get_list(self):
+        response = APIClient().get('/api/msgboard/messages/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_query_count_does_not_grow_with_replies(self):
+        self.add_thread(2)
+        with self.assertNumQueries(self.QUERY_BUDGET):
+            self.get_list()
+        for _ in range(3):
+            self.add_thread(10)
+        with self.assertNumQueries(self.QUERY_BUDGET):
+            results = self.get_list()
+        self.assertEqual([len(message['replies']) for message in results], [REPLY_PREVIEW_SIZE] * 3)
+        self.assertEqual([message['reply_count'] for message in results], [10, 10, 10])
+
+    def test_reply_to_resolved_in_memory(self):
+        self.add_thread(3)
+        replies = self.get_list()[0]['replies']
+        self.assertEqual([reply['reply_to'] for reply in replies], [None, '用户0', '用户1'])
+        self.assertEqual([reply['user']['name'] for reply in replies], ['用户0', '用户1', '用户2'])
+
+    def test_parent_in_other_message_loaded_in_one_query(self):
+        # 被回复的留言较早发布, 不在第一页
+        other = self.add_thread(1)
+        Message.objects.filter(pk=other.pk).update(time=datetime(2020, 1, 1))
+        parent = other.replies.get()
+        messages = [self.add_thread(0) for _ in range(3)]
+        for message in messages:
+            Reply.objects.create(user=self.users[1], message=message, content='跨留言回复', parent_reply=parent)
+        with self.assertNumQueries(self.QUERY_BUDGET + 1):
+            results = self.get_list()
+        self.assertNotIn(other.pk, [message['id'] for message in results])
+        self.assertEqual([message['replies'][0]['reply_to'] for message in results], ['用户0'] * 3)
+
+
+class MessagePaginationTests(TestCase):
+    """
+    留言游标分页和回复分页
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.user = User.objects.create_user(email='reader@example.com', name='读者', telephone='13800000001', password='password')
+        cls.messages = []
+        for index in range(5):
+            message = Message.objects.create(user=cls.user, content=f'留言{index}')
+            Message.objects.filter(pk=message.pk).update(time=datetime(2024, 1, 1 + index))
+            cls.messages.append(message)
+        cls.thread = cls.messages[-1]
+        parent = None
+        for index in range(12):
+            parent = Reply.objects.create(user=cls.user, message=cls.thread, content=f'回复{index}', parent_reply=parent)
+            Reply.objects.filter(pk=parent.pk).update(time=datetime(2024, 2, 1, index))
+
+    def collect(self, url, params=None):
+        client = APIClient()
+        response = client.get(url, params)
+        pages = []
+        while True:
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            pages.append(body['results'])
+            if not body['next']:
+                return pages
+            response = client.get(body['next'])
+
+    def test_messages_cursor_pagination(self):
+        pages = self.collect('/api/msgboard/messages/')
+        self.assertEqual([len(page) for page in pages], [3, 2])
+        ids = [message['id'] for page in pages for message in page]
+        self.assertEqual(ids, [message.id for message in reversed(self.messages)])
+
+    def test_reply_preview(self):
+        first = APIClient().get('/api/msgboard/messages/').json()['results'][0]
+        self.assertEqual(first['id'], self.thread.id)
+        self.assertEqual(first['reply_count'], 12)
+        self.assertEqual([reply['content'] for reply in first['replies']], [f'回复{index}' for index in range(REPLY_PREVIEW_SIZE)])
+
+    def test_replies_action(self):
+        pages = self.collect(f'/api/msgboard/messages/{self.thread.id}/replies/', {'page_size': 5})
+        self.assertEqual([len(page) for page in pages], [5, 5, 2])
+        replies = [reply for page in pages for reply in page]
+        self.assertEqual([reply['content'] for reply in replies], [f'回复{index}' for index in range(12)])
+        self.assertEqual(replies[5]['reply_to'], '读者')
+
+    def test_replies_query_budget(self):
+        cursor = self.second_page_cursor()
+        # 留言、当前页回复(含用户)、不在当前页的父回复
+        with self.assertNumQueries(3):
+            response = APIClient().get(f'/api/msgboard/messages/{self.thread.id}/replies/', {'page_size': 5, 'cursor': cursor})
+        self.assertEqual(response.status_code, 200)
+
+    def second_page_cursor(self):
+        url = APIClient().get(f'/api/msgboard/messages/{self.thread.id}/replies/', {'page_size': 5}).json()['next']
+        return QueryDict(urlsplit(url).query)['cursor']
+
+    def test_replies_of_missing_message(self):
+        self.assertEqual(APIClient().get('/api/msgboard/messages/0/replies/').status_code, 404)
@@ -5,15 +5,16 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from .permissions import IsMessageOrReplyOwner
 from .models import Message, Reply
-from .serializers import MessageSerializer, ReplySerializer
-from .paginations import MessagePagination
+from .serializers import MessageSerializer, ReplySerializer, attach_reply_parents, prefetch_reply_preview, with_reply_count
+from .paginations import MessagePagination, ReplyPagination
 
 # Create your views here.
 
 class MessageViewSet(viewsets.ModelViewSet):
     """
     留言视图集
-    - list: 获取所有留言列表（公开访问）
+    - list: 游标分页获取留言列表, 每条留言只内嵌最早几条回复（公开访问）
+    - replies: 游标分页获取某条留言的全部回复（公开访问）
     - create: 创建新留言（需要登录）
     - create_reply: 创建回复（需要登录）
     - destroy: 删除留言（仅留言作者或超级用户可删除）
@@ -27,8 +28,8 @@ class MessageViewSet(viewsets.ModelViewSet):
         """
         根据不同的操作设置不同的权限
         """
-        if self.action == 'list':
-            # 获取列表公开访问
+        if self.action in ['list', 'replies']:
+            # 获取列表和回复公开访问
             permission_classes = [AllowAny]
         elif self.action in ['destroy', 'delete_reply']:
             # 删除操作需要是作者或超级用户
@@ -38,6 +39,45 @@ class MessageViewSet(viewsets.ModelViewSet):
             permission_classes = [IsAuthenticated]
         return [permission() for permission in permission_classes]
 
+    def get_queryset(self):
+        """
+        读取留言时一并读取用户; 列表和详情附加回复总数
+        """
+        queryset = Message.objects.select_related('user')
+        if self.action in ['list', 'retrieve']:
+            queryset = with_reply_count(queryset)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        """
+        游标分页获取留言, 每条留言附带最早几条回复和回复总数
+        查询次数固定(留言、预览回复), 不随回复数量增长
+        """
+        queryset = self.get_queryset()
+        page = self.paginate_queryset(queryset)
+        messages = prefetch_reply_preview(page if page is not None else list(queryset))
+        serializer = self.get_serializer(messages, many=True)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+    def retrieve(self, request, *args, **kwargs):
+        message = prefetch_reply_preview([self.get_object()])[0]
+        return Response(self.get_serializer(message).data)
+
+    @action(detail=True, methods=['get'])
+    def replies(self, request, pk=None):
+        """
+        游标分页获取留言下的全部回复(按时间先后), 用于展开留言列表中未内嵌的回复
+        """
+        message = self.get_object()
+        paginator = ReplyPagination()
+        page = paginator.paginate_queryset(
+            Reply.objects.filter(message_id=message.id).select_related('user'), request, view=self,
+        )
+        serializer = ReplySerializer(attach_reply_parents(page), many=True)
+        return paginator.get_paginated_response(serializer.data)
+
     def perform_create(self, serializer):
         """
         创建留言时自动设置用户
@@ -5,6 +5,10 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
+
+实时推送接口(realtime 应用, Server-Sent Events)是长连接的异步视图, 需要以 ASGI 方式运行, 例如:
+    uvicorn myblog_backend.asgi:application --workers 4
+多个工作进程之间通过 Redis 发布/订阅广播事件(REALTIME_BROKER=redis)。
 """
 
 import os
@@ -0,0 +1,196 @@
+"""
+预压缩响应(gzip / brotli)
+
+- 可缓存的响应只压缩一次: 压缩结果按响应内容的摘要保存在缓存中, 与页面缓存中未压缩的响应并存,
+  之后相同内容的请求直接返回压缩结果(见 precompressed 装饰器)
+- 按请求头 Accept-Encoding 选择编码, 优先 brotli, 其次 gzip;
+  达到压缩阈值的响应始终带有 Vary: Accept, Accept-Encoding(内容随协商的格式和编码变化)
+- 压缩结果的缓存键包含响应格式(DRF 渲染器的 format, 没有时为 Content-Type)和编码
+- brotli 是可选依赖(pip install brotli), 未安装时只使用 gzip(标准库)
+- 小于 RESPONSE_COMPRESSION_MIN_SIZE 字节的响应不压缩
+- 大部分内容固定、只有少量字段(如计数)每次不同的响应使用 GzipTemplate:
+  固定部分预先压缩, 每次请求只压缩变化的部分, 拼接成完整的 gzip 数据
+"""
+import functools
+import gzip
+import hashlib
+import re
+import struct
+import zlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+
+COMPRESSED_KEY = 'compressed:{}:{}:{}'
+COMPRESSED_TTL = 60 * 60 * 24
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+
+_token_re = re.compile(r'^\s*([a-z*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*$')
+
+
+def is_enabled():
+    return settings.RESPONSE_COMPRESSION
+
+
+def brotli_available():
+    try:
+        import brotli  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def accepted_encodings(request):
+    """
+    返回客户端接受的编码集合(q=0 表示不接受)
+    """
+    accepted = set()
+    for item in request.META.get('HTTP_ACCEPT_ENCODING', '').lower().split(','):
+        match = _token_re.match(item)
+        if match is None:
+            continue
+        try:
+            quality = float(match.group(2)) if match.group(2) is not None else 1.0
+        except ValueError:
+            continue
+        if quality > 0:
+            accepted.add(match.group(1))
+    if '*' in accepted:
+        accepted.update(('br', 'gzip'))
+    return accepted
+
+
+def choose_encoding(request, encodings=('br', 'gzip')):
+    accepted = accepted_encodings(request)
+    for encoding in encodings:
+        if encoding in accepted and (encoding != 'br' or brotli_available()):
+            return encoding
+    return None
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        import brotli
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    # mtime=0 使相同的内容得到相同的压缩结果
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def response_format(request, response):
+    renderer = getattr(request, 'accepted_renderer', None)
+    return getattr(renderer, 'format', None) or response.get('Content-Type', '')
+
+
+def cached_compress(body, encoding, fmt=''):
+    """
+    返回压缩后的内容, 相同格式的相同内容只压缩一次
+    """
+    key = COMPRESSED_KEY.format(fmt, encoding, hashlib.md5(body).hexdigest())
+    compressed = cache.get(key)
+    if compressed is None:
+        compressed = compress(body, encoding)
+        cache.set(key, compressed, COMPRESSED_TTL)
+    return compressed
+
+
+def should_compress(response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.has_header('Content-Encoding')
+        and len(response.content) >= settings.RESPONSE_COMPRESSION_MIN_SIZE
+    )
+
+
+def weaken_etag(response):
+    # 压缩后的内容与原内容字节不同, 强 ETag 改为弱 ETag(与 Django 的 GZipMiddleware 一致)
+    etag = response.get('ETag')
+    if etag and etag.startswith('"'):
+        response.headers['ETag'] = 'W/' + etag
+
+
+def compress_response(request, response):
+    """
+    压缩已渲染的响应, 原地修改并返回
+    """
+    if not is_enabled() or not should_compress(response):
+        return response
+    patch_vary_headers(response, ('Accept', 'Accept-Encoding'))
+    encoding = choose_encoding(request)
+    if encoding is None:
+        return response
+    compressed = cached_compress(response.content, encoding, response_format(request, response))
+    if len(compressed) >= len(response.content):
+        return response
+    response.content = compressed
+    response.headers['Content-Length'] = str(len(compressed))
+    response.headers['Content-Encoding'] = encoding
+    weaken_etag(response)
+    return response
+
+
+def precompressed(view_func):
+    """
+    视图装饰器: 按 Accept-Encoding 返回预压缩的响应
+    - 放在 cache_page 和条件请求装饰器的外层, 页面缓存中保存的始终是未压缩的响应
+    - 尚未渲染的响应(DRF Response)在渲染完成后再压缩
+    """
+    @functools.wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        response = view_func(request, *args, **kwargs)
+        if getattr(response, 'is_rendered', True):
+            return compress_response(request, response)
+        response.add_post_render_callback(lambda rendered: compress_response(request, rendered))
+        return response
+
+    return wrapper
+
+
+class GzipTemplate:
+    """
+    预压缩的 gzip 模板: 内容由固定片段和占位符交替组成
+    固定片段各自压缩为以同步点结束的 deflate 数据, 渲染时只压缩占位符的值, 按顺序拼接后
+    加上 gzip 头和校验尾; 对象只包含 bytes, 可以直接写入缓存
+    """
+    HEADER = b'\x1f\x8b\x08\x00\x00\x00\x00\x00\x02\xff'
+
+    def __init__(self, body, placeholders):
+        """
+        body 中每个占位符必须恰好出现一次, 否则抛出 ValueError
+        """
+        self.segments = []
+        positions = []
+        for placeholder in placeholders:
+            if body.count(placeholder) != 1:
+                raise ValueError(f'占位符必须恰好出现一次: {placeholder!r}')
+            positions.append((body.index(placeholder), placeholder))
+        self.placeholders = []
+        start = 0
+        for position, placeholder in sorted(positions):
+            self.segments.append(body[start:position])
+            self.placeholders.append(placeholder)
+            start = position + len(placeholder)
+        self.segments.append(body[start:])
+        self.compressed = [self.deflate(segment) for segment in self.segments]
+
+    @staticmethod
+    def deflate(data, level=GZIP_LEVEL):
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def render(self, values):
+        """
+        values 为 {占位符: 替换后的 bytes}, 返回 (未压缩的长度, gzip 数据)
+        """
+        plain, compressed = [self.segments[0]], [self.HEADER, self.compressed[0]]
+        for placeholder, segment, deflated in zip(self.placeholders, self.segments[1:], self.compressed[1:]):
+            value = values[placeholder]
+            plain += [value, segment]
+            compressed += [self.deflate(value, 1), deflated]
+        body = b''.join(plain)
+        # 空的最终块结束 deflate 数据流, 之后是 CRC32 和原始长度
+        compressed.append(zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, -zlib.MAX_WBITS).flush(zlib.Z_FINISH))
+        compressed.append(struct.pack('<II', zlib.crc32(body), len(body) & 0xffffffff))
+        return len(body), b''.join(compressed)
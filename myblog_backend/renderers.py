@@ -0,0 +1,83 @@
+"""
+API 渲染器与解析器
+
+- OrjsonRenderer / OrjsonParser: 用 orjson 代替标准库 json, 输出与 DRF 的 JSONRenderer 一致
+  (日期时间、Decimal、惰性翻译字符串等仍交给 DRF 的 JSONEncoder 处理)
+- MessagePackRenderer / MessagePackParser: 请求头 Accept / Content-Type 为 application/msgpack
+  (或 ?format=msgpack)时使用 MessagePack 编码, 体积更小, 适合原生客户端;
+  依赖可选的 msgpack 库, 只在已安装时注册(见 settings.MSGPACK_ENABLED)
+
+在 settings.py 的 REST_FRAMEWORK 中配置, 排在第一位的渲染器为默认渲染器。
+"""
+import orjson
+from rest_framework import renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+from rest_framework.utils.encoders import JSONEncoder
+
+# 日期时间交给 JSONEncoder 格式化(与 DRF 一致, 微秒截断为毫秒, UTC 以 Z 结尾); 非字符串的字典键转为字符串
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+_encoder = JSONEncoder()
+
+
+def encode_default(value):
+    """
+    orjson / msgpack 无法直接编码的类型由 DRF 的 JSONEncoder 转换
+    """
+    return _encoder.default(value)
+
+
+class OrjsonRenderer(renderers.JSONRenderer):
+    """
+    基于 orjson 的 JSON 渲染器, 支持 Accept 中的 indent 参数(统一缩进 2 个空格)
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        options = ORJSON_OPTIONS
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            options |= orjson.OPT_INDENT_2
+        content = orjson.dumps(data, default=encode_default, option=options)
+        # 与 JSONRenderer 一致, 转义 U+2028 / U+2029, 保证输出是合法的 JavaScript
+        if b'\xe2\x80\xa8' in content or b'\xe2\x80\xa9' in content:
+            content = content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return content
+
+
+class OrjsonParser(JSONParser):
+    renderer_class = OrjsonRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        import msgpack
+
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=encode_default, use_bin_type=True, datetime=False)
+
+
+class MessagePackParser(BaseParser):
+    media_type = 'application/msgpack'
+    renderer_class = MessagePackRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        import msgpack
+
+        try:
+            return msgpack.unpackb(stream.read(), raw=False, strict_map_key=False)
+        except ValueError as exc:
+            raise ParseError(f'MessagePack parse error - {exc}')
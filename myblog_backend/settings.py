@@ -1,4 +1,5 @@
 from pathlib import Path
+import importlib.util
 import os
 import environ
 
@@ -30,6 +31,7 @@ INSTALLED_APPS = [
     'aboutme',
     'msgboard',
     'blog',
+    'realtime',
 ]
 
 MIDDLEWARE = [
@@ -104,6 +106,10 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # 前端地址
 FRONTEND_URL = env('FRONTEND_URL')
+# 后端站点地址(例如 https://api.example.com), 没有请求时(实时推送)用于生成完整的头像地址; 为空时为相对路径
+SITE_URL = env('SITE_URL', default='')
+# 前端博客详情页路径, 用于订阅和站点地图中的链接
+BLOG_FRONTEND_PATH = env('BLOG_FRONTEND_PATH', default='/blog/{id}')
 
 # 邮件配置
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -130,15 +136,67 @@ CACHES = {
     }
 }
 
+# 计数缓冲等数据的存储后端: redis(生产环境, 多进程共享) 或 memory(本地运行, 进程内)
+BLOG_STORE_BACKEND = env('BLOG_STORE_BACKEND', default='redis')
+
+# 阅读量写缓冲: 开启后阅读量先累加在缓冲区, 由 flushviewcounts 命令定时写回数据库
+BLOG_VIEW_COUNT_BUFFER = env.bool('BLOG_VIEW_COUNT_BUFFER', default=True)
+
+# 热门排行: 事件得分的半衰期(小时)和各类事件的权重
+BLOG_HOT_HALF_LIFE_HOURS = env.float('BLOG_HOT_HALF_LIFE_HOURS', default=72)
+BLOG_HOT_WEIGHTS = {
+    'publish': 10,
+    'view': 1,
+    'comment': 5,
+}
+
+# 博客详情缓存的过期时间(秒), 设为 0 关闭缓存; 数据变化后缓存按版本号失效, 不依赖过期时间
+BLOG_DETAIL_CACHE_TTL = env.int('BLOG_DETAIL_CACHE_TTL', default=60 * 60 * 24)
+# 是否统计博客详情缓存的命中率(每个请求多一次缓存写入), 默认关闭, 排查缓存效果时开启
+BLOG_DETAIL_CACHE_STATS = env.bool('BLOG_DETAIL_CACHE_STATS', default=False)
+
+# 相关博客: 标题/摘要词元重合度的权重, 0 表示只按标签和分类计算
+BLOG_RELATED_TERM_WEIGHT = env.float('BLOG_RELATED_TERM_WEIGHT', default=0)
+
+# 列表接口使用 values() 快速序列化路径(输出与序列化器一致), 默认关闭, 需要时显式开启
+BLOG_FAST_SERIALIZATION = env.bool('BLOG_FAST_SERIALIZATION', default=False)
+
+# 响应预压缩(gzip/brotli): 是否开启, 以及小于多少字节的响应不压缩; brotli 为可选依赖(pip install brotli), 未安装时只使用 gzip
+RESPONSE_COMPRESSION = env.bool('RESPONSE_COMPRESSION', default=True)
+RESPONSE_COMPRESSION_MIN_SIZE = env.int('RESPONSE_COMPRESSION_MIN_SIZE', default=1024)
+
+# 实时推送(SSE): 事件代理 redis(多进程广播) 或 memory(本地运行, 进程内), 空闲心跳间隔(秒),
+# 以及每个连接最多积压的事件数(超过时断开该连接)
+REALTIME_BROKER = env('REALTIME_BROKER', default=BLOG_STORE_BACKEND)
+REALTIME_REDIS_URL = env('REALTIME_REDIS_URL', default=f'redis://{REDIS_HOST}:{REDIS_PORT}/0')
+REALTIME_HEARTBEAT_SECONDS = env.float('REALTIME_HEARTBEAT_SECONDS', default=15)
+REALTIME_QUEUE_SIZE = env.int('REALTIME_QUEUE_SIZE', default=100)
+
 # 媒体文件配置
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# MessagePack 是可选依赖(pip install msgpack), 未安装时不注册对应的渲染器和解析器,
+# 请求 Accept: application/msgpack 时返回 406
+MSGPACK_ENABLED = importlib.util.find_spec('msgpack') is not None
+
 # REST Framework配置
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'bloguser.authentications.JWTAuthentication',
     ],
+    # 默认输出 JSON(orjson), 请求 Accept: application/msgpack 时输出 MessagePack
+    'DEFAULT_RENDERER_CLASSES': [
+        'myblog_backend.renderers.OrjsonRenderer',
+        *(['myblog_backend.renderers.MessagePackRenderer'] if MSGPACK_ENABLED else []),
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'myblog_backend.renderers.OrjsonParser',
+        *(['myblog_backend.renderers.MessagePackParser'] if MSGPACK_ENABLED else []),
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 # 日志配置
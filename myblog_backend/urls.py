@@ -1,6 +1,7 @@
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from blog import feeds
 
 urlpatterns = [
     path('api/user/', include('bloguser.urls')),
@@ -8,4 +9,7 @@ urlpatterns = [
     path('api/aboutme/', include('aboutme.urls')),
     path('api/msgboard/', include('msgboard.urls')),
     path('api/blog/', include('blog.urls')),
+    path('api/realtime/', include('realtime.urls')),
+    path('sitemap.xml', feeds.sitemap, name='sitemap'),
+    path('sitemap-<int:page>.xml', feeds.sitemap_page, name='sitemap-page'),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
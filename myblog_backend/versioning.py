@@ -0,0 +1,142 @@
+"""
+资源版本号与条件请求(ETag / Last-Modified)
+
+每类资源在缓存中保存一个版本号, 数据变化时调用 bump_version 递增;
+读取接口用版本号生成 ETag 和 Last-Modified, 无需查询或序列化即可返回 304。
+
+版本号取毫秒时间戳(且保证递增), 缓存被清空后重新生成的版本号一定大于之前的值,
+客户端最多多下载一次完整数据, 不会误用过期内容。
+经过 DRF 内容协商的响应, ETag 还包含协商得到的媒体类型(JSON / MessagePack / HTML 的内容不同),
+并带有 Vary: Accept。
+"""
+import functools
+import hashlib
+import time
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import condition
+
+VERSION_KEY = 'version:{}'
+
+
+def _key(namespace):
+    if isinstance(namespace, (tuple, list)):
+        namespace = ':'.join(str(part) for part in namespace)
+    return VERSION_KEY.format(namespace)
+
+
+def get_version(namespace):
+    """
+    返回资源的当前版本号; namespace 为字符串或元组, 例如 'blogs'、('blog', 1)
+    """
+    key = _key(namespace)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def get_versions(namespaces):
+    keys = [_key(namespace) for namespace in namespaces]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        now = int(time.time() * 1000)
+        for key in missing:
+            cache.add(key, now, None)
+        versions.update(cache.get_many(missing))
+    return [versions[key] for key in keys]
+
+
+def bump_version(*namespaces):
+    """
+    数据变化后递增资源的版本号
+    """
+    now = int(time.time() * 1000)
+    for namespace in namespaces:
+        key = _key(namespace)
+        current = cache.get(key) or 0
+        cache.set(key, max(now, current + 1), None)
+
+
+def negotiated_media_type(request):
+    """
+    DRF 内容协商选定的媒体类型; 没有经过内容协商的普通 Django 视图返回 None
+    """
+    return getattr(request, 'accepted_media_type', None)
+
+
+def versions_etag(namespaces, media_type=None):
+    """
+    返回 (ETag, 最大版本号); media_type 为响应的媒体类型, 不同格式的输出得到不同的 ETag
+    """
+    versions = get_versions(namespaces)
+    parts = [str(version) for version in versions]
+    if media_type:
+        parts.append(media_type)
+    digest = hashlib.md5('|'.join(parts).encode()).hexdigest()
+    return quote_etag(digest), max(versions)
+
+
+def version_datetime(version):
+    return datetime.fromtimestamp(version / 1000, tz=timezone.utc)
+
+
+def conditional(namespaces_func):
+    """
+    条件请求装饰器, 基于 Django 的 condition 装饰器
+    namespaces_func(request, *args, **kwargs) 返回响应依赖的资源列表
+    与 cache_page 同时使用时必须位于 cache_page 外层, 否则缓存命中时不会检查条件
+    """
+    def get_etag(request, *args, **kwargs):
+        # condition 会分别调用 etag_func 和 last_modified_func, 每个请求只读取一次版本号
+        if not hasattr(request, '_versions_etag'):
+            request._versions_etag = versions_etag(
+                namespaces_func(request, *args, **kwargs), negotiated_media_type(request),
+            )
+        return request._versions_etag
+
+    def etag_func(request, *args, **kwargs):
+        return get_etag(request, *args, **kwargs)[0]
+
+    def last_modified_func(request, *args, **kwargs):
+        return version_datetime(get_etag(request, *args, **kwargs)[1])
+
+    check = condition(etag_func=etag_func, last_modified_func=last_modified_func)
+
+    def decorator(view_func):
+        conditional_view = check(view_func)
+
+        @functools.wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            # 200 和 304 响应都需要 Vary, 否则共享缓存会把一种格式的内容返回给另一种格式的请求
+            if negotiated_media_type(request) is not None:
+                patch_vary_headers(response, ('Accept',))
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def not_modified_response(request, namespaces):
+    """
+    在视图内部检查条件请求, 返回 (304 响应或 None, 需要设置的响应头)
+    用于返回 304 之前还需要执行其他逻辑的视图(例如记录阅读量)
+    """
+    media_type = negotiated_media_type(request)
+    etag, version = versions_etag(namespaces, media_type)
+    last_modified = version_datetime(version)
+    headers = {'ETag': etag, 'Last-Modified': http_date(last_modified.timestamp())}
+    if media_type is not None:
+        headers['Vary'] = 'Accept'
+    response = get_conditional_response(request, etag=etag, last_modified=int(last_modified.timestamp()))
+    if response is not None:
+        for name, value in headers.items():
+            response.headers[name] = value
+    return response, headers
@@ -0,0 +1,209 @@
+"""
+实时事件的发布和分发
+
+- Hub: 进程内的订阅表, 频道 -> 订阅者(每个 SSE 连接一个有界的 asyncio 队列);
+  同一事件只编码一次, 按事件循环分组投递, 可以从任意线程调用
+- MemoryBroker: 发布即在本进程内分发, 仅用于本地运行和测试
+- RedisBroker: 发布到 Redis 频道; 每个进程只保持一条订阅连接(PSUBSCRIBE), 收到的事件再由 Hub
+  分发给本进程的全部连接, Redis 连接数与客户端连接数无关
+后端由 REALTIME_BROKER 配置选择(redis / memory)
+"""
+import asyncio
+import json
+import logging
+import threading
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Redis 频道名前缀, 订阅时使用 PREFIX + '*'
+CHANNEL_PREFIX = 'realtime:'
+# Redis 订阅连接断开后重连的等待时间(秒)
+RECONNECT_DELAY = 1
+
+
+def encode_event(event, data):
+    """
+    编码为一条 SSE 消息(bytes), 同一事件的全部订阅者共用
+    """
+    payload = json.dumps(data, ensure_ascii=False, separators=(',', ':'), default=str)
+    return f'event: {event}\ndata: {payload}\n\n'.encode()
+
+
+class Subscription:
+    """
+    一个连接对某个频道的订阅; 队列已满(客户端读取过慢)时丢弃积压的事件并放入 None,
+    连接方读到 None 后断开, 客户端重连后重新拉取数据
+    """
+
+    def __init__(self, channel, loop, maxsize):
+        self.channel = channel
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize)
+        self.overflowed = False
+
+    def deliver(self, message):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+
+def deliver_all(subscriptions, message):
+    for subscription in subscriptions:
+        subscription.deliver(message)
+
+
+class Hub:
+    """
+    进程内的订阅表
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.channels = {}
+
+    def subscribe(self, channel, maxsize=None):
+        """
+        在当前事件循环中订阅频道, 返回 Subscription
+        """
+        subscription = Subscription(channel, asyncio.get_running_loop(), maxsize or settings.REALTIME_QUEUE_SIZE)
+        with self.lock:
+            self.channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.channels.get(subscription.channel)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self.channels[subscription.channel]
+
+    def count(self, channel=None):
+        with self.lock:
+            if channel is not None:
+                return len(self.channels.get(channel, ()))
+            return sum(len(subscriptions) for subscriptions in self.channels.values())
+
+    def dispatch(self, channel, message):
+        """
+        把已编码的消息投递给频道的全部订阅者; 每个事件循环只调度一次
+        """
+        with self.lock:
+            subscriptions = list(self.channels.get(channel, ()))
+        if not subscriptions:
+            return
+        groups = {}
+        for subscription in subscriptions:
+            groups.setdefault(subscription.loop, []).append(subscription)
+        try:
+            current = asyncio.get_running_loop()
+        except RuntimeError:
+            current = None
+        for loop, group in groups.items():
+            if loop is current:
+                deliver_all(group, message)
+            elif not loop.is_closed():
+                loop.call_soon_threadsafe(deliver_all, group, message)
+
+
+class MemoryBroker:
+    """
+    进程内的代理, 仅用于本地运行和测试(多进程部署时其他进程收不到事件)
+    """
+
+    def __init__(self, hub):
+        self.hub = hub
+
+    def publish(self, channel, message):
+        self.hub.dispatch(channel, message)
+
+    async def start(self):
+        pass
+
+
+class RedisBroker:
+    """
+    基于 Redis 发布/订阅的代理, 事件在全部工作进程之间广播
+    """
+
+    def __init__(self, hub, url=None):
+        self.hub = hub
+        self.url = url or settings.REALTIME_REDIS_URL
+        self.lock = threading.Lock()
+        self.client = None
+        self.listeners = {}
+
+    def publish(self, channel, message):
+        if self.client is None:
+            import redis
+            with self.lock:
+                if self.client is None:
+                    self.client = redis.Redis.from_url(self.url)
+        self.client.publish(CHANNEL_PREFIX + channel, message)
+
+    async def start(self):
+        """
+        确保当前事件循环中运行着订阅任务(每个事件循环一个)
+        """
+        loop = asyncio.get_running_loop()
+        task = self.listeners.get(loop)
+        if task is None or task.done():
+            self.listeners[loop] = loop.create_task(self.listen())
+
+    async def listen(self):
+        import redis.asyncio as aioredis
+
+        while True:
+            client = aioredis.Redis.from_url(self.url)
+            try:
+                async with client.pubsub() as pubsub:
+                    await pubsub.psubscribe(CHANNEL_PREFIX + '*')
+                    async for item in pubsub.listen():
+                        if item['type'] == 'pmessage':
+                            channel = item['channel'].decode()[len(CHANNEL_PREFIX):]
+                            self.hub.dispatch(channel, item['data'])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception('实时事件订阅连接中断, %s 秒后重连', RECONNECT_DELAY)
+                await asyncio.sleep(RECONNECT_DELAY)
+            finally:
+                await client.aclose()
+
+
+hub = Hub()
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """
+    根据 REALTIME_BROKER 配置返回当前进程使用的代理
+    """
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                if settings.REALTIME_BROKER == 'memory':
+                    _broker = MemoryBroker(hub)
+                else:
+                    _broker = RedisBroker(hub)
+    return _broker
+
+
+def publish(channel, event, data):
+    """
+    发布事件; 发布失败只记录日志, 不影响写入请求
+    """
+    try:
+        get_broker().publish(channel, encode_event(event, data))
+    except Exception:
+        logger.exception('发布实时事件失败: %s %s', channel, event)
@@ -0,0 +1,80 @@
+"""
+留言、回复和评论的新增/删除在事务提交后发布为实时事件
+
+- board 频道: message.created / message.deleted / reply.created / reply.deleted
+- blog:<id> 频道: comment.created / comment.deleted
+新增事件的数据与对应列表接口中的条目格式相同, 删除事件只包含 ID;
+事件在请求之外构造, 头像地址(avatar_url)按 SITE_URL 生成完整地址(未配置时为相对路径)
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from blog.models import Comment
+from blog.serializers import CommentSerializer
+from msgboard.models import Message, Reply
+from msgboard.serializers import MessageSerializer, ReplySerializer
+from .broker import publish
+
+BOARD_CHANNEL = 'board'
+
+
+def blog_channel(blog_id):
+    return f'blog:{blog_id}'
+
+
+def publish_on_commit(channel, event, build):
+    """
+    事务提交后再构造数据并发布, 回滚的写入不会产生事件
+    删除事件的数据需在删除时取出: 提交时实例的主键已被置空
+    """
+    transaction.on_commit(lambda: publish(channel, event, build()))
+
+
+def message_data(message):
+    # 新留言还没有回复, 直接填充预览数据, 不再查询
+    message.preview_replies = []
+    message.reply_count = 0
+    return MessageSerializer(message).data
+
+
+@receiver(post_save, sender=Message, dispatch_uid='realtime_message_created')
+def message_created(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        publish_on_commit(BOARD_CHANNEL, 'message.created', lambda: message_data(instance))
+
+
+@receiver(post_delete, sender=Message, dispatch_uid='realtime_message_deleted')
+def message_deleted(sender, instance, **kwargs):
+    data = {'id': instance.id}
+    publish_on_commit(BOARD_CHANNEL, 'message.deleted', lambda: data)
+
+
+@receiver(post_save, sender=Reply, dispatch_uid='realtime_reply_created')
+def reply_created(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        publish_on_commit(
+            BOARD_CHANNEL, 'reply.created',
+            lambda: {**ReplySerializer(instance).data, 'message_id': instance.message_id},
+        )
+
+
+@receiver(post_delete, sender=Reply, dispatch_uid='realtime_reply_deleted')
+def reply_deleted(sender, instance, **kwargs):
+    data = {'id': instance.id, 'message_id': instance.message_id}
+    publish_on_commit(BOARD_CHANNEL, 'reply.deleted', lambda: data)
+
+
+@receiver(post_save, sender=Comment, dispatch_uid='realtime_comment_created')
+def comment_created(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        publish_on_commit(
+            blog_channel(instance.blog_id), 'comment.created',
+            lambda: {**CommentSerializer(instance).data, 'blog_id': instance.blog_id},
+        )
+
+
+@receiver(post_delete, sender=Comment, dispatch_uid='realtime_comment_deleted')
+def comment_deleted(sender, instance, **kwargs):
+    data = {'id': instance.id, 'blog_id': instance.blog_id}
+    publish_on_commit(blog_channel(instance.blog_id), 'comment.deleted', lambda: data)
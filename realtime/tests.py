@@ -0,0 +1,136 @@
+import asyncio
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from blog.models import Blog, Category, Comment
+from msgboard.models import Message, Reply
+from .broker import Hub, MemoryBroker, encode_event, hub
+from .signals import BOARD_CHANNEL
+
+# Create your tests here.
+
+
+class HubTests(TestCase):
+    """
+    进程内订阅表的分发
+    """
+
+    async def test_dispatch_fans_out_same_message(self):
+        local = Hub()
+        first, second = local.subscribe(BOARD_CHANNEL), local.subscribe(BOARD_CHANNEL)
+        other = local.subscribe('blog:1')
+        message = encode_event('message.created', {'id': 1})
+        local.dispatch(BOARD_CHANNEL, message)
+        self.assertIs(first.queue.get_nowait(), message)
+        self.assertIs(second.queue.get_nowait(), message)
+        self.assertTrue(other.queue.empty())
+        local.unsubscribe(first)
+        self.assertEqual(local.count(BOARD_CHANNEL), 1)
+        self.assertEqual(local.count(), 2)
+
+    async def test_dispatch_from_other_thread(self):
+        local = Hub()
+        subscription = local.subscribe(BOARD_CHANNEL)
+        await asyncio.to_thread(local.dispatch, BOARD_CHANNEL, b'data')
+        self.assertEqual(await asyncio.wait_for(subscription.queue.get(), 1), b'data')
+
+    async def test_slow_subscriber_is_disconnected(self):
+        local = Hub()
+        subscription = local.subscribe(BOARD_CHANNEL, maxsize=2)
+        for index in range(3):
+            local.dispatch(BOARD_CHANNEL, str(index).encode())
+        self.assertTrue(subscription.overflowed)
+        self.assertIsNone(subscription.queue.get_nowait())
+        self.assertTrue(subscription.queue.empty())
+
+
+class EventStreamTests(TestCase):
+    """
+    SSE 接口和模型事件
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            email='reader@example.com', name='读者', telephone='13800000001', password='password',
+        )
+
+    def test_events_published_on_commit(self):
+        with mock.patch('realtime.signals.publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                message = Message.objects.create(user=self.user, content='新留言')
+                Reply.objects.create(user=self.user, message=message, content='新回复')
+            with self.captureOnCommitCallbacks(execute=True):
+                message_id = message.id
+                message.delete()
+        events = [(call.args[0], call.args[1]) for call in publish.call_args_list]
+        self.assertEqual(events, [
+            (BOARD_CHANNEL, 'message.created'),
+            (BOARD_CHANNEL, 'reply.created'),
+            (BOARD_CHANNEL, 'reply.deleted'),
+            (BOARD_CHANNEL, 'message.deleted'),
+        ])
+        created = publish.call_args_list[0].args[2]
+        self.assertEqual((created['id'], created['replies'], created['reply_count']), (message_id, [], 0))
+        self.assertEqual(publish.call_args_list[1].args[2]['message_id'], message_id)
+        self.assertEqual(publish.call_args_list[3].args[2], {'id': message_id})
+
+    @override_settings(SITE_URL='http://testserver')
+    def test_payloads_match_list_endpoints(self):
+        blog = Blog.objects.create(title='博客', category=Category.objects.create(name='分类'))
+        with mock.patch('realtime.signals.publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                message = Message.objects.create(user=self.user, content='新留言')
+                Comment.objects.create(user=self.user, blog=blog, content='新评论')
+        payloads = {call.args[1]: call.args[2] for call in publish.call_args_list}
+        self.assertEqual(payloads['message.created']['user']['avatar_url'], 'http://testserver/media/avatar/default.png')
+
+        listed = self.client.get('/api/msgboard/messages/', HTTP_ACCEPT='application/json').json()['results']
+        self.assertEqual(payloads['message.created'], next(item for item in listed if item['id'] == message.id))
+        client = APIClient()
+        client.force_authenticate(self.user)
+        comments = client.get(f'/api/blog/comments/?blog_id={blog.id}', HTTP_ACCEPT='application/json').json()
+        comment = {key: value for key, value in payloads['comment.created'].items() if key != 'blog_id'}
+        self.assertEqual(comment, comments[0])
+
+    def test_relative_avatar_without_site_url(self):
+        with override_settings(SITE_URL=''), mock.patch('realtime.signals.publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                Message.objects.create(user=self.user, content='新留言')
+        self.assertEqual(publish.call_args.args[2]['user']['avatar_url'], '/media/avatar/default.png')
+
+    async def test_board_stream(self):
+        with mock.patch('realtime.broker._broker', MemoryBroker(hub)):
+            response = await self.async_client.get('/api/realtime/board/')
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            stream = aiter(response.streaming_content)
+            self.assertTrue((await anext(stream)).startswith(b'retry:'))
+            self.assertEqual(hub.count(BOARD_CHANNEL), 1)
+            message = encode_event('message.created', {'id': 1})
+            hub.dispatch(BOARD_CHANNEL, message)
+            self.assertEqual(await asyncio.wait_for(anext(stream), 1), message)
+            # 客户端断开时 ASGI 处理器取消正在等待事件的任务
+            waiting = asyncio.ensure_future(anext(stream))
+            await asyncio.sleep(0)
+            waiting.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiting
+        self.assertEqual(hub.count(BOARD_CHANNEL), 0)
+
+    async def test_heartbeat(self):
+        with mock.patch('realtime.broker._broker', MemoryBroker(hub)), self.settings(REALTIME_HEARTBEAT_SECONDS=0.01):
+            response = await self.async_client.get('/api/realtime/board/')
+            stream = aiter(response.streaming_content)
+            await anext(stream)
+            self.assertEqual(await asyncio.wait_for(anext(stream), 1), b': ping\n\n')
+            await stream.aclose()
+
+    async def test_missing_blog(self):
+        response = await self.async_client.get('/api/realtime/blogs/0/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_wsgi_not_supported(self):
+        self.assertEqual(self.client.get('/api/realtime/board/').status_code, 503)
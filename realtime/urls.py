@@ -0,0 +1,7 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('board/', views.board_events, name='realtime-board'),
+    path('blogs/<int:pk>/', views.blog_events, name='realtime-blog'),
+]
@@ -0,0 +1,68 @@
+"""
+实时事件推送(Server-Sent Events)
+
+- GET /api/realtime/board/            留言板: 新留言、新回复及删除
+- GET /api/realtime/blogs/<id>/       博客详情: 新评论及删除
+客户端使用 EventSource 连接, 断线后浏览器按 retry 间隔自动重连; 重连期间的事件不会补发,
+客户端重连后应重新拉取一次列表。空闲时每 REALTIME_HEARTBEAT_SECONDS 秒发送一条注释行,
+防止代理关闭连接。
+
+连接由异步视图处理, 空闲连接只占用一个等待中的协程和一个有界队列, 必须以 ASGI 方式部署
+(例如 uvicorn myblog_backend.asgi:application); WSGI 下返回 503。
+"""
+import asyncio
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+from blog.models import Blog
+from .broker import get_broker, hub
+from .signals import BOARD_CHANNEL, blog_channel
+
+# 浏览器断线后的重连间隔(毫秒)
+RETRY_MS = 3000
+HEARTBEAT = b': ping\n\n'
+
+
+async def event_stream(channel):
+    await get_broker().start()
+    subscription = hub.subscribe(channel)
+    try:
+        yield f'retry: {RETRY_MS}\n\n'.encode()
+        while True:
+            try:
+                async with asyncio.timeout(settings.REALTIME_HEARTBEAT_SECONDS):
+                    message = await subscription.queue.get()
+            except TimeoutError:
+                yield HEARTBEAT
+                continue
+            if message is None:
+                # 客户端读取过慢, 队列溢出: 断开连接, 由客户端重连
+                break
+            yield message
+    finally:
+        hub.unsubscribe(subscription)
+
+
+def event_response(request, channel):
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'detail': '实时推送需要以 ASGI 方式部署'}, status=503)
+    response = StreamingHttpResponse(event_stream(channel), content_type='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # 关闭 Nginx 的响应缓冲, 事件立即送达
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@require_GET
+async def board_events(request):
+    return event_response(request, BOARD_CHANNEL)
+
+
+@require_GET
+async def blog_events(request, pk):
+    if not await Blog.objects.filter(pk=pk).aexists():
+        raise Http404('博客不存在')
+    return event_response(request, blog_channel(pk))
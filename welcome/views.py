@@ -5,10 +5,13 @@ from .models import Welcome, Description
 from .serializers import WelcomeSerializer, UpdateWelcomeSerializer
 from django.utils.decorators import method_decorator
 from django.views.decorators.cache import cache_page
+from django.views.decorators.vary import vary_on_headers
 from django.db import transaction
 import logging
 from bloguser.permissons import IsSuperUser
 from django_redis import get_redis_connection
+from myblog_backend.compression import precompressed
+from myblog_backend.versioning import bump_version, conditional
 
 
 # 创建日志记录器
@@ -17,6 +20,22 @@ logger = logging.getLogger(__name__)
 # 缓存时间: 12小时
 WELCOME_CACHE_TTL = 60 * 60 * 12  # 12小时, 以秒为单位
 WELCOME_CACHE_KEY = 'harry_web_ai_welcome'
+
+def clear_cache():
+    """
+    清除页面缓存并更新版本号(客户端持有的 ETag 随之失效)
+    """
+    bump_version('welcome')
+    try:
+        redis = get_redis_connection("default")
+        pattern = f":1:views.decorators.cache.*{WELCOME_CACHE_KEY}*"
+        for key in redis.scan_iter(pattern):
+            redis.delete(key)
+            logger.info(f"已删除缓存键: {key}")
+    except Exception as e:
+        logger.error(f"清除缓存时出错: {str(e)}")
+
+
 class WelcomeView(APIView):
     """
     欢迎信息API
@@ -24,9 +43,14 @@ class WelcomeView(APIView):
     PUT: 更新welcome数据(仅限管理员)
     """
     
+    # 条件请求在缓存外层检查, 客户端数据未过期时直接返回 304; 最外层按 Accept-Encoding 返回预压缩的内容
+    @method_decorator(precompressed)
+    @method_decorator(conditional(lambda request: ['welcome']))
     @method_decorator(
         cache_page(WELCOME_CACHE_TTL, key_prefix=WELCOME_CACHE_KEY)
     )
+    # 响应格式随 Accept 变化(JSON / MessagePack), 页面缓存按 Accept 区分
+    @method_decorator(vary_on_headers('Accept'))
     def get(self, request):
         """获取唯一的welcome数据(使用Redis缓存, 缓存时间12小时)"""
         # 获取第一条数据, 如果不存在则返回404
@@ -68,7 +92,7 @@ class WelcomeView(APIView):
         serializer = WelcomeSerializer(welcome, data=request.data)
         if serializer.is_valid():
             serializer.save()
-            # 更新成功后, 可以手动清除缓存, 但这里我们依赖TTL自动过期即可
+            clear_cache()
             return Response({
                 'code': 200,
                 'message': '欢迎数据更新成功',
@@ -117,15 +141,7 @@ class UpdateWelcomeView(APIView):
                 # 提交数据库事务
                 transaction.commit()
 
-                # 清除缓存
-                try:
-                    redis = get_redis_connection("default")
-                    pattern = f":1:views.decorators.cache.*{WELCOME_CACHE_KEY}*"
-                    for key in redis.scan_iter(pattern):
-                        redis.delete(key)
-                        logger.info(f"已删除缓存键: {key}")
-                except Exception as e:
-                    logger.error(f"清除缓存时出错: {str(e)}")
+                clear_cache()
 
                 return Response({
                     'code': 200,